@@ -1,29 +1,103 @@
-from flask import Flask, render_template, request, send_file, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g, send_file
 from dotenv import load_dotenv
 import os
-import tempfile
 import logging
 import json
-import re
-from urllib.parse import urlparse, parse_qsl
-from functools import lru_cache
-import string
+from urllib.parse import urlparse
 import requests
-import pandas as pd
-import random
-from bs4 import BeautifulSoup
-import io
+import time
+import threading
+from collections import OrderedDict
 from flask_cors import CORS
+from batch import run_batch, iter_batch
+from cache import TTLCache
+from singleflight import SingleFlight
+from parsing import ASIN_RE, parse_listings, extract_organic_items
+from product_store import ProductStore
+from product_model import pack_listings, unpack_listings
+from export import build_export, flatten_product_details, EXPORT_FORMATS
+from result_store import ResultStore
+from jobs import JobManager, JOB_MAX_PRODUCTS
+from bulk_import import ImportManager, IMPORT_MAX_BYTES
+from projection import parse_fields, project
+from catalog import ProductCatalog, CatalogRefresher, CATALOG_MAX_AGE
+from history import HistoryStore, WatchScheduler, TRACKED_FIELDS, WATCH_DEFAULT_INTERVAL
+from metrics import (
+    registry, timed, record_step, start_breakdown, server_timing_header,
+    PARSE_TIME, EXPORT_TIME, REQUEST_LATENCY, PRODUCT_CHANGES
+)
+from oxylabs_client import post_query, get_source_breaker, get_stats as get_upstream_stats, CONNECT_TIMEOUT
+from retailers import (
+    build_search_sources, parse_source_names, iter_sources, run_sources, merge_listings, source_statuses,
+    RETAILER_SEARCH_TIMEOUT
+)
+from url_resolver import UrlResolver, check_url
+from fast_json import dumps as json_dumps, install_json_provider
+from compression import init_compression
 
 app = Flask(__name__)
 load_dotenv()
 CORS(app)
+install_json_provider(app)
+init_compression(app)
+# Largest request body (import uploads); larger ones are refused while being
+# read, before anything is spooled to disk, with or without a Content-Length
+app.config['MAX_CONTENT_LENGTH'] = IMPORT_MAX_BYTES
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Always send the Server-Timing breakdown (otherwise only when X-Timing is set)
+TIMING_HEADER = os.getenv("TIMING_HEADER", "").lower() in ('1', 'true', 'yes')
+
+# Batch scrape limits for /scrape-products
+SCRAPE_MAX_PRODUCTS = int(os.getenv("SCRAPE_MAX_PRODUCTS", "50"))
+SCRAPE_MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", "5"))
+
+# Links accepted by one /api/resolve-urls request
+RESOLVE_MAX_URLS = int(os.getenv("RESOLVE_MAX_URLS", "10000"))
+
+# Product detail cache keyed by ASIN
+product_cache = TTLCache('product', int(os.getenv("PRODUCT_CACHE_TTL", "3600")))
+
+# Persistent product catalog; records younger than CATALOG_MAX_AGE are served locally
+catalog = ProductCatalog()
+
+# Price/stock history of every fetched product, stored as changes only
+history_store = HistoryStore()
+
+# Search listing cache keyed by normalized query, domain and zip code.
+# Entries younger than SEARCH_CACHE_TTL are fresh; older entries are served
+# as-is for up to SEARCH_STALE_TTL more seconds while a refresh runs.
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_STALE_TTL = int(os.getenv("SEARCH_STALE_TTL", "3600"))
+# Listings are stored as positional rows and read back as Listing objects
+search_cache = TTLCache('search', SEARCH_CACHE_TTL + SEARCH_STALE_TTL,
+                        encode=lambda entry: dict(entry, listings=pack_listings(entry['listings'])),
+                        decode=lambda entry: dict(entry, listings=unpack_listings(entry['listings'])))
+_search_refreshing = set()
+_search_refresh_lock = threading.Lock()
+
+# Maximum number of result pages a single /search request may fetch
+SEARCH_MAX_PAGES = int(os.getenv("SEARCH_MAX_PAGES", "5"))
+
+# Server-held search and scrape results, so exports only need ids
+result_store = ResultStore()
+
+# Indexed stores built from search cache entries, reused per worker
+SEARCH_STORE_MEMO_SIZE = int(os.getenv("SEARCH_STORE_MEMO_SIZE", "64"))
+_search_stores = OrderedDict()
+_search_stores_lock = threading.Lock()
+
+# Error returned for IDs that do not match parsing.ASIN_RE
+INVALID_PRODUCT_ID_ERROR = "Invalid product ID format. Expected Amazon ASIN (10 characters alphanumeric)"
+
+# Single-flight groups coalescing identical concurrent upstream lookups
+product_flight = SingleFlight('product')
+search_flight = SingleFlight('search')
+
 # Retailer URL patterns
 RETAILER_PATTERNS = {
     'amazon.com': {
@@ -44,13 +118,15 @@ RETAILER_PATTERNS = {
     }
 }
 
-@lru_cache(maxsize=1000)
+# Search sources for multi-retailer /search, one per retailer above
+SEARCH_SOURCES = build_search_sources(RETAILER_PATTERNS)
+
+# Precompiled retailer lookup shared by the URL helpers below and /api/resolve-urls
+url_resolver = UrlResolver(RETAILER_PATTERNS)
+
 def get_retailer_pattern(domain):
-    """Cache retailer URL patterns"""
-    for retailer_domain, pattern in RETAILER_PATTERNS.items():
-        if retailer_domain in domain.lower():
-            return pattern
-    return None
+    """Return the RETAILER_PATTERNS entry of a domain or source label"""
+    return url_resolver.pattern_for(domain)
 
 def validate_product_url(url):
     """Validate the generated product URL"""
@@ -62,43 +138,11 @@ def validate_product_url(url):
 
 def get_retailer_specific_url(product):
     """Get URL using retailer-specific patterns"""
-    source = product.get('source', '').lower()
-    link = product.get('link', '')
-    
-    pattern = get_retailer_pattern(source)
-    if pattern:
-        # Try to extract product ID using regex
-        match = re.search(pattern['id_regex'], link)
-        if match:
-            product_id = match.group(1)
-            return pattern['pattern'].format(product_id=product_id)
-    return None
+    return url_resolver.canonical_url(product.get('link', ''), product.get('source', ''))
 
 def validate_url(url):
     """Enhanced URL validation"""
-    try:
-        result = urlparse(url)
-        checks = {
-            'has_scheme': bool(result.scheme),
-            'has_netloc': bool(result.netloc),
-            'valid_scheme': result.scheme in ['http', 'https'],
-            'has_path': bool(result.path),
-            'no_fragments': not result.fragment,  # Most product URLs don't need fragments
-            'valid_chars': all(c in string.printable for c in url)
-        }
-        
-        is_valid = all(checks.values())
-        return {
-            'is_valid': is_valid,
-            'checks': checks,
-            'error': None if is_valid else 'URL validation failed: ' + ', '.join(k for k, v in checks.items() if not v)
-        }
-    except Exception as e:
-        return {
-            'is_valid': False,
-            'checks': {},
-            'error': str(e)
-        }
+    return check_url(url)
 
 def extract_domain(url):
     """Extract domain from URL"""
@@ -107,7 +151,26 @@ def extract_domain(url):
     except:
         return None
 
-def search_products(query, min_price=None, max_price=None, sort_by=None):
+class RequestError(Exception):
+    """A client error reported as a JSON body with an HTTP status code"""
+    
+    def __init__(self, body, status):
+        super().__init__(body.get('error'))
+        self.body = body
+        self.status = status
+
+def normalize_query(query):
+    """Normalize a search query so equivalent searches share a cache entry"""
+    return " ".join((query or "").lower().split())
+
+def search_cache_key(query, domain, zip_code, page=1):
+    """Build the search cache key for a normalized query"""
+    cache_key = f"{domain}|{zip_code}|{query}"
+    if page > 1:
+        cache_key = f"{cache_key}|{page}"
+    return cache_key
+
+def search_products(query, min_price=None, max_price=None, sort_by=None, domain='com', zip_code='90210', pages=1):
     """
     Search for products using Oxylabs API
     
@@ -116,253 +179,245 @@ def search_products(query, min_price=None, max_price=None, sort_by=None):
         min_price (float, optional): Minimum price filter
         max_price (float, optional): Maximum price filter
         sort_by (str, optional): Sort results by (price, rating, etc.)
+        domain (str, optional): Amazon domain to search
+        zip_code (str, optional): Delivery location zip code
+        pages (int, optional): Number of result pages to fetch concurrently
     """
-    username = os.getenv("OXYLABS_USERNAME")
-    password = os.getenv("OXYLABS_PASSWORD")
+    if pages > 1:
+        merged = []
+        for page, products in iter_search_pages(query, pages, domain, zip_code, in_order=True):
+            merged.extend(products)
+        store = ProductStore(merged)
+    else:
+        store = get_search_store(query, domain, zip_code)
+    return store.query(min_price, max_price, sort_by)
+
+def iter_search_pages(query, pages, domain='com', zip_code='90210', in_order=False):
+    """
+    Fetch several result pages concurrently, yielding each page's new products
     
-    print(f"Searching for: {query}")
-    print(f"Using credentials - Username: {username}, Password: {password[:3]}***")
+    Products are deduped by ASIN across pages and renumbered so positions
+    follow the order in which they are yielded.
     
-    # Structure payload for Oxylabs API
-    payload = {
-        'source': 'amazon_search',
-        'domain': 'com',
-        'query': query,
-        'parse': True,
-        'zip_code': '90210'  # Using zip code for US location
-    }
+    Args:
+        query (str): Search query
+        pages (int): Number of pages to fetch
+        domain (str, optional): Amazon domain to search
+        zip_code (str, optional): Delivery location zip code
+        in_order (bool, optional): Yield pages in page order instead of as they arrive
+    
+    Yields:
+        tuple: (page, products) for every fetched page
+    """
+    fetch_page = lambda page: get_search_store(query, domain, zip_code, page=page).rows
+    page_numbers = list(range(1, pages + 1))
+    
+    if in_order:
+        completed = ((i, result) for i, result in enumerate(run_batch(fetch_page, page_numbers, max_workers=pages)))
+    else:
+        completed = iter_batch(fetch_page, page_numbers, max_workers=pages)
+    
+    seen = set()
+    position = 0
+    for index, result in completed:
+        products = dedupe_page(result['value'], seen, position)
+        position += len(products)
+        yield page_numbers[index], products
+
+def dedupe_page(products, seen, position):
+    """
+    Drop products already seen on earlier pages and renumber the rest
+    
+    Args:
+        products (list): Products of one page, or None if the page failed
+        seen (set): ASINs yielded so far; updated in place
+        position (int): Position of the last product yielded so far
+    """
+    page_products = []
+    for product in products or []:
+        product_id = product.get('productId')
+        if product_id:
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+        position += 1
+        page_products.append(product.with_position(position))
+    return page_products
+
+def get_search_store(query, domain='com', zip_code='90210', page=1):
+    """
+    Get an indexed product store for a search, reusing it while the listings are unchanged
+    
+    Args:
+        query (str): Search query
+        domain (str, optional): Amazon domain to search
+        zip_code (str, optional): Delivery location zip code
+        page (int, optional): Result page number
+    """
+    query = normalize_query(query)
+    cache_key = search_cache_key(query, domain, zip_code, page)
+    
+    # Fresh stores are served without touching the shared cache at all
+    memo = get_search_memo(cache_key)
+    if is_fresh_memo(memo):
+        return memo[1]
+    
+    entry = get_search_entry(cache_key, query, domain, zip_code, page)
+    return memoize_search_store(cache_key, entry, memo)
+
+def get_search_memo(cache_key):
+    """Return the memoized (fetched_at, store) pair for a search, or None"""
+    return _search_stores.get(cache_key)
+
+def is_fresh_memo(memo):
+    return memo is not None and time.time() - memo[0] <= SEARCH_CACHE_TTL
+
+def memoize_search_store(cache_key, entry, memo=None):
+    """Build (or reuse) the indexed store for a search cache entry and memoize it"""
+    if not entry or not entry['listings']:
+        return ProductStore([])
+    
+    if memo is not None and memo[0] == entry['fetched_at']:
+        store = memo[1]
+    else:
+        store = ProductStore(entry['listings'])
+    
+    with _search_stores_lock:
+        _search_stores[cache_key] = (entry['fetched_at'], store)
+        _search_stores.move_to_end(cache_key)
+        while len(_search_stores) > SEARCH_STORE_MEMO_SIZE:
+            _search_stores.popitem(last=False)
+    return store
+
+def get_search_entry(cache_key, query, domain, zip_code, page=1):
+    """
+    Get the cached search entry, serving stale entries while refreshing
+    
+    Returns:
+        dict: fetched_at timestamp and unfiltered listings, or None if the upstream call failed
+    """
+    entry = search_cache.get(cache_key)
+    if entry is not None:
+        age = time.time() - entry['fetched_at']
+        if age > SEARCH_CACHE_TTL:
+            logger.info(f"Serving stale search results for '{query}' ({age:.0f}s old)")
+            refresh_search_listings_async(cache_key, query, domain, zip_code, page)
+        return entry
+    
+    return search_flight.do(cache_key, refresh_search_listings, cache_key, query, domain, zip_code, page)
+
+def refresh_search_listings(cache_key, query, domain, zip_code, page=1):
+    """Fetch search listings from upstream and store them in the search cache"""
+    return store_search_listings(cache_key, fetch_search_listings(query, domain, zip_code, page))
+
+def store_search_listings(cache_key, product_listings):
+    """Wrap freshly fetched listings in a cache entry, caching it unless empty"""
+    if product_listings is None:
+        return None
+    entry = {'fetched_at': time.time(), 'listings': product_listings}
+    if product_listings:
+        search_cache.set(cache_key, entry)
+    return entry
+
+def refresh_search_listings_async(cache_key, query, domain, zip_code, page=1):
+    """Refresh a stale search cache entry in the background, once per key"""
+    if not claim_search_refresh(cache_key):
+        return
+    
+    def refresh():
+        try:
+            search_flight.do(cache_key, refresh_search_listings, cache_key, query, domain, zip_code, page)
+        except Exception as e:
+            logger.error(f"Background search refresh failed for '{query}': {str(e)}")
+        finally:
+            release_search_refresh(cache_key)
+    
+    threading.Thread(target=refresh, daemon=True).start()
+
+def claim_search_refresh(cache_key):
+    """Mark a background refresh of cache_key as running; False if one already is"""
+    with _search_refresh_lock:
+        if cache_key in _search_refreshing:
+            return False
+        _search_refreshing.add(cache_key)
+        return True
+
+def release_search_refresh(cache_key):
+    with _search_refresh_lock:
+        _search_refreshing.discard(cache_key)
+
+def fetch_search_listings(query, domain='com', zip_code='90210', page=1):
+    """
+    Fetch and parse Amazon search listings using Oxylabs API
+    
+    Args:
+        query (str): Search query
+        domain (str, optional): Amazon domain to search
+        zip_code (str, optional): Delivery location zip code
+        page (int, optional): Result page number
+    
+    Returns:
+        list: Parsed product listings, or None if the upstream call failed
+    """
+    logger.info(f"Searching for: {query} (page {page})")
     
     try:
-        print(f"Sending request to Oxylabs API...")
         # Get response.
-        response = requests.request(
-            'POST',
-            'https://realtime.oxylabs.io/v1/queries',
-            auth=(username, password),
-            json=payload,
-        )
+        response = post_query(build_search_payload(query, domain, zip_code, page))
         
         response.raise_for_status()  # Raise exception for bad status codes
+        logger.debug(f"Status code: {response.status_code}")
         
-        print(f"Status code: {response.status_code}")
-        print(f"Response content type: {response.headers.get('Content-Type')}")
+        return parse_search_response(response)
         
+    except requests.exceptions.RequestException as e:
+        logger.error(f"API Error occurred: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}")
+        return None
+
+def build_search_payload(query, domain='com', zip_code='90210', page=1):
+    """Structure an amazon_search payload for Oxylabs API"""
+    return {
+        'source': 'amazon_search',
+        'domain': domain,
+        'query': query,
+        'start_page': page,
+        'pages': 1,
+        'parse': True,
+        'zip_code': zip_code  # Using zip code for US location
+    }
+
+def parse_search_response(response):
+    """
+    Parse an amazon_search API response into product listings
+    
+    Args:
+        response: requests or httpx response with a JSON body
+    
+    Returns:
+        list: Parsed product listings (empty if the response had no content)
+    """
+    with timed(PARSE_TIME, step='parse', source='amazon_search'):
         results = response.json()
-        print(f"Response keys: {results.keys() if results else 'None'}")
         
         if not results or "results" not in results:
-            print("No results found in API response")
+            logger.warning("No results found in API response")
             return []
         
-        print(f"Number of results: {len(results['results'])}")
-            
         # Extract content from the response
         if not results["results"] or "content" not in results["results"][0]:
-            print("No content in results")
+            logger.warning("No content in results")
             return []
         
-        content = results["results"][0]["content"]
-        print(f"Content keys: {content.keys() if isinstance(content, dict) else 'Not a dict'}")
-        
-        # Parse Amazon search results 
-        product_listings = []
-        
-        # Check for the correct Amazon results structure
-        if isinstance(content, dict):
-            # Amazon search results are structured as content.results.organic
-            results_container = content.get("results", {})
-            if isinstance(results_container, dict) and "organic" in results_container:
-                items = results_container.get("organic", [])
-                print(f"Found {len(items)} organic items")
-                
-                # DEBUG: Print raw format of the first item to understand structure
-                if items and len(items) > 0:
-                    print(f"DEBUG: First item raw format: {json.dumps(items[0], indent=2)}")
-                
-                for i, item in enumerate(items):
-                    try:
-                        # Extract title (this has a different format in Amazon search)
-                        title = item.get("title", "No title available")
-                        
-                        # Extract URL (this is a relative URL in Amazon search)
-                        url = item.get("url", "")
-                        if url and url.startswith("/"):
-                            url = f"https://www.amazon.com{url}"
-                        
-                        # Extract price
-                        price_text = "Price not available"
-                        extracted_price = 0
-                        if "price" in item:
-                            try:
-                                # Direct price field as a number
-                                if isinstance(item["price"], (int, float)):
-                                    extracted_price = float(item["price"])
-                                    price_text = f"${extracted_price:.2f}"
-                                # Price as a dict object (older format)
-                                elif isinstance(item["price"], dict):
-                                    price_obj = item.get("price", {})
-                                    price_text = price_obj.get("raw", price_obj.get("value", "Price not available"))
-                                    if "value" in price_obj:
-                                        extracted_price = float(price_obj.get("value", 0))
-                                    elif "raw" in price_obj:
-                                        raw_price = price_obj.get("raw", "")
-                                        # Extract numeric part from formats like "$19.99" or "19,99 €"
-                                        numeric_part = re.sub(r'[^\d\.]', '', raw_price.replace(',', '.'))
-                                        if numeric_part:
-                                            extracted_price = float(numeric_part)
-                            except (ValueError, TypeError) as e:
-                                print(f"Error parsing price: {e}")
-                        # Check for price displayed in the title
-                        elif not price_text or price_text == "Price not available":
-                            title_price_match = re.search(r'\$(\d+(?:\.\d+)?)', title)
-                            if title_price_match:
-                                price_text = f"${title_price_match.group(1)}"
-                                extracted_price = float(title_price_match.group(1))
-                        
-                        # Extract rating
-                        rating = 0
-                        if "rating" in item:
-                            try:
-                                rating_val = item.get("rating", 0)
-                                if isinstance(rating_val, (int, float)):
-                                    rating = float(rating_val)
-                                elif isinstance(rating_val, dict) and "value" in rating_val:
-                                    rating = float(rating_val.get("value", 0))
-                            except (ValueError, TypeError):
-                                rating = 0
-                        
-                        # Extract review count
-                        review_count = 0
-                        if "reviews_count" in item:
-                            try:
-                                review_count = int(item["reviews_count"])
-                            except (ValueError, TypeError):
-                                review_count = 0
-                        elif "reviews" in item:
-                            try:
-                                reviews_val = item.get("reviews", 0)
-                                if isinstance(reviews_val, (int, str)):
-                                    review_count = int(str(reviews_val).replace(',', '').replace('.', '').strip())
-                                elif isinstance(reviews_val, dict) and "value" in reviews_val:
-                                    review_count = int(reviews_val.get("value", 0))
-                            except (ValueError, TypeError):
-                                review_count = 0
-                        
-                        # Try to extract review count from title if it's not found elsewhere
-                        if review_count == 0:
-                            # Look for patterns like "1,234 reviews" or "(1,234)"
-                            review_match = re.search(r'(\d+(?:,\d+)*)\s*(?:reviews|ratings|\(|\)|stars)', title, re.IGNORECASE)
-                            if review_match:
-                                review_count = int(review_match.group(1).replace(',', ''))
-                        
-                        # Extract image URL
-                        image_url = ""
-                        if "url_image" in item:
-                            image_url = item.get("url_image", "")
-                        elif "image" in item:
-                            image_url = item.get("image", "")
-                        # Sometimes the image is nested in the thumbnail field
-                        elif "thumbnail" in item:
-                            image_url = item.get("thumbnail", "")
-                            
-                        # For Amazon search, images might be in various formats
-                        if not image_url and "variants" in item:
-                            variants = item.get("variants", [])
-                            for variant in variants:
-                                if "image" in variant:
-                                    image_url = variant.get("image", "")
-                                    break
-                        
-                        # If still no image, use a placeholder
-                        if not image_url:
-                            image_url = f"https://via.placeholder.com/300x300?text=Amazon+Product"
-                        
-                        # Extract product ID (ASIN)
-                        product_id = ""
-                        if "asin" in item:
-                            product_id = item.get("asin", "")
-                        elif url:
-                            # Try to extract ASIN from URL
-                            asin_match = re.search(r'/dp/([A-Z0-9]{10})', url)
-                            if asin_match:
-                                product_id = asin_match.group(1)
-                        
-                        # Create a rich description by combining multiple fields
-                        description_parts = []
-                        
-                        # Add sales volume if available
-                        if item.get("sales_volume"):
-                            description_parts.append(item.get("sales_volume"))
-                            
-                        # Add bestseller status if true
-                        if item.get("best_seller"):
-                            description_parts.append("Best Seller")
-                            
-                        # Add Amazon's Choice status if true
-                        if item.get("is_amazons_choice"):
-                            description_parts.append("Amazon's Choice")
-                            
-                        # Add Prime status if true
-                        if item.get("is_prime"):
-                            description_parts.append("Prime Eligible")
-                            
-                        # Add manufacturer if available
-                        if item.get("manufacturer"):
-                            description_parts.append(f"By {item.get('manufacturer')}")
-                            
-                        # Combine all parts into a description
-                        description = " | ".join(description_parts)
-                        
-                        # Build product data
-                        product_data = {
-                            "position": i + 1,
-                            "title": title,
-                            "link": url,
-                            "price": price_text,
-                            "extracted_price": extracted_price,
-                            "rating": rating,
-                            "ratingCount": review_count,
-                            "imageUrl": image_url,
-                            "thumbnail": image_url,
-                            "description": description,
-                            "source": "amazon.com",
-                            "delivery": item.get("shipping_information", ""),
-                            "productId": product_id,
-                        }
-                        
-                        product_listings.append(product_data)
-                    except Exception as e:
-                        print(f"Error processing item: {str(e)}")
-                        continue
-            elif "organic_results" in content:
-                # Old format support (just in case)
-                items = content.get("organic_results", [])
-                print(f"Found {len(items)} organic_results items")
-            
-        print(f"Successfully extracted {len(product_listings)} products")
-        
-        # Apply filters if specified
-        if min_price is not None:
-            product_listings = [p for p in product_listings if p["extracted_price"] >= float(min_price)]
-        
-        if max_price is not None:
-            product_listings = [p for p in product_listings if p["extracted_price"] <= float(max_price)]
-        
-        if sort_by == "price_asc":
-            product_listings.sort(key=lambda p: p["extracted_price"])
-        elif sort_by == "price_desc":
-            product_listings.sort(key=lambda p: p["extracted_price"], reverse=True)
-        elif sort_by == "rating":
-            product_listings.sort(key=lambda p: p["rating"], reverse=True)
-        
-        return product_listings
-        
-    except requests.exceptions.RequestException as e:
-        print(f"API Error occurred: {str(e)}")
-        return []
-    except Exception as e:
-        print(f"Error occurred: {str(e)}")
-        return []
+        # Parse Amazon search results (content.results.organic) in one pass
+        items = extract_organic_items(results)
+        product_listings = parse_listings(items)
+    
+    logger.info(f"Extracted {len(product_listings)} products from {len(items)} organic items")
+    
+    return product_listings
 
 @app.route('/')
 def index():
@@ -375,50 +430,16 @@ def search():
             query = request.form.get('query', '')
             format_type = request.form.get('format', 'json')
             
-            # Handle Excel export
-            if format_type.lower() == 'excel':
-                # Get the selected rows passed from the frontend
-                selected_rows_json = request.form.get('selected_rows', '[]')
-                visible_columns_json = request.form.get('visible_columns', '[]')
-                is_detailed = request.form.get('is_detailed', 'false').lower() == 'true'
-                
+            # Handle Excel / CSV / Parquet export
+            if format_type.lower() in EXPORT_FORMATS:
                 try:
-                    selected_rows = json.loads(selected_rows_json)
-                    visible_columns = json.loads(visible_columns_json) if visible_columns_json else []
-                except json.JSONDecodeError:
-                    return jsonify({"error": "Invalid JSON data"}), 400
+                    chunks, file_name, mimetype = prepare_export(request.form)
+                except RequestError as e:
+                    return jsonify(e.body), e.status
                 
-                # Create DataFrame
-                df = pd.DataFrame(selected_rows)
-                
-                # Filter columns if provided
-                if visible_columns:
-                    available_columns = [col for col in visible_columns if col in df.columns]
-                    df = df[available_columns]
-                
-                # Create Excel file in memory
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    sheet_name = "Detailed Product Data" if is_detailed else "Search Results"
-                    df.to_excel(writer, index=False, sheet_name=sheet_name)
-                    
-                    # Auto-adjust columns' width
-                    worksheet = writer.sheets[sheet_name]
-                    for i, col in enumerate(df.columns):
-                        # Avoid adjusting too wide for large content columns
-                        max_length = min(max(df[col].astype(str).apply(len).max(), len(col)) + 2, 50)
-                        worksheet.column_dimensions[worksheet.cell(1, i+1).column_letter].width = max_length
-                
-                output.seek(0)
-                
-                file_name = f"detailed_product_data_{query}.xlsx" if is_detailed else f"shopping_results_{query}.xlsx"
-                
-                return send_file(
-                    output,
-                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    as_attachment=True,
-                    download_name=file_name
-                )
+                response = Response(chunks, mimetype=mimetype)
+                response.headers.set('Content-Disposition', 'attachment', filename=file_name)
+                return response
             
             # Normal search flow
             if not query:
@@ -426,13 +447,39 @@ def search():
                 
             logger.info(f"Searching for: {query}")
             
+            # Optional filters are applied to the cached listings for the query
+            min_price, max_price, sort_by, pages = search_filters(request.form)
+            try:
+                sources = search_sources(request.form)
+            except RequestError as e:
+                return jsonify(e.body), e.status
+            
+            # Several retailers: fan out one query and merge what arrives before the deadline
+            if not is_amazon_only(sources):
+                if format_type.lower() == 'ndjson':
+                    return Response(
+                        stream_with_context(stream_source_results(query, sources, min_price, max_price)),
+                        mimetype='application/x-ndjson'
+                    )
+                results, statuses = multi_search_products(query, sources, min_price, max_price, sort_by)
+                if not results:
+                    return jsonify({"message": "No results found. Please try a different search term.", "sources": statuses}), 404
+                return jsonify({"results": results, "result_set_id": result_store.save(results), "sources": statuses})
+            
+            # Stream each page's products as NDJSON as soon as it arrives
+            if format_type.lower() == 'ndjson':
+                return Response(
+                    stream_with_context(stream_search_pages(query, pages, min_price, max_price)),
+                    mimetype='application/x-ndjson'
+                )
+            
             # Call the search function
-            results = search_products(query)
+            results = search_products(query, min_price=min_price, max_price=max_price, sort_by=sort_by, pages=pages)
             
             if not results:
                 return jsonify({"message": "No results found. Please try a different search term."}), 404
                 
-            return jsonify({"results": results})
+            return jsonify({"results": results, "result_set_id": result_store.save(results)})
             
         else:
             # GET request - render search form
@@ -442,6 +489,286 @@ def search():
         logger.error(f"Error in search: {str(e)}")
         return jsonify({"error": f"Error processing search: {str(e)}"}), 500
 
+def search_filters(form):
+    """Read the optional (min_price, max_price, sort_by, pages) filters of a search form"""
+    min_price = form.get('min_price') or None
+    max_price = form.get('max_price') or None
+    sort_by = form.get('sort_by') or None
+    pages = min(max(form.get('pages', 1, type=int), 1), SEARCH_MAX_PAGES)
+    return min_price, max_price, sort_by, pages
+
+def search_sources(form):
+    """
+    Read the retailers a search form asks for
+    
+    Args:
+        form: Request form (or args) with an optional comma separated sources field
+    
+    Returns:
+        list: RetailerSource objects, in request order
+    
+    Raises:
+        RequestError: If an unknown source is named
+    """
+    try:
+        names = parse_source_names(form.get('sources'), SEARCH_SOURCES)
+    except ValueError as e:
+        raise RequestError({"error": str(e)}, 400)
+    return [SEARCH_SOURCES[name] for name in names] or [SEARCH_SOURCES['amazon']]
+
+def is_amazon_only(sources):
+    """Whether a search can take the single-source Amazon path (pages, stale-while-refresh)"""
+    return len(sources) == 1 and sources[0].oxylabs_source == 'amazon_search'
+
+def retailer_cache_key(source, query):
+    """Search cache key of a non-Amazon retailer search"""
+    return search_cache_key(normalize_query(query), source.name, '')
+
+def get_source_listings(source, query, zip_code='90210'):
+    """
+    Get one retailer's listings for a query, cached like Amazon searches
+    
+    Amazon goes through the regular search store; other retailers share
+    the search cache and single-flight group under their own keys.
+    
+    Returns:
+        list: Listings in the /search product dict shape
+    """
+    if source.oxylabs_source == 'amazon_search':
+        return get_search_store(query, zip_code=zip_code).rows
+    cache_key = retailer_cache_key(source, query)
+    entry = search_cache.get(cache_key)
+    if entry is None or time.time() - entry['fetched_at'] > SEARCH_CACHE_TTL:
+        entry = search_flight.do(cache_key, refresh_source_listings, cache_key, source, query)
+    return entry['listings'] if entry else []
+
+def refresh_source_listings(cache_key, source, query):
+    """
+    Fetch a retailer's listings from upstream and store them in the search cache
+    
+    The search already has a deadline, so the call is not retried, and a
+    slow or failing retailer only opens its own circuit breaker.
+    """
+    logger.info(f"Searching {source.name} for: {query}")
+    response = post_query(source.build_payload(query), timeout=(CONNECT_TIMEOUT, RETAILER_SEARCH_TIMEOUT),
+                          retries=0, breaker=get_source_breaker(source.oxylabs_source))
+    response.raise_for_status()
+    with timed(PARSE_TIME, step='parse', source=source.oxylabs_source):
+        listings = source.parse(response.json())
+    logger.info(f"Extracted {len(listings)} products from {source.name}")
+    return store_search_listings(cache_key, listings)
+
+def multi_search_products(query, sources, min_price=None, max_price=None, sort_by=None):
+    """
+    Search several retailers concurrently and merge their listings
+    
+    Each source has RETAILER_SEARCH_TIMEOUT seconds; late or failing
+    sources are left out of the results and reported in the statuses.
+    
+    Returns:
+        tuple: (filtered and sorted listings, {source name: status})
+    """
+    merged, statuses = run_sources(lambda source: get_source_listings(source, query), sources)
+    return ProductStore(merged).query(min_price, max_price, sort_by), statuses
+
+def stream_source_results(query, sources, min_price=None, max_price=None):
+    """
+    Yield NDJSON lines with each retailer's new products as that retailer answers
+    
+    The last line reports every source's status, including timeouts.
+    """
+    seen = set()
+    all_products = []
+    results = []
+    for result in iter_sources(lambda source: get_source_listings(source, query), sources):
+        products = merge_listings([result['value'] or []], seen, len(all_products))
+        products = ProductStore(products).query(min_price, max_price)
+        all_products.extend(products)
+        results.append(result)
+        yield json_dumps({"source": result['source'], "status": result['status'], "results": products}) + "\n"
+    
+    result_set_id = result_store.save(all_products) if all_products else None
+    yield json_dumps({
+        "done": True, "total": len(all_products), "result_set_id": result_set_id, "sources": source_statuses(results)
+    }) + "\n"
+
+def prepare_export(form):
+    """
+    Build the export requested by a /search form
+    
+    Args:
+        form: Request form with format, query, visible_columns, is_detailed
+            and either result_set_id/row_ids, asins or selected_rows
+    
+    Returns:
+        tuple: (chunk iterator, download file name, mimetype)
+    
+    Raises:
+        RequestError: If the form data is invalid or the result set expired
+    """
+    query = form.get('query', '')
+    format_type = form.get('format', 'json').lower()
+    result_set_id = form.get('result_set_id')
+    visible_columns_json = form.get('visible_columns', '[]')
+    is_detailed = form.get('is_detailed', 'false').lower() == 'true'
+    
+    try:
+        visible_columns = json.loads(visible_columns_json) if visible_columns_json else []
+        row_ids = json.loads(form.get('row_ids', '[]'))
+        asins = json.loads(form.get('asins', '[]'))
+        
+        if result_set_id:
+            # Rows come from the server-held result set; the client only sends ids
+            row_key = 'productId' if is_detailed else 'position'
+            selected_rows = result_store.select(result_set_id, row_ids, key=row_key)
+            if selected_rows is None:
+                raise RequestError({"error": "Result set expired, please search again", "code": "result_set_expired"}, 410)
+        elif is_detailed and asins:
+            # Detailed rows for an ASIN list are read from the product cache
+            if not isinstance(asins, list):
+                raise RequestError({"error": "asins must be a list of product IDs"}, 400)
+            if len(asins) > JOB_MAX_PRODUCTS:
+                raise RequestError({"error": f"Too many product IDs (maximum {JOB_MAX_PRODUCTS})"}, 400)
+            invalid = [asin for asin in asins if not isinstance(asin, str) or not ASIN_RE.match(asin)]
+            if invalid:
+                raise RequestError({"error": INVALID_PRODUCT_ID_ERROR, "invalid": invalid}, 400)
+            products = get_local_products(asins)
+            selected_rows = [build_scrape_result(asin, products.get(asin)) for asin in asins]
+        else:
+            # Legacy flow: rows serialized by the frontend
+            selected_rows = json.loads(form.get('selected_rows', '[]'))
+    except json.JSONDecodeError:
+        raise RequestError({"error": "Invalid JSON data"}, 400)
+    
+    # Server-held detailed rows are raw product payloads; flatten them like the grid does
+    if is_detailed and (result_set_id or asins):
+        selected_rows = [flatten_product_details(row) for row in selected_rows]
+    
+    sheet_name = "Detailed Product Data" if is_detailed else "Search Results"
+    with timed(EXPORT_TIME, step='export', format=format_type):
+        chunks, extension, mimetype = build_export(
+            selected_rows, format_type, visible_columns, sheet_name=sheet_name
+        )
+    
+    file_name = f"detailed_product_data_{query}.{extension}" if is_detailed else f"shopping_results_{query}.{extension}"
+    return chunks, file_name, mimetype
+
+def stream_search_pages(query, pages, min_price=None, max_price=None):
+    """
+    Yield NDJSON lines with each search page's products as the page completes
+    
+    Price filters are applied per page; sorting is left to the client since
+    the full result set is not known until the last page arrives.
+    """
+    all_products = []
+    for page, products in iter_search_pages(query, pages):
+        products = ProductStore(products).query(min_price, max_price)
+        all_products.extend(products)
+        yield json_dumps({"page": page, "results": products}) + "\n"
+    
+    result_set_id = result_store.save(all_products) if all_products else None
+    yield json_dumps({"done": True, "pages": pages, "total": len(all_products), "result_set_id": result_set_id}) + "\n"
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    start_breakdown()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_LATENCY.observe(elapsed, route=route, method=request.method, status=response.status_code)
+    
+    # Opt-in per-request timing breakdown
+    if TIMING_HEADER or request.headers.get('X-Timing'):
+        response.headers['Server-Timing'] = server_timing_header(elapsed)
+    return response
+
+def collect_app_metrics():
+    """Expose cache, coalescing and upstream counters kept by other components"""
+    caches = {'product': product_cache, 'search': search_cache}
+    flights = {'product': product_flight, 'search': search_flight}
+    upstream = get_upstream_stats()
+    return [
+        ('cache_hits_total', 'counter', 'Cache hits', [({'cache': n}, c.hits) for n, c in caches.items()]),
+        ('cache_misses_total', 'counter', 'Cache misses', [({'cache': n}, c.misses) for n, c in caches.items()]),
+        ('cache_evictions_total', 'counter', 'Cache evictions',
+         [({'cache': n}, c.backend.evictions) for n, c in caches.items()]),
+        ('coalesced_calls_total', 'counter', 'Upstream calls served by an in-flight identical call',
+         [({'group': n}, f.coalesced) for n, f in flights.items()]),
+        ('oxylabs_retries_total', 'counter', 'Oxylabs request retries', [({}, upstream['retries'])]),
+        ('oxylabs_connections_reused_total', 'counter', 'Requests sent over a reused connection',
+         [({}, upstream['connections_reused'])]),
+    ]
+
+registry.add_collector(collect_app_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics for this worker process"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/stats', methods=['GET'])
+def stats_api():
+    """Report upstream connection pool and cache statistics"""
+    return jsonify({
+        "upstream": get_upstream_stats(),
+        "cache": {"product": product_cache.stats(), "search": search_cache.stats()},
+        "coalescing": {"product": product_flight.stats(), "search": search_flight.stats()},
+        "result_sets": result_store.stats(),
+        "imports": import_manager.stats(),
+        "catalog": dict(catalog.stats(), refresher=catalog_refresher.stats()),
+        "history": dict(history_store.stats(), scheduler=watch_scheduler.stats()),
+    })
+
+@app.route('/api/catalog', methods=['GET'])
+def catalog_api():
+    """Query stored product records by price, rating and stock without calling upstream"""
+    try:
+        records = catalog.query(
+            min_price=request.args.get('min_price', type=float),
+            max_price=request.args.get('max_price', type=float),
+            min_rating=request.args.get('min_rating', type=float),
+            in_stock=request.args.get('in_stock', type=lambda value: value.lower() in ('1', 'true', 'yes')),
+            sort_by=request.args.get('sort_by'),
+            limit=min(max(request.args.get('limit', 100, type=int), 1), 1000),
+            offset=max(request.args.get('offset', 0, type=int), 0),
+        )
+        return jsonify({"results": records})
+    except Exception as e:
+        logger.error(f"Error querying catalog: {str(e)}")
+        return jsonify({"error": f"Error querying catalog: {str(e)}"}), 500
+
+@app.route('/api/resolve-urls', methods=['POST'])
+def resolve_urls_api():
+    """
+    Resolve a batch of product links to retailer, product ID and canonical URL
+    
+    Expects JSON: {"urls": [...], "sources": [...]} with sources optional
+    (one retailer label per URL, used when the host is not a known retailer).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        urls = data.get('urls')
+        sources = data.get('sources')
+        if not isinstance(urls, list) or not urls:
+            return jsonify({"error": "Please provide a list of urls"}), 400
+        if len(urls) > RESOLVE_MAX_URLS:
+            return jsonify({"error": f"Maximum {RESOLVE_MAX_URLS} urls allowed per request"}), 400
+        if sources is not None and (not isinstance(sources, list) or len(sources) != len(urls)):
+            return jsonify({"error": "sources must be a list with one entry per url"}), 400
+        
+        results = url_resolver.resolve_many(urls, sources)
+        resolved = sum(1 for result in results if result['product_id'])
+        return jsonify({"results": results, "resolved": resolved, "total": len(results)})
+    except Exception as e:
+        logger.error(f"Error resolving urls: {str(e)}")
+        return jsonify({"error": f"Error resolving urls: {str(e)}"}), 500
+
 @app.route('/api/product/<product_id>', methods=['GET'])
 def product_details_api(product_id):
     """
@@ -451,127 +778,421 @@ def product_details_api(product_id):
         logger.info(f"Received request for product ID: {product_id}")
         
         # Validate the product ID (ASIN)
-        if not re.match(r'^[A-Z0-9]{10}$', product_id):
+        if not ASIN_RE.match(product_id):
             logger.warning(f"Invalid product ID format: {product_id}")
-            return jsonify({"error": "Invalid product ID format. Expected Amazon ASIN (10 characters alphanumeric)"}), 400
-            
-        product = get_product_details(product_id)
+            return jsonify({"error": INVALID_PRODUCT_ID_ERROR}), 400
         
-        if not product:
-            logger.warning(f"Product not found: {product_id}")
-            return jsonify({"error": "Product not found or failed to retrieve data"}), 404
-            
-        # Check for parse status code that indicates an error
-        if isinstance(product, dict) and product.get('parse_status_code') == 12003:
-            logger.warning(f"Product not found or unavailable: {product_id}")
-            return jsonify({"error": "Product not found on Amazon or is currently unavailable", "details": product}), 404
+        try:
+            fields = request_fields(request.args.get('fields'))
+        except RequestError as e:
+            return jsonify(e.body), e.status
             
-        return jsonify({"product": product})
+        body, status = product_api_result(product_id, get_product_details(product_id), fields)
+        return jsonify(body), status
         
     except Exception as e:
         logger.error(f"Error getting product details: {str(e)}")
         return jsonify({"error": f"Error getting product details: {str(e)}"}), 500
 
+@app.route('/api/history/<product_id>', methods=['GET'])
+def product_history_api(product_id):
+    """
+    Get the recorded price/stock changes of a product
+    
+    Query args: fields (comma separated), start and end (unix seconds)
+    """
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',')] if fields else None
+    unknown = [field for field in fields or [] if field not in TRACKED_FIELDS]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}", "fields": list(TRACKED_FIELDS)}), 400
+    
+    history = history_store.history(
+        product_id, fields,
+        start=request.args.get('start', type=float),
+        end=request.args.get('end', type=float)
+    )
+    return jsonify({"productId": product_id, "latest": history_store.latest(product_id), "history": history})
+
+@app.route('/api/changes', methods=['GET'])
+def product_changes_api():
+    """
+    Get tracked field changes across all products recorded after ?since= (unix seconds)
+    
+    A full page carries next_cursor; pass it back as ?cursor= for the next page.
+    """
+    since = request.args.get('since', 0, type=float)
+    limit = min(max(request.args.get('limit', 1000, type=int), 1), 10000)
+    try:
+        changes, next_cursor = history_store.changes_since(since, limit, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"changes": changes, "next_cursor": next_cursor})
+
+@app.route('/api/watchlist', methods=['GET', 'POST'])
+def watchlist_api():
+    """List watched products, or add product IDs to be re-scraped every interval seconds"""
+    if request.method == 'GET':
+        limit = min(max(request.args.get('limit', 1000, type=int), 1), 10000)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        return jsonify({"watchlist": history_store.watchlist(limit, offset)})
+    
+    data = request.get_json(silent=True) or {}
+    product_ids = data.get('product_ids', [])
+    if not product_ids or not isinstance(product_ids, list):
+        return jsonify({"error": "No product IDs provided"}), 400
+    
+    invalid = [product_id for product_id in product_ids if not ASIN_RE.match(str(product_id))]
+    if invalid:
+        return jsonify({"error": INVALID_PRODUCT_ID_ERROR, "invalid": invalid}), 400
+    
+    try:
+        interval = int(data.get('interval', WATCH_DEFAULT_INTERVAL))
+    except (TypeError, ValueError):
+        return jsonify({"error": "interval must be a number of seconds"}), 400
+    
+    interval = history_store.watch(product_ids, interval)
+    return jsonify({"watching": len(product_ids), "interval": interval}), 201
+
+@app.route('/api/watchlist/<product_id>', methods=['DELETE'])
+def unwatch_api(product_id):
+    """Stop re-scraping a watched product (its history is kept)"""
+    if not history_store.unwatch(product_id):
+        return jsonify({"error": "Product is not watched"}), 404
+    return jsonify({"productId": product_id, "watching": False})
+
+def log_product_changes(product_id, deltas):
+    """Count and log the tracked field changes detected for a product"""
+    for delta in deltas:
+        PRODUCT_CHANGES.inc(field=delta['field'])
+    logger.info(f"Product {product_id} changed: " + ', '.join(
+        f"{delta['field']} {delta['old']!r} -> {delta['new']!r}" for delta in deltas
+    ))
+
+history_store.subscribe(log_product_changes)
+
+def request_fields(value):
+    """
+    Parse a fields= projection (field names and presets such as summary or grid)
+    
+    Raises:
+        RequestError: If the value is not a string or list of names
+    """
+    try:
+        return parse_fields(value)
+    except ValueError as e:
+        raise RequestError({"error": str(e)}, 400)
+
+def product_api_result(product_id, product, fields=None):
+    """Build the /api/product/<id> (body, status) for a product lookup result, projected to fields"""
+    if not product:
+        logger.warning(f"Product not found: {product_id}")
+        return {"error": "Product not found or failed to retrieve data"}, 404
+        
+    # Check for parse status code that indicates an error
+    if isinstance(product, dict) and product.get('parse_status_code') == 12003:
+        logger.warning(f"Product not found or unavailable: {product_id}")
+        return {"error": "Product not found on Amazon or is currently unavailable", "details": product}, 404
+        
+    return {"product": project(product, fields)}, 200
+
 @app.route('/scrape-products', methods=['POST'])
 def scrape_products():
     """Endpoint to scrape detailed product information for multiple products"""
     try:
         data = request.json
-        product_ids = data.get('product_ids', [])
-        
-        if not product_ids:
-            return jsonify({"error": "No product IDs provided"}), 400
+        try:
+            product_ids = scrape_request_ids(data)
+            fields = request_fields(data.get('fields') or request.args.get('fields'))
+        except RequestError as e:
+            return jsonify(e.body), e.status
         
-        logger.info(f"Scraping details for {len(product_ids)} products")
+        # Get details for all products concurrently, keeping request order
+        started = time.perf_counter()
+        batch_results = run_batch(get_product_details, product_ids, max_workers=SCRAPE_MAX_WORKERS)
         
-        # Limit the number of products that can be scraped at once
-        max_products = 10
-        if len(product_ids) > max_products:
-            logger.warning(f"Request for {len(product_ids)} products exceeded limit of {max_products}")
-            product_ids = product_ids[:max_products]
-        
-        # Get details for each product
-        results = []
-        for product_id in product_ids:
-            try:
-                logger.info(f"Scraping product ID: {product_id}")
-                product_details = get_product_details(product_id)
-                
-                # If we got valid results
-                if product_details:
-                    # Add the product ID to the results
-                    product_details['productId'] = product_id
-                    results.append(product_details)
-                else:
-                    # Add an error entry
-                    results.append({
-                        'productId': product_id,
-                        'error': 'Failed to retrieve product details',
-                        'title': f'Product {product_id}'
-                    })
-            except Exception as e:
-                logger.error(f"Error scraping product {product_id}: {str(e)}")
-                results.append({
-                    'productId': product_id,
-                    'error': f'Error: {str(e)}',
-                    'title': f'Product {product_id}'
-                })
-        
-        return jsonify({"results": results})
+        return jsonify(build_scrape_response(batch_results, started, fields))
         
     except Exception as e:
         logger.error(f"Error processing batch scrape request: {str(e)}")
         return jsonify({"error": f"Error processing request: {str(e)}"}), 500
 
+def scrape_request_ids(data):
+    """
+    Read the product IDs of a /scrape-products request, capped at SCRAPE_MAX_PRODUCTS
+    
+    Raises:
+        RequestError: If no product IDs were provided
+    """
+    product_ids = data.get('product_ids', [])
+    
+    if not product_ids:
+        raise RequestError({"error": "No product IDs provided"}, 400)
+    
+    logger.info(f"Scraping details for {len(product_ids)} products")
+    
+    # Limit the number of products that can be scraped at once
+    max_products = SCRAPE_MAX_PRODUCTS
+    if len(product_ids) > max_products:
+        logger.warning(f"Request for {len(product_ids)} products exceeded limit of {max_products}")
+        product_ids = product_ids[:max_products]
+    return product_ids
+
+def build_scrape_response(batch_results, started, fields=None):
+    """
+    Build the /scrape-products response body from batch results in request order
+    
+    Results are projected to fields before they are serialized or saved as a
+    result set, so neither carries payload parts the client did not ask for.
+    """
+    results = []
+    timings = []
+    for batch_result in batch_results:
+        product_id = batch_result['item']
+        timings.append({'productId': product_id, 'elapsed_ms': batch_result['elapsed_ms']})
+        results.append(project(build_scrape_result(product_id, batch_result['value'], batch_result['error']), fields))
+    
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    record_step('batch', total_ms / 1000)
+    logger.info(f"Scraped {len(results)} products in {total_ms} ms")
+    
+    return {
+        "results": results,
+        "result_set_id": result_store.save(results),
+        "timing": {"total_ms": total_ms, "items": timings}
+    }
+
+def build_scrape_result(product_id, product_details, error=None):
+    """Build the /scrape-products result entry for one product ID"""
+    if error:
+        logger.error(f"Error scraping product {product_id}: {error}")
+        return {
+            'productId': product_id,
+            'error': f'Error: {error}',
+            'title': f'Product {product_id}'
+        }
+    
+    if not product_details:
+        return {
+            'productId': product_id,
+            'error': 'Failed to retrieve product details',
+            'title': f'Product {product_id}'
+        }
+    
+    # Add the product ID to the results
+    return dict(product_details, productId=product_id)
+
+def scrape_product(product_id):
+    """Scrape a single product ID into a /scrape-products result entry"""
+    if not ASIN_RE.match(product_id or ''):
+        return build_scrape_result(product_id, None, 'Invalid product ID format')
+    return build_scrape_result(product_id, get_product_details(product_id))
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Submit a background scrape job for a large list of product IDs"""
+    data = request.get_json(silent=True) or {}
+    product_ids = data.get('product_ids', [])
+    
+    if not product_ids or not isinstance(product_ids, list):
+        return jsonify({"error": "No product IDs provided"}), 400
+    
+    if len(product_ids) > JOB_MAX_PRODUCTS:
+        return jsonify({"error": f"Too many product IDs (maximum {JOB_MAX_PRODUCTS})"}), 400
+    
+    job = job_manager.submit(product_ids)
+    return jsonify({
+        "job": job.to_dict(),
+        "status_url": f"/jobs/{job.id}",
+        "results_url": f"/jobs/{job.id}/results",
+        "stream_url": f"/jobs/{job.id}/stream"
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """Get the progress of a background scrape job, or cancel it"""
+    job = job_manager.cancel(job_id) if request.method == 'DELETE' else job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"job": job.to_dict()})
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """Page through the results of a background scrape job in completion order"""
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    results = job_manager.results(job_id, offset, limit)
+    return jsonify({
+        "job": job.to_dict(),
+        "results": results,
+        "next_offset": offset + len(results)
+    })
+
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def job_stream(job_id):
+    """Stream the results of a background scrape job as NDJSON as they finish"""
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    return Response(stream_with_context(job_manager.stream(job_id)), mimetype='application/x-ndjson')
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": f"Request too large (maximum {IMPORT_MAX_BYTES} bytes)"}), 413
+
+@app.route('/api/imports', methods=['POST'])
+def create_import():
+    """
+    Upload a CSV/XLSX file of ASINs or Amazon product URLs and import it in the background
+    
+    Form fields: file (required), format (ndjson or csv output), fields
+    (projection of NDJSON results) and column (ID column name or index).
+    """
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({"error": "No file uploaded"}), 400
+    try:
+        request_fields(request.form.get('fields'))
+        state = import_manager.create(
+            upload.stream, upload.filename, output=request.form.get('format', 'ndjson').lower(),
+            fields=request.form.get('fields') or None, column=request.form.get('column') or None,
+        )
+    except RequestError as e:
+        return jsonify(e.body), e.status
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 429
+    
+    return jsonify({
+        "import": state,
+        "status_url": f"/api/imports/{state['import_id']}",
+        "download_url": f"/api/imports/{state['import_id']}/download",
+    }), 202
+
+@app.route('/api/imports/<import_id>', methods=['GET', 'DELETE'])
+def import_status(import_id):
+    """Get the progress of an import, or stop it after the current chunk"""
+    state = import_manager.cancel(import_id) if request.method == 'DELETE' else import_manager.get(import_id)
+    if state is None:
+        return jsonify({"error": "Import not found"}), 404
+    return jsonify({"import": state})
+
+@app.route('/api/imports/<import_id>/resume', methods=['POST'])
+def resume_import(import_id):
+    """Resume an interrupted or cancelled import, skipping products already in its output"""
+    data = request.get_json(silent=True) or {}
+    try:
+        state = import_manager.start(import_id, retry_failed=bool(data.get('retry_failed')))
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 429
+    if state is None:
+        return jsonify({"error": "Import not found"}), 404
+    return jsonify({"import": state}), 202
+
+@app.route('/api/imports/<import_id>/download', methods=['GET'])
+def download_import(import_id):
+    """Download the results written so far by an import"""
+    state = import_manager.get(import_id)
+    if state is None:
+        return jsonify({"error": "Import not found"}), 404
+    path = import_manager.output_path(state)
+    if not os.path.exists(path):
+        return jsonify({"error": "No results yet"}), 404
+    mimetype = 'text/csv' if state['format'] == 'csv' else 'application/x-ndjson'
+    download_name = f"{os.path.splitext(state['filename'])[0]}_products.{state['format']}"
+    return send_file(os.path.abspath(path), mimetype=mimetype, as_attachment=True, download_name=download_name)
+
 def get_product_details(product_id):
     """
-    Get details for a specific Amazon product using Oxylabs API
+    Get details for a specific Amazon product, serving repeat lookups from cache
     
     Args:
         product_id (str): Amazon ASIN/product ID
     """
-    username = os.getenv("OXYLABS_USERNAME")
-    password = os.getenv("OXYLABS_PASSWORD")
+    cached = get_local_product(product_id)
+    if cached is not None:
+        return cached
     
-    logger.info(f"Getting details for product ID: {product_id}")
+    # Concurrent lookups for the same ASIN share one upstream call
+    return product_flight.do(product_id, load_product_details, product_id)
+
+def load_product_details(product_id):
+    """Fetch product details from upstream and store them in the product cache"""
+    return cache_product_details(product_id, fetch_product_details(product_id))
+
+def get_local_product(product_id):
+    """Return product details from the cache or a fresh catalog record, or None"""
+    cached = product_cache.get(product_id)
+    if cached is not None:
+        logger.info(f"Cache hit for product ID: {product_id}")
+        return cached
     
-    # Structure payload for Oxylabs API
-    payload = {
-        'source': 'amazon',
-        'domain': 'com',
-        'url': f'https://www.amazon.com/dp/{product_id}',
-        'parse': True
-    }
+    try:
+        stored = catalog.get(product_id, max_age=CATALOG_MAX_AGE)
+    except Exception as e:
+        logger.error(f"Catalog read failed for {product_id}: {str(e)}")
+        stored = None
+    if stored is not None:
+        logger.info(f"Catalog hit for product ID: {product_id}")
+        product_cache.set(product_id, stored)
+    return stored
+
+def get_local_products(product_ids):
+    """Return {product_id: details} for the products available from the cache or catalog"""
+    products = {}
+    missing = []
+    for product_id in product_ids:
+        cached = product_cache.get(product_id)
+        if cached is not None:
+            products[product_id] = cached
+        else:
+            missing.append(product_id)
+    if missing:
+        # Exports may read catalog records of any age
+        try:
+            products.update(catalog.get_many(missing))
+        except Exception as e:
+            logger.error(f"Catalog read failed: {str(e)}")
+    return products
+
+def cache_product_details(product_id, content):
+    """Store fetched product details in the product cache and catalog and return them"""
+    # Only cache successful lookups so unavailable products are retried
+    if content and not (isinstance(content, dict) and content.get('parse_status_code') == 12003):
+        product_cache.set(product_id, content)
+        try:
+            catalog.upsert(product_id, content)
+        except Exception as e:
+            logger.error(f"Catalog write failed for {product_id}: {str(e)}")
+        try:
+            history_store.record(product_id, content)
+        except Exception as e:
+            logger.error(f"History write failed for {product_id}: {str(e)}")
+    
+    return content
+
+def fetch_product_details(product_id):
+    """
+    Get details for a specific Amazon product using Oxylabs API
+    
+    Args:
+        product_id (str): Amazon ASIN/product ID
+    """
+    logger.info(f"Getting details for product ID: {product_id}")
     
     try:
-        logger.info(f"Sending request to Oxylabs API for product: {product_id}")
         # Get response
-        response = requests.request(
-            'POST',
-            'https://realtime.oxylabs.io/v1/queries',
-            auth=(username, password),
-            json=payload,
-        )
+        response = post_query(build_product_payload(product_id))
         
         response.raise_for_status()
-        logger.info(f"Response status code: {response.status_code}")
+        logger.debug(f"Response status code: {response.status_code}")
         
-        results = response.json()
-        logger.info(f"Response keys: {results.keys() if results else 'None'}")
-        
-        if not results or "results" not in results:
-            logger.warning("No results found in API response")
-            return None
-            
-        # Extract content from the response
-        if not results["results"] or "content" not in results["results"][0]:
-            logger.warning("No content in results")
-            return None
-        
-        content = results["results"][0]["content"]
-        logger.info(f"Product data retrieved successfully for ASIN: {product_id}")
-        
-        return content
+        return parse_product_response(response, product_id)
         
     except requests.exceptions.RequestException as e:
         logger.error(f"API Error occurred: {str(e)}")
@@ -580,7 +1201,80 @@ def get_product_details(product_id):
         logger.error(f"Error occurred: {str(e)}")
         return None
 
+def build_product_payload(product_id):
+    """Structure an amazon product payload for Oxylabs API"""
+    return {
+        'source': 'amazon',
+        'domain': 'com',
+        'url': f'https://www.amazon.com/dp/{product_id}',
+        'parse': True
+    }
+
+def parse_product_response(response, product_id):
+    """
+    Extract the parsed product content from an amazon API response
+    
+    Args:
+        response: requests or httpx response with a JSON body
+        product_id (str): Amazon ASIN/product ID, for logging
+    
+    Returns:
+        dict: Product content, or None if the response had no content
+    """
+    with timed(PARSE_TIME, step='parse', source='amazon'):
+        results = response.json()
+    
+    if not results or "results" not in results:
+        logger.warning("No results found in API response")
+        return None
+        
+    # Extract content from the response
+    if not results["results"] or "content" not in results["results"][0]:
+        logger.warning("No content in results")
+        return None
+    
+    content = results["results"][0]["content"]
+    logger.info(f"Product data retrieved successfully for ASIN: {product_id}")
+    
+    return content
+
+# Background scrape jobs for large product ID lists
+job_manager = JobManager(scrape_product)
+
+# Uploaded CSV/XLSX imports, processed in the background into files under IMPORT_DIR
+import_manager = ImportManager(scrape_product)
+
+# Keeps catalog records fresh by re-fetching only those older than CATALOG_MAX_AGE
+catalog_refresher = CatalogRefresher(catalog, load_product_details)
+
+# Re-scrapes watched products on their interval; changes land in history_store
+watch_scheduler = WatchScheduler(history_store, load_product_details)
+
+# Process that started the background threads. Importing the app starts no
+# threads, so a preloading master (gunicorn --preload) can fork workers safely;
+# each worker starts its own from gunicorn.conf.py's post_worker_init or its first request.
+_background_pid = None
+_background_lock = threading.Lock()
+
+def start_background_workers():
+    """Start the catalog refresher and watch scheduler once in this process"""
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        catalog_refresher.start()
+        watch_scheduler.start()
+        _background_pid = os.getpid()
+
+@app.before_request
+def ensure_background_workers():
+    if _background_pid != os.getpid():
+        start_background_workers()
+
 if __name__ == '__main__':
+    start_background_workers()
     try:
         app.run(debug=True, port=5004)
     except Exception as e:
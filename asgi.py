@@ -0,0 +1,389 @@
+"""
+ASGI entrypoint serving the upstream-bound routes on asyncio
+
+    hypercorn asgi:application --bind 0.0.0.0:$PORT
+
+POST /search, GET /api/product/<id> and POST /scrape-products run as Quart
+coroutines over an asyncio Oxylabs client, so a waiting upstream call holds
+no thread and one process serves hundreds of them concurrently. Every other
+route is the unchanged Flask app, mounted through a WSGI adapter thread pool.
+Request and response contracts are the same as under gunicorn app:app.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+import httpx
+from a2wsgi import WSGIMiddleware
+from quart import Quart, request, jsonify, Response, g
+from batch import iter_batch_async, run_batch_async
+from product_store import ProductStore
+from metrics import start_breakdown, server_timing_header, timed, REQUEST_LATENCY, PARSE_TIME
+from oxylabs_client import post_query_async, get_source_breaker, close_async_client, UpstreamUnavailableError, CONNECT_TIMEOUT
+from retailers import iter_sources_async, run_sources_async, merge_listings, source_statuses, RETAILER_SEARCH_TIMEOUT
+from export import EXPORT_FORMATS
+from parsing import ASIN_RE
+from fast_json import dumps as json_dumps, install_json_provider
+from compression import CompressionMiddleware
+from app import (
+    app as flask_app, RequestError, INVALID_PRODUCT_ID_ERROR, SEARCH_CACHE_TTL,
+    SCRAPE_MAX_WORKERS, TIMING_HEADER, get_local_product, search_cache, result_store,
+    product_flight, search_flight, normalize_query, search_cache_key, dedupe_page,
+    get_search_memo, is_fresh_memo, claim_search_refresh, release_search_refresh, memoize_search_store,
+    store_search_listings, build_search_payload, parse_search_response,
+    build_product_payload, parse_product_response, cache_product_details, product_api_result,
+    scrape_request_ids, build_scrape_response, request_fields, search_filters, prepare_export,
+    search_sources, is_amazon_only, retailer_cache_key, start_background_workers,
+)
+
+logger = logging.getLogger(__name__)
+
+# Threads serving the Flask routes (exports, jobs, metrics, pages)
+WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "10"))
+
+# Upstream lookups one /scrape-products request may run at once
+ASYNC_SCRAPE_CONCURRENCY = int(os.getenv("ASYNC_SCRAPE_CONCURRENCY", str(SCRAPE_MAX_WORKERS)))
+
+# (method, path) pairs served natively on asyncio; everything else goes to Flask
+ASYNC_ROUTES = (
+    ('POST', re.compile(r'^/search$')),
+    ('GET', re.compile(r'^/api/product/[^/]+$')),
+    ('POST', re.compile(r'^/scrape-products$')),
+)
+
+async_app = Quart(__name__)
+install_json_provider(async_app)
+compressed_async_app = CompressionMiddleware(async_app)
+wsgi_app = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+# Background refreshes of stale search entries; referenced so they are not collected
+_refresh_tasks = set()
+
+
+async def fetch_search_listings(query, domain='com', zip_code='90210', page=1):
+    """Async counterpart of app.fetch_search_listings"""
+    logger.info(f"Searching for: {query} (page {page})")
+    try:
+        response = await post_query_async(build_search_payload(query, domain, zip_code, page))
+        response.raise_for_status()
+        return parse_search_response(response)
+    except (httpx.HTTPError, UpstreamUnavailableError) as e:
+        logger.error(f"API Error occurred: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}")
+        return None
+
+
+async def refresh_search_listings(cache_key, query, domain, zip_code, page=1):
+    """Fetch search listings from upstream and store them in the search cache"""
+    listings = await fetch_search_listings(query, domain, zip_code, page)
+    return await asyncio.to_thread(store_search_listings, cache_key, listings)
+
+
+def refresh_search_listings_background(cache_key, query, domain, zip_code, page=1):
+    """Refresh a stale search cache entry in a background task, once per key"""
+    if not claim_search_refresh(cache_key):
+        return
+
+    async def refresh():
+        try:
+            await search_flight.do_async(cache_key, refresh_search_listings, cache_key, query, domain, zip_code, page)
+        except Exception as e:
+            logger.error(f"Background search refresh failed for '{query}': {str(e)}")
+        finally:
+            release_search_refresh(cache_key)
+
+    task = asyncio.ensure_future(refresh())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+async def get_search_store(query, domain='com', zip_code='90210', page=1):
+    """Async counterpart of app.get_search_store, sharing its memo and cache"""
+    query = normalize_query(query)
+    cache_key = search_cache_key(query, domain, zip_code, page)
+
+    memo = get_search_memo(cache_key)
+    if is_fresh_memo(memo):
+        return memo[1]
+
+    # The cache may be backed by SQLite or Redis; neither is read on the event loop
+    entry = await asyncio.to_thread(search_cache.get, cache_key)
+    if entry is not None:
+        age = time.time() - entry['fetched_at']
+        if age > SEARCH_CACHE_TTL:
+            logger.info(f"Serving stale search results for '{query}' ({age:.0f}s old)")
+            refresh_search_listings_background(cache_key, query, domain, zip_code, page)
+    else:
+        entry = await search_flight.do_async(
+            cache_key, refresh_search_listings, cache_key, query, domain, zip_code, page
+        )
+    return memoize_search_store(cache_key, entry, memo)
+
+
+def page_fetcher(query, domain, zip_code):
+    async def fetch_page(page):
+        return (await get_search_store(query, domain, zip_code, page=page)).rows
+    return fetch_page
+
+
+async def iter_search_pages(query, pages, domain='com', zip_code='90210'):
+    """Async counterpart of app.iter_search_pages, yielding pages as they arrive"""
+    page_numbers = list(range(1, pages + 1))
+    seen = set()
+    position = 0
+    fetch_page = page_fetcher(query, domain, zip_code)
+    async for index, result in iter_batch_async(fetch_page, page_numbers, max_concurrency=pages):
+        products = dedupe_page(result['value'], seen, position)
+        position += len(products)
+        yield page_numbers[index], products
+
+
+async def search_products(query, min_price=None, max_price=None, sort_by=None, domain='com',
+                          zip_code='90210', pages=1):
+    """Async counterpart of app.search_products"""
+    if pages > 1:
+        # Dedupe in page order so positions match the synchronous app
+        batch_results = await run_batch_async(
+            page_fetcher(query, domain, zip_code), range(1, pages + 1), max_concurrency=pages
+        )
+        seen = set()
+        merged = []
+        for result in batch_results:
+            merged.extend(dedupe_page(result['value'], seen, len(merged)))
+        store = ProductStore(merged)
+    else:
+        store = await get_search_store(query, domain, zip_code)
+    return store.query(min_price, max_price, sort_by)
+
+
+async def stream_search_pages(query, pages, min_price=None, max_price=None):
+    """Async counterpart of app.stream_search_pages"""
+    all_products = []
+    async for page, products in iter_search_pages(query, pages):
+        products = ProductStore(products).query(min_price, max_price)
+        all_products.extend(products)
+        yield json_dumps({"page": page, "results": products}) + "\n"
+
+    result_set_id = await asyncio.to_thread(result_store.save, all_products) if all_products else None
+    yield json_dumps({"done": True, "pages": pages, "total": len(all_products), "result_set_id": result_set_id}) + "\n"
+
+
+async def get_source_listings(source, query, zip_code='90210'):
+    """Async counterpart of app.get_source_listings, sharing its cache keys"""
+    if source.oxylabs_source == 'amazon_search':
+        return (await get_search_store(query, zip_code=zip_code)).rows
+    cache_key = retailer_cache_key(source, query)
+    entry = await asyncio.to_thread(search_cache.get, cache_key)
+    if entry is None or time.time() - entry['fetched_at'] > SEARCH_CACHE_TTL:
+        entry = await search_flight.do_async(cache_key, refresh_source_listings, cache_key, source, query)
+    return entry['listings'] if entry else []
+
+
+async def refresh_source_listings(cache_key, source, query):
+    """Async counterpart of app.refresh_source_listings"""
+    logger.info(f"Searching {source.name} for: {query}")
+    response = await post_query_async(source.build_payload(query), timeout=(CONNECT_TIMEOUT, RETAILER_SEARCH_TIMEOUT),
+                                      retries=0, breaker=get_source_breaker(source.oxylabs_source))
+    response.raise_for_status()
+    with timed(PARSE_TIME, step='parse', source=source.oxylabs_source):
+        listings = source.parse(response.json())
+    logger.info(f"Extracted {len(listings)} products from {source.name}")
+    return await asyncio.to_thread(store_search_listings, cache_key, listings)
+
+
+async def multi_search_products(query, sources, min_price=None, max_price=None, sort_by=None):
+    """Async counterpart of app.multi_search_products; timed-out sources are cancelled"""
+    async def fetch(source):
+        return await get_source_listings(source, query)
+    merged, statuses = await run_sources_async(fetch, sources)
+    return ProductStore(merged).query(min_price, max_price, sort_by), statuses
+
+
+async def stream_source_results(query, sources, min_price=None, max_price=None):
+    """Async counterpart of app.stream_source_results"""
+    async def fetch(source):
+        return await get_source_listings(source, query)
+    seen = set()
+    all_products = []
+    results = []
+    async for result in iter_sources_async(fetch, sources):
+        products = merge_listings([result['value'] or []], seen, len(all_products))
+        products = ProductStore(products).query(min_price, max_price)
+        all_products.extend(products)
+        results.append(result)
+        yield json_dumps({"source": result['source'], "status": result['status'], "results": products}) + "\n"
+
+    result_set_id = await asyncio.to_thread(result_store.save, all_products) if all_products else None
+    yield json_dumps({
+        "done": True, "total": len(all_products), "result_set_id": result_set_id, "sources": source_statuses(results)
+    }) + "\n"
+
+
+async def fetch_product_details(product_id):
+    """Async counterpart of app.fetch_product_details"""
+    logger.info(f"Getting details for product ID: {product_id}")
+    try:
+        response = await post_query_async(build_product_payload(product_id))
+        response.raise_for_status()
+        return parse_product_response(response, product_id)
+    except (httpx.HTTPError, UpstreamUnavailableError) as e:
+        logger.error(f"API Error occurred: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}")
+        return None
+
+
+async def load_product_details(product_id):
+    """Fetch product details from upstream and store them in the product cache"""
+    content = await fetch_product_details(product_id)
+    # Catalog and history writes wait on SQLite locks; keep them off the event loop
+    return await asyncio.to_thread(cache_product_details, product_id, content)
+
+
+async def get_product_details(product_id):
+    """Async counterpart of app.get_product_details, sharing its cache and catalog"""
+    cached = await asyncio.to_thread(get_local_product, product_id)
+    if cached is not None:
+        return cached
+    return await product_flight.do_async(product_id, load_product_details, product_id)
+
+
+@async_app.route('/search', methods=['POST'])
+async def search():
+    try:
+        form = await request.form
+        query = form.get('query', '')
+        format_type = form.get('format', 'json')
+
+        # Exports are CPU bound; build them off the event loop
+        if format_type.lower() in EXPORT_FORMATS:
+            try:
+                chunks, file_name, mimetype = await asyncio.to_thread(prepare_export, form)
+            except RequestError as e:
+                return jsonify(e.body), e.status
+            response = Response(chunks, mimetype=mimetype)
+            response.headers.set('Content-Disposition', 'attachment', filename=file_name)
+            return response
+
+        if not query:
+            return jsonify({"error": "Query parameter is required"}), 400
+
+        logger.info(f"Searching for: {query}")
+        min_price, max_price, sort_by, pages = search_filters(form)
+        try:
+            sources = search_sources(form)
+        except RequestError as e:
+            return jsonify(e.body), e.status
+
+        if not is_amazon_only(sources):
+            if format_type.lower() == 'ndjson':
+                return Response(stream_source_results(query, sources, min_price, max_price), mimetype='application/x-ndjson')
+            results, statuses = await multi_search_products(query, sources, min_price, max_price, sort_by)
+            if not results:
+                return jsonify({"message": "No results found. Please try a different search term.", "sources": statuses}), 404
+            result_set_id = await asyncio.to_thread(result_store.save, results)
+            return jsonify({"results": results, "result_set_id": result_set_id, "sources": statuses})
+
+        if format_type.lower() == 'ndjson':
+            return Response(stream_search_pages(query, pages, min_price, max_price), mimetype='application/x-ndjson')
+
+        results = await search_products(query, min_price=min_price, max_price=max_price, sort_by=sort_by, pages=pages)
+
+        if not results:
+            return jsonify({"message": "No results found. Please try a different search term."}), 404
+
+        return jsonify({"results": results, "result_set_id": await asyncio.to_thread(result_store.save, results)})
+
+    except Exception as e:
+        logger.error(f"Error in search: {str(e)}")
+        return jsonify({"error": f"Error processing search: {str(e)}"}), 500
+
+
+@async_app.route('/api/product/<product_id>', methods=['GET'])
+async def product_details_api(product_id):
+    try:
+        logger.info(f"Received request for product ID: {product_id}")
+        if not ASIN_RE.match(product_id):
+            logger.warning(f"Invalid product ID format: {product_id}")
+            return jsonify({"error": INVALID_PRODUCT_ID_ERROR}), 400
+
+        try:
+            fields = request_fields(request.args.get('fields'))
+        except RequestError as e:
+            return jsonify(e.body), e.status
+
+        body, status = product_api_result(product_id, await get_product_details(product_id), fields)
+        return jsonify(body), status
+
+    except Exception as e:
+        logger.error(f"Error getting product details: {str(e)}")
+        return jsonify({"error": f"Error getting product details: {str(e)}"}), 500
+
+
+@async_app.route('/scrape-products', methods=['POST'])
+async def scrape_products():
+    try:
+        data = await request.get_json()
+        try:
+            product_ids = scrape_request_ids(data)
+            fields = request_fields(data.get('fields') or request.args.get('fields'))
+        except RequestError as e:
+            return jsonify(e.body), e.status
+
+        started = time.perf_counter()
+        batch_results = await run_batch_async(get_product_details, product_ids, max_concurrency=ASYNC_SCRAPE_CONCURRENCY)
+
+        return jsonify(build_scrape_response(batch_results, started, fields))
+
+    except Exception as e:
+        logger.error(f"Error processing batch scrape request: {str(e)}")
+        return jsonify({"error": f"Error processing request: {str(e)}"}), 500
+
+
+@async_app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+    start_breakdown()
+
+
+@async_app.after_request
+async def record_request_metrics(response):
+    # Same CORS policy as flask_cors applies to the Flask routes
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_LATENCY.observe(elapsed, route=route, method=request.method, status=response.status_code)
+
+    if TIMING_HEADER or request.headers.get('X-Timing'):
+        response.headers['Server-Timing'] = server_timing_header(elapsed)
+    return response
+
+
+@async_app.before_serving
+async def startup():
+    # Once per server process, not at import
+    start_background_workers()
+
+
+@async_app.after_serving
+async def shutdown():
+    await close_async_client()
+
+
+async def application(scope, receive, send):
+    """Dispatch upstream-bound routes to the async app and the rest to Flask"""
+    if scope['type'] == 'http':
+        method = scope['method']
+        path = scope['path']
+        if not any(method == route_method and pattern.match(path) for route_method, pattern in ASYNC_ROUTES):
+            await wsgi_app(scope, receive, send)
+            return
+    # Flask compresses its own responses in an after_request hook
+    await compressed_async_app(scope, receive, send)
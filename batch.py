@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+# Default number of upstream lookups allowed in flight at once
+DEFAULT_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "5"))
+
+
+def _timed_call(func, item):
+    """Call func(item) and capture its value, error and elapsed time"""
+    started = time.perf_counter()
+    value = None
+    error = None
+    try:
+        value = func(item)
+    except Exception as e:
+        logger.error(f"Batch item {item} failed: {str(e)}")
+        error = str(e)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    return {'item': item, 'value': value, 'error': error, 'elapsed_ms': elapsed_ms}
+
+
+def iter_batch(func, items, max_workers=None):
+    """
+    Run func over items concurrently and yield results as they complete
+
+    Args:
+        func (callable): Function called with a single item
+        items (list): Items to process
+        max_workers (int, optional): Maximum number of calls in flight
+
+    Yields:
+        tuple: (index, result) where result is a dict with item, value, error
+        and elapsed_ms keys
+    """
+    items = list(items)
+    if not items:
+        return
+    workers = max(1, min(max_workers or DEFAULT_MAX_WORKERS, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Run each call in a copy of the caller's context, so its step timings reach the request's breakdown
+        futures = {
+            executor.submit(contextvars.copy_context().run, _timed_call, func, item): i
+            for i, item in enumerate(items)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def run_batch(func, items, max_workers=None):
+    """
+    Run func over items concurrently, keeping results in input order
+
+    Args:
+        func (callable): Function called with a single item
+        items (list): Items to process
+        max_workers (int, optional): Maximum number of calls in flight
+
+    Returns:
+        list: One result dict per item (item, value, error, elapsed_ms)
+    """
+    items = list(items)
+    results = [None] * len(items)
+    for index, result in iter_batch(func, items, max_workers=max_workers):
+        results[index] = result
+    return results
+
+
+async def _timed_call_async(func, item, semaphore):
+    """Await func(item) under the semaphore and capture its value, error and elapsed time"""
+    async with semaphore:
+        started = time.perf_counter()
+        value = None
+        error = None
+        try:
+            value = await func(item)
+        except Exception as e:
+            logger.error(f"Batch item {item} failed: {str(e)}")
+            error = str(e)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        return {'item': item, 'value': value, 'error': error, 'elapsed_ms': elapsed_ms}
+
+
+async def iter_batch_async(func, items, max_concurrency=None):
+    """
+    Await a coroutine function over items concurrently, yielding results as they complete
+
+    Args:
+        func (callable): Coroutine function called with a single item
+        items (list): Items to process
+        max_concurrency (int, optional): Maximum number of calls in flight
+
+    Yields:
+        tuple: (index, result) with the same result dicts as iter_batch
+    """
+    import asyncio
+    items = list(items)
+    if not items:
+        return
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or DEFAULT_MAX_WORKERS))
+
+    async def indexed(i, item):
+        return i, await _timed_call_async(func, item, semaphore)
+
+    tasks = [asyncio.ensure_future(indexed(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer stopped early (e.g. the client disconnected)
+        for task in tasks:
+            task.cancel()
+
+
+async def run_batch_async(func, items, max_concurrency=None):
+    """
+    Await a coroutine function over items concurrently, keeping results in input order
+
+    Returns:
+        list: One result dict per item (item, value, error, elapsed_ms)
+    """
+    items = list(items)
+    results = [None] * len(items)
+    async for index, result in iter_batch_async(func, items, max_concurrency=max_concurrency):
+        results[index] = result
+    return results
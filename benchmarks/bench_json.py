@@ -0,0 +1,97 @@
+"""
+Benchmark JSON serialization and response compression on recorded payloads
+
+Usage:
+    python benchmarks/bench_json.py [response.json ...] [--rows 50] [--repeat 50]
+
+Each payload file is a raw Oxylabs amazon_product response (the repo's
+response.json by default). Bodies are built the way the routes build
+them: a /scrape-products response with --rows full product payloads,
+the same rows projected to the grid preset, and a search page of
+synthesized listings. For each body the stdlib and orjson encode times
+and the identity, gzip and brotli sizes are reported. Rows cycle through
+the recorded payloads, so with a single file the compression ratios of
+the scrape bodies are optimistic.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fast_json import orjson, default as json_default, _ORJSON_OPTIONS
+from compression import Compressor, brotli
+from projection import parse_fields, project
+from parsing import parse_listings
+from mock_oxylabs import make_search_content
+
+
+def load_products(paths):
+    products = []
+    for path in paths:
+        with open(path) as f:
+            for result in json.load(f).get('results', []):
+                content = result.get('content', result)
+                if isinstance(content, dict):
+                    products.append(content)
+    return products
+
+
+def build_bodies(products, rows):
+    results = [dict(products[i % len(products)], productId=f'B0BENCH{i:04d}') for i in range(rows)]
+    grid = parse_fields('grid')
+    listings = []
+    for page in range(1, 6):
+        listings.extend(parse_listings(make_search_content('benchmark query', page)['results']['organic']))
+    return {
+        'scrape (full)': {'results': results, 'result_set_id': 'bench'},
+        'scrape (grid)': {'results': [project(r, grid) for r in results], 'result_set_id': 'bench'},
+        'search listings': {'results': listings, 'result_set_id': 'bench'},
+    }
+
+
+def median_time(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON encoding and response compression')
+    parser.add_argument('payloads', nargs='*', help='Recorded amazon_product response files')
+    parser.add_argument('--rows', type=int, default=50, help='Products per scrape response')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    products = load_products(args.payloads or [os.path.join(ROOT, 'response.json')])
+    if not products:
+        parser.error('no product payloads found')
+
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    for name, body in build_bodies(products, args.rows).items():
+        encoded = json.dumps(body, sort_keys=True, separators=(',', ':'), default=json_default).encode('utf-8')
+        print(f"{name}: {len(encoded) / 1024:,.1f} KB")
+
+        stdlib = median_time(lambda: json.dumps(body, sort_keys=True, separators=(',', ':'), default=json_default), args.repeat)
+        line = f"  encode  stdlib {stdlib * 1000:.2f} ms"
+        if orjson is not None:
+            fast = median_time(lambda: orjson.dumps(body, default=json_default, option=_ORJSON_OPTIONS), args.repeat)
+            line += f", orjson {fast * 1000:.2f} ms ({stdlib / fast:.1f}x)"
+        print(line)
+
+        for encoding in encodings:
+            compressed = Compressor(encoding).finish(encoded)
+            elapsed = median_time(lambda: Compressor(encoding).finish(encoded), args.repeat)
+            print(f"  {encoding:>6}  {len(compressed) / 1024:,.1f} KB "
+                  f"({len(compressed) / len(encoded):.0%} of identity), {elapsed * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark the slot-backed Listing model against the listing dicts it replaced
+
+Usage:
+    python benchmarks/bench_model.py [--listings 5000] [--repeat 20]
+
+Listings are parsed from synthesized amazon_search pages. Reported per
+representation: memory held per listing (tracemalloc), response encoding
+time alone and together with the result set write of a search, search
+cache entry size and write/read round trip, and export row building
+time. The dict numbers reproduce the previous code path: a 13-key dict
+per listing, stored in the cache with the stdlib json module.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsing import parse_listings, COLUMNS
+from product_model import Listing, pack_listings, unpack_listings
+from fast_json import dumps as json_dumps, loads as json_loads
+from export import iter_values, resolve_columns
+from mock_oxylabs import make_search_content
+
+
+def build_listings(count):
+    listings = []
+    page = 1
+    while len(listings) < count:
+        items = make_search_content(f'benchmark query {page}', page)['results']['organic']
+        listings.extend(parse_listings(items))
+        page += 1
+    return [listing.with_position(i) for i, listing in enumerate(listings[:count], 1)]
+
+
+def held_bytes(build):
+    """Bytes still allocated by build() once it returns (the objects it built)"""
+    tracemalloc.start()
+    value = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, value
+
+
+def median_time(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Listing model against listing dicts')
+    parser.add_argument('--listings', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    listings = build_listings(args.listings)
+    # The dicts parse_item used to build, in their key order
+    dicts = [dict(zip(COLUMNS, listing.to_row())) for listing in listings]
+    assert [Listing.from_dict(d).to_dict() for d in dicts] == dicts
+
+    dict_bytes, dict_copies = held_bytes(lambda: [dict(d, price=''.join(d['price'])) for d in dicts])
+    model_bytes, model_copies = held_bytes(lambda: [Listing.from_dict(d) for d in dicts])
+    print(f"{len(listings)} listings")
+    print(f"  memory   dicts {dict_bytes / len(dicts):.0f} B/listing, "
+          f"Listing {model_bytes / len(listings):.0f} B/listing ({model_bytes / dict_bytes:.0%})")
+    del dict_copies, model_copies
+
+    stages = {
+        'encode (response)': (
+            lambda: json_dumps({'results': dicts}),
+            lambda: json_dumps({'results': listings}),
+        ),
+        'search response': (
+            # jsonify plus result_store.save of the same listings
+            lambda: (json_dumps({'results': dicts}), json.dumps(dicts, separators=(',', ':'))),
+            lambda: (json_dumps({'results': listings}), json_dumps(pack_listings(listings))),
+        ),
+        'cache write': (
+            lambda: json.dumps({'fetched_at': 0, 'listings': dicts}, separators=(',', ':')),
+            lambda: json_dumps({'fetched_at': 0, 'listings': pack_listings(listings)}),
+        ),
+        'cache read': (
+            lambda raw=json.dumps({'fetched_at': 0, 'listings': dicts}): json.loads(raw),
+            lambda raw=json_dumps({'fetched_at': 0, 'listings': pack_listings(listings)}):
+                unpack_listings(json_loads(raw)['listings']),
+        ),
+        'export rows': (
+            lambda: list(iter_values(dicts, resolve_columns(dicts))),
+            lambda: list(iter_values(listings, resolve_columns(listings))),
+        ),
+    }
+    for stage, (old, new) in stages.items():
+        old_time = median_time(old, args.repeat)
+        new_time = median_time(new, args.repeat)
+        print(f"  {stage:<17} dicts {old_time * 1000:.2f} ms, Listing {new_time * 1000:.2f} ms "
+              f"({old_time / new_time:.1f}x)")
+
+    old_entry = json.dumps({'fetched_at': 0, 'listings': dicts}, separators=(',', ':'))
+    new_entry = json_dumps({'fetched_at': 0, 'listings': pack_listings(listings)})
+    print(f"  cache entry size  dicts {len(old_entry) / 1024:,.0f} KB, packed rows {len(new_entry) / 1024:,.0f} KB "
+          f"({len(new_entry) / len(old_entry):.0%})")
+
+
+if __name__ == '__main__':
+    main()
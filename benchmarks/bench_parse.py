@@ -0,0 +1,61 @@
+"""
+Benchmark the amazon_search organic parser on recorded payloads
+
+Usage:
+    python benchmarks/bench_parse.py [payload.json ...] [--pages 20] [--repeat 50]
+
+Each payload file is a raw Oxylabs amazon_search response. Without files,
+synthesized pages from mock_oxylabs are used.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsing import parse_listings, extract_organic_items
+from mock_oxylabs import make_search_content
+
+
+def load_items(paths, pages):
+    """Collect organic items from payload files or synthesized pages"""
+    items = []
+    if paths:
+        for path in paths:
+            with open(path) as f:
+                items.extend(extract_organic_items(json.load(f)))
+    else:
+        for page in range(1, pages + 1):
+            items.extend(make_search_content('benchmark query', page)['results']['organic'])
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark amazon_search result parsing')
+    parser.add_argument('payloads', nargs='*', help='Recorded amazon_search response files')
+    parser.add_argument('--pages', type=int, default=20, help='Synthesized pages when no files are given')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    items = load_items(args.payloads, args.pages)
+    print(f"Parsing {len(items)} organic items x {args.repeat}")
+
+    stages = {'parse_listings': parse_listings}
+    timings = {stage: [] for stage in stages}
+    for _ in range(args.repeat):
+        for stage, func in stages.items():
+            started = time.perf_counter()
+            func(items)
+            timings[stage].append(time.perf_counter() - started)
+
+    for stage, samples in timings.items():
+        samples.sort()
+        median = samples[len(samples) // 2]
+        rate = len(items) / median if median else float('inf')
+        print(f"{stage:>16}: median {median * 1000:.2f} ms, {rate:,.0f} items/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark bulk product URL resolution against the per-link helpers it replaced
+
+Usage:
+    python benchmarks/bench_resolve.py [urls.txt] [--count 10000] [--repeat 5]
+
+Without a file, a synthetic list mixing the four retailers, tracking
+parameters, unknown hosts and malformed links is generated. The legacy_*
+functions are verbatim copies of the app.py helpers before the resolver,
+and every link is checked to resolve to the same canonical URL and
+validation result.
+"""
+import os
+import re
+import sys
+import time
+import random
+import string
+import argparse
+from functools import lru_cache
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from url_resolver import UrlResolver, check_url
+
+RETAILER_PATTERNS = {
+    'amazon.com': {'pattern': 'https://www.amazon.com/dp/{product_id}', 'id_regex': r'/dp/([A-Z0-9]{10})'},
+    'walmart.com': {'pattern': 'https://www.walmart.com/ip/{product_id}', 'id_regex': r'/ip/(\d+)'},
+    'bestbuy.com': {'pattern': 'https://www.bestbuy.com/site/{product_id}', 'id_regex': r'/site/([A-Za-z0-9-]+)'},
+    'target.com': {'pattern': 'https://www.target.com/p/{product_id}', 'id_regex': r'/p/([A-Za-z0-9-]+)'},
+}
+
+
+@lru_cache(maxsize=1000)
+def legacy_get_retailer_pattern(domain):
+    for retailer_domain, pattern in RETAILER_PATTERNS.items():
+        if retailer_domain in domain.lower():
+            return pattern
+    return None
+
+
+def legacy_get_retailer_specific_url(product):
+    source = product.get('source', '').lower()
+    link = product.get('link', '')
+    pattern = legacy_get_retailer_pattern(source)
+    if pattern:
+        match = re.search(pattern['id_regex'], link)
+        if match:
+            return pattern['pattern'].format(product_id=match.group(1))
+    return None
+
+
+def legacy_validate_url(url):
+    try:
+        result = urlparse(url)
+        checks = {
+            'has_scheme': bool(result.scheme),
+            'has_netloc': bool(result.netloc),
+            'valid_scheme': result.scheme in ['http', 'https'],
+            'has_path': bool(result.path),
+            'no_fragments': not result.fragment,
+            'valid_chars': all(c in string.printable for c in url)
+        }
+        is_valid = all(checks.values())
+        return {
+            'is_valid': is_valid,
+            'checks': checks,
+            'error': None if is_valid else 'URL validation failed: ' + ', '.join(k for k, v in checks.items() if not v)
+        }
+    except Exception as e:
+        return {'is_valid': False, 'checks': {}, 'error': str(e)}
+
+
+def legacy_extract_domain(url):
+    try:
+        return urlparse(url).netloc.lower()
+    except Exception:
+        return None
+
+
+def synthetic_links(count, seed=7):
+    rng = random.Random(seed)
+    makers = (
+        lambda n: f'https://www.amazon.com/Some-Product-Name/dp/B{n:09d}/ref=sr_1_{n % 48}?keywords=ipad&qid={n}',
+        lambda n: f'https://www.walmart.com/ip/Product-{n}/{100000 + n}?athbdg=L1600',
+        lambda n: f'https://www.bestbuy.com/site/product-{n}/{6400000 + n}.p?skuId={6400000 + n}',
+        lambda n: f'https://www.target.com/p/product-{n}/-/A-{80000000 + n}#lnk=sametab',
+        lambda n: f'https://shop.example.com/item/{n}',
+        lambda n: f'/dp/B{n:09d}',
+        lambda n: f'https://www.amazon.com/dp/B{n:09d} ',
+    )
+    weights = (50, 15, 10, 10, 8, 4, 3)
+    return [rng.choices(makers, weights)[0](rng.randrange(count)) for _ in range(count)]
+
+
+def legacy_resolve(links):
+    results = []
+    for link in links:
+        source = legacy_extract_domain(link) or ''
+        results.append((legacy_get_retailer_specific_url({'link': link, 'source': source}), legacy_validate_url(link)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bulk product URL resolution')
+    parser.add_argument('urls', nargs='?', help='File with one product link per line')
+    parser.add_argument('--count', type=int, default=10000, help='Synthetic links when no file is given')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.urls:
+        with open(args.urls) as f:
+            links = [line.strip() for line in f if line.strip()]
+    else:
+        links = synthetic_links(args.count)
+
+    expected = legacy_resolve(links)
+    actual = UrlResolver(RETAILER_PATTERNS).resolve_many(links)
+    mismatches = sum(
+        1 for (url, validation), result in zip(expected, actual)
+        if url != result['canonical_url'] or validation != result['validation']
+    )
+    print(f"Resolving {len(links)} links x {args.repeat} ({mismatches} results differ from the legacy helpers)")
+
+    stages = {
+        'legacy helpers': lambda: legacy_resolve(links),
+        'resolve_many': lambda: UrlResolver(RETAILER_PATTERNS).resolve_many(links),
+        'validation only (legacy)': lambda: [legacy_validate_url(link) for link in links],
+        'validation only (check_url)': lambda: [check_url(link) for link in links],
+    }
+    for stage, func in stages.items():
+        samples = []
+        for _ in range(args.repeat):
+            legacy_get_retailer_pattern.cache_clear()
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        median = samples[len(samples) // 2]
+        print(f"{stage:>28}: median {median * 1000:.1f} ms, {len(links) / median:,.0f} links/s")
+
+
+if __name__ == '__main__':
+    main()
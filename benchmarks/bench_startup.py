@@ -0,0 +1,246 @@
+"""
+Benchmark worker cold start: import time, first request and memory per worker
+
+Usage:
+    python benchmarks/bench_startup.py [--modules app,asgi] [--runs 5] [--workers 4]
+        [--root /path/to/checkout] [--output startup.json] [--compare baseline.json]
+
+Every run imports the entrypoint in a fresh interpreter, the way a newly
+booted or autoscaled worker does, and reports the process wall time, the
+import time, the first request and the RSS afterwards. With --workers the
+Flask app is then run as N forked workers, once with the app imported
+before the fork (gunicorn --preload) and once imported by every worker,
+and each worker's RSS, PSS (shared pages split between the processes
+sharing them) and private memory are read from /proc.
+
+To measure before and after a change, point --root at a checkout of the
+old tree (e.g. `git worktree add /tmp/before HEAD~1`), save it with
+--output and rerun on the new tree with --compare.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the fresh interpreter: import the entrypoint, send one request, report
+COLD_START = """
+import json, sys, time
+started = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter()
+first_request_ms = None
+if sys.argv[1] == 'app':
+    module.app.test_client().get('/metrics').get_data()
+    first_request_ms = (time.perf_counter() - imported) * 1000
+sys.path.insert(0, sys.argv[2])
+from bench_startup import read_memory
+print(json.dumps(dict(read_memory(), import_ms=(imported - started) * 1000,
+                      first_request_ms=first_request_ms, modules=len(sys.modules))))
+"""
+
+# Runs in the fresh interpreter: fork workers that each serve one request, then wait
+FORK_WORKERS = """
+import os, sys, time
+preload = sys.argv[1] == 'preload'
+workers = int(sys.argv[2])
+if preload:
+    import app
+pids = []
+for _ in range(workers):
+    pid = os.fork()
+    if pid == 0:
+        import app
+        app.app.test_client().get('/metrics').get_data()
+        os.write(1, b'ready\\n')
+        time.sleep(600)
+        os._exit(0)
+    pids.append(pid)
+print(' '.join(map(str, pids)), flush=True)
+time.sleep(600)
+"""
+
+
+def read_memory(pid='self'):
+    """
+    Read a process's memory use from /proc
+
+    Args:
+        pid (int or str, optional): Process ID, defaults to the calling process
+
+    Returns:
+        dict: rss_mb, pss_mb and private_mb (None where /proc does not report them)
+    """
+    fields = {}
+    for name in ('status', 'smaps_rollup'):
+        try:
+            with open(f'/proc/{pid}/{name}') as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    parts = value.split()
+                    if len(parts) == 2 and parts[1] == 'kB':
+                        fields[key] = int(parts[0]) / 1024
+        except OSError:
+            pass
+    if 'VmRSS' not in fields and pid == 'self':
+        import resource
+        fields['VmRSS'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    private = None
+    if 'Private_Clean' in fields:
+        private = fields['Private_Clean'] + fields.get('Private_Dirty', 0)
+    return {
+        'rss_mb': fields.get('Rss', fields.get('VmRSS')),
+        'pss_mb': fields.get('Pss'),
+        'private_mb': private,
+    }
+
+
+def child_env(root, workdir):
+    env = dict(os.environ, PYTHONPATH=root, PYTHONDONTWRITEBYTECODE='1')
+    # Keep the stores of the benchmark out of the checkout
+    for key, name in (('CATALOG_PATH', 'catalog.sqlite3'), ('HISTORY_PATH', 'history.sqlite3'),
+                      ('CACHE_SQLITE_PATH', 'cache.sqlite3'), ('IMPORT_DIR', 'imports')):
+        env[key] = os.path.join(workdir, name)
+    env.setdefault('OXYLABS_USERNAME', 'bench')
+    env.setdefault('OXYLABS_PASSWORD', 'bench')
+    return env
+
+
+def median(values):
+    values = sorted(value for value in values if value is not None)
+    return round(values[len(values) // 2], 1) if values else None
+
+
+def measure_cold_start(module, runs, root, workdir):
+    """Import module in `runs` fresh interpreters and return the medians"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', COLD_START, module, os.path.dirname(os.path.abspath(__file__))],
+            cwd=workdir, env=child_env(root, workdir), capture_output=True, text=True, check=True
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample['process_ms'] = (time.perf_counter() - started) * 1000
+        samples.append(sample)
+    return {key: median(sample[key] for sample in samples)
+            for key in ('process_ms', 'import_ms', 'first_request_ms', 'rss_mb', 'modules')}
+
+
+def measure_workers(mode, workers, root, workdir):
+    """Fork `workers` Flask workers (preload or import-per-worker) and return their mean memory"""
+    proc = subprocess.Popen(
+        [sys.executable, '-c', FORK_WORKERS, mode, str(workers)],
+        cwd=workdir, env=child_env(root, workdir), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        text=True, start_new_session=True
+    )
+    try:
+        lines = [proc.stdout.readline() for _ in range(workers + 1)]
+        pids = next(line for line in lines if line[:1].isdigit() and 'ready' not in line).split()
+        master = read_memory(proc.pid)
+        memory = [read_memory(pid) for pid in pids]
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait()
+    result = {'master_rss_mb': round(master['rss_mb'], 1) if master['rss_mb'] else None}
+    for key in ('rss_mb', 'pss_mb', 'private_mb'):
+        values = [m[key] for m in memory if m[key] is not None]
+        result[f'worker_{key}'] = round(sum(values) / len(values), 1) if values else None
+    return result
+
+
+def slowest_imports(module, root, workdir, limit):
+    """Top-level imports of module sorted by cumulative import time (python -X importtime)"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=workdir, env=child_env(root, workdir), capture_output=True, text=True, check=True
+    ).stderr
+    # Children are listed before their parent, indented two more spaces
+    imports = []
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        if name.startswith('   ') and not name.startswith('    '):
+            children.append((name.strip(), round(int(cumulative) / 1000, 1)))
+        elif not name.startswith('  '):
+            if name.strip() == module:
+                imports = children
+            children = []
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return dict(imports[:limit])
+
+
+def print_report(report, baseline=None):
+    baseline = baseline or {}
+    print(f"{'entrypoint':<10} {'process ms':>11} {'import ms':>10} {'1st req ms':>11} {'RSS MB':>8} {'modules':>8}")
+    for module, result in report['cold_start'].items():
+        print(f"{module:<10} {result['process_ms']:>11} {result['import_ms']:>10} "
+              f"{result['first_request_ms'] if result['first_request_ms'] is not None else '-':>11} "
+              f"{result['rss_mb']:>8} {result['modules']:>8}")
+        previous = baseline.get('cold_start', {}).get(module)
+        if previous:
+            deltas = [f"{key} {(result[key] - previous[key]) / previous[key] * 100:+.1f}%"
+                      for key in ('process_ms', 'import_ms', 'rss_mb') if previous.get(key) and result.get(key)]
+            print(f"{'':<10} vs baseline: {', '.join(deltas)}")
+        slowest = report['slowest_imports'].get(module)
+        if slowest:
+            print(f"{'':<10} slowest imports: " + ', '.join(f"{name} {ms}ms" for name, ms in slowest.items()))
+
+    if report.get('workers'):
+        print()
+        print(f"{'workers':<10} {'master RSS':>11} {'worker RSS':>11} {'worker PSS':>11} {'private MB':>11}")
+        for mode, result in report['workers'].items():
+            print(f"{mode:<10} {result['master_rss_mb']:>11} {result['worker_rss_mb']:>11} "
+                  f"{result['worker_pss_mb']:>11} {result['worker_private_mb']:>11}")
+            previous = baseline.get('workers', {}).get(mode)
+            if previous:
+                deltas = [f"{key} {(result[key] - previous[key]) / previous[key] * 100:+.1f}%"
+                          for key in ('worker_rss_mb', 'worker_pss_mb') if previous.get(key) and result.get(key)]
+                print(f"{'':<10} vs baseline: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark worker cold start time and memory')
+    parser.add_argument('--modules', default='app,asgi', help='Entrypoints to import')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per entrypoint')
+    parser.add_argument('--workers', type=int, default=4, help='Forked Flask workers (0 skips the memory run)')
+    parser.add_argument('--imports', type=int, default=8, help='Slowest top-level imports to list')
+    parser.add_argument('--root', default=ROOT, help='Checkout to benchmark (defaults to this one)')
+    parser.add_argument('--output', help='Write the report as JSON')
+    parser.add_argument('--compare', help='Baseline JSON report to compare against')
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+
+    report = {'root': root, 'runs': args.runs, 'cold_start': {}, 'slowest_imports': {}, 'workers': {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for module in args.modules.split(','):
+            report['cold_start'][module] = measure_cold_start(module, args.runs, root, workdir)
+            if args.imports:
+                report['slowest_imports'][module] = slowest_imports(module, root, workdir, args.imports)
+        if args.workers and os.path.exists('/proc/self/smaps_rollup') and hasattr(os, 'fork'):
+            for mode in ('preload', 'separate'):
+                report['workers'][mode] = measure_workers(mode, args.workers, root, workdir)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Offline benchmark suite for the Flask routes against the mock Oxylabs server
+
+Usage:
+    python benchmarks/run_benchmarks.py [--scenarios search,product,scrape,export]
+        [--requests 200] [--concurrency 8] [--latency 0.2] [--jitter 0.05]
+        [--error-rate 0.0] [--warm] [--output results.json] [--compare baseline.json]
+
+By default every request uses a distinct query/ASIN so results reflect
+the upstream path; --warm repeats a small set to measure cached serving.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_oxylabs import start_mock_server, PRODUCT_FIXTURE
+
+SCENARIOS = ('search', 'product', 'scrape', 'export')
+
+
+def percentile(samples, pct):
+    """Return the pct percentile of a sorted list of samples"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(pct / 100 * len(samples))) - 1))
+    return samples[index]
+
+
+def make_requests(scenario, n, warm):
+    """Build the (method, path, kwargs) tuples for a scenario"""
+    keys = [i % 5 if warm else i for i in range(n)]
+    if scenario == 'search':
+        return [('POST', '/search', {'data': {'query': f'bench query {k}', 'format': 'json'}}) for k in keys]
+    if scenario == 'product':
+        return [('GET', f'/api/product/B{k:09d}', {}) for k in keys]
+    if scenario == 'scrape':
+        return [('POST', '/scrape-products', {'json': {'product_ids': [f'B{k * 10 + j:09d}' for j in range(10)]}})
+                for k in keys]
+    if scenario == 'export':
+        with open(PRODUCT_FIXTURE) as f:
+            product = json.load(f)['results'][0]
+        rows = json.dumps([dict(product, productId=f'B{j:09d}') for j in range(200)])
+        return [('POST', '/search', {'data': {'query': 'bench', 'format': 'excel', 'is_detailed': 'true',
+                                              'selected_rows': rows}})] * n
+    raise ValueError(f'Unknown scenario: {scenario}')
+
+
+def run_scenario(app, scenario, n, concurrency, warm):
+    """Run one scenario and return its throughput and latency summary"""
+    local = threading.local()
+
+    def send(spec):
+        method, path, kwargs = spec
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        started = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        response.get_data()
+        return time.perf_counter() - started, response.status_code
+
+    specs = make_requests(scenario, n, warm)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, specs))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status >= 400)
+    return {
+        'requests': n,
+        'errors': errors,
+        'throughput_rps': round(n / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def print_report(report, baseline=None):
+    header = f"{'scenario':<10} {'reqs':>6} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print('-' * len(header))
+    for scenario, result in report['scenarios'].items():
+        print(f"{scenario:<10} {result['requests']:>6} {result['errors']:>6} {result['throughput_rps']:>9} "
+              f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9}")
+        previous = (baseline or {}).get('scenarios', {}).get(scenario)
+        if previous:
+            deltas = []
+            for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                if previous[key]:
+                    deltas.append(f"{key} {(result[key] - previous[key]) / previous[key] * 100:+.1f}%")
+            print(f"{'':<10} vs baseline: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the app against a local mock Oxylabs server')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=100, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.2, help='Mock upstream latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Mock upstream jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Mock upstream error rate (0-1)')
+    parser.add_argument('--search-payload', help='Recorded amazon_search response to replay')
+    parser.add_argument('--warm', action='store_true', help='Repeat a small set of keys to exercise caches')
+    parser.add_argument('--output', help='Write the report as JSON')
+    parser.add_argument('--compare', help='Baseline JSON report to compare against')
+    args = parser.parse_args()
+
+    server, url = start_mock_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                    search_payload=args.search_payload)
+
+    # Configure the app for the mock before importing it
+    os.environ['OXYLABS_API_URL'] = url
+    os.environ.setdefault('OXYLABS_USERNAME', 'bench')
+    os.environ.setdefault('OXYLABS_PASSWORD', 'bench')
+    os.environ.setdefault('OXYLABS_RATE_LIMIT', '0')
+    os.environ.setdefault('OXYLABS_BACKOFF_BASE', '0.01')
+    os.environ.setdefault('CACHE_BACKEND', 'memory')
+    # Fresh catalog and history per run: a catalog left by an earlier run would
+    # serve product lookups locally. No background refreshes or re-scrapes either.
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    os.environ['CATALOG_PATH'] = os.path.join(workdir, 'catalog.sqlite3')
+    os.environ['HISTORY_PATH'] = os.path.join(workdir, 'history.sqlite3')
+    os.environ['IMPORT_DIR'] = os.path.join(workdir, 'imports')
+    os.environ['CATALOG_REFRESH_INTERVAL'] = '0'
+    os.environ['WATCH_TICK'] = '0'
+    import logging
+    from app import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = {
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'scenarios': {},
+    }
+    for scenario in args.scenarios.split(','):
+        report['scenarios'][scenario] = run_scenario(app, scenario, args.requests, args.concurrency, args.warm)
+
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,541 @@
+"""
+Bulk product import from CSV/XLSX files of ASINs or Amazon product URLs
+
+Input rows are read lazily (csv.reader / openpyxl read-only mode), checked
+against the ASIN format, deduped and looked up a chunk at a time on a
+bounded worker pool. Each result is appended to the output file as soon
+as it completes, so memory stays flat regardless of file size and an
+interrupted import resumes by skipping the IDs already in the output.
+
+Usage:
+    python bulk_import.py asins.xlsx -o products.ndjson [--workers 5] [--fields grid]
+    python bulk_import.py urls.csv -o products.csv --column url
+"""
+import os
+import re
+import csv
+import json
+import time
+import uuid
+import shutil
+import argparse
+import threading
+import logging
+from batch import iter_batch
+from export import flatten_product_details
+from parsing import ASIN_RE, URL_ASIN_RE
+from projection import parse_fields, project
+from fast_json import dumps as json_dumps
+
+logger = logging.getLogger(__name__)
+
+# Import configuration
+IMPORT_DIR = os.getenv("IMPORT_DIR", "imports")
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", os.getenv("SCRAPE_MAX_WORKERS", "5")))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "200"))
+IMPORT_MAX_ACTIVE = int(os.getenv("IMPORT_MAX_ACTIVE", "2"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Header names recognised as the ID column, in order of preference
+ID_COLUMNS = ('asin', 'asins', 'product_id', 'productid', 'id', 'url', 'link', 'product_url')
+
+INPUT_FORMATS = {'.csv': 'csv', '.txt': 'csv', '.tsv': 'csv', '.xlsx': 'xlsx', '.xlsm': 'xlsx'}
+OUTPUT_FORMATS = ('ndjson', 'csv')
+
+# CSV output columns: the detailed grid row plus the error of failed lookups
+CSV_COLUMNS = tuple(flatten_product_details({})) + ('error',)
+
+INVALID_ID_ERROR = 'Invalid ASIN or Amazon product URL'
+
+
+def _iter_csv_rows(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _iter_xlsx_rows(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def product_id_from_value(value):
+    """
+    Return the ASIN of a cell holding an ASIN or an Amazon /dp/ URL
+
+    Returns:
+        str: ASIN, or None if the value is neither
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    if ASIN_RE.match(text):
+        return text
+    if '/' in text:
+        match = URL_ASIN_RE.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _pick_column(first_row, column=None):
+    """Return (column index, whether first_row is a header)"""
+    header = [str(cell).strip().lower() if cell is not None else '' for cell in first_row]
+    if column is not None:
+        if str(column).isdigit():
+            index = int(column)
+            # A first row without an ID in that column is taken as the header
+            return index, index < len(first_row) and product_id_from_value(first_row[index]) is None
+        if str(column).lower() not in header:
+            raise ValueError(f"Column '{column}' not found in the header row")
+        return header.index(str(column).lower()), True
+    for name in ID_COLUMNS:
+        if name in header:
+            return header.index(name), True
+    # No header: use the first column that holds an ID
+    for index, cell in enumerate(first_row):
+        if product_id_from_value(cell):
+            return index, False
+    return 0, False
+
+
+def iter_input_values(path, column=None):
+    """
+    Yield (row number, cell value) of the ID column of a CSV/TXT/XLSX file
+
+    Args:
+        path (str): Input file
+        column (str, optional): Header name or 0-based index of the ID column;
+            detected from the header (asin, url, ...) or the first row otherwise
+    """
+    kind = INPUT_FORMATS.get(os.path.splitext(path)[1].lower(), 'csv')
+    rows = _iter_xlsx_rows(path) if kind == 'xlsx' else _iter_csv_rows(path)
+    try:
+        first = next(rows, None)
+        if first is None:
+            return
+        index, has_header = _pick_column(first, column)
+        if not has_header:
+            yield 1, first[index] if index < len(first) else None
+        for number, row in enumerate(rows, 2):
+            yield number, row[index] if index < len(row) else None
+    finally:
+        rows.close()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def output_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def _repair_tail(path):
+    """Drop a partially written last line left by an interrupted run"""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                end = position + newline + 1
+                if end != size:
+                    f.truncate(end)
+                return
+        f.truncate(0)
+
+
+def read_completed(path, retry_failed=False):
+    """
+    Return the product IDs already written to an output file
+
+    A retried ID has more than one line in the output; its last line is
+    its current result.
+
+    Args:
+        path (str): NDJSON or CSV output of an earlier run
+        retry_failed (bool, optional): Leave out IDs whose last lookup failed, so they are fetched again
+    """
+    if not os.path.exists(path):
+        return set()
+    _repair_tail(path)
+    failed = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        if output_format(path) == 'csv':
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            error = row.get('error')
+            failed[row.get('productId')] = bool(error) and error != INVALID_ID_ERROR
+    return {product_id for product_id, is_failed in failed.items() if not (retry_failed and is_failed)}
+
+
+class ImportWriter:
+    """Append import results to an NDJSON or CSV file, flushing every chunk"""
+
+    def __init__(self, path, fields=None):
+        self.path = path
+        self.format = output_format(path)
+        self.fields = fields
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        if self.format == 'csv':
+            self._writer = csv.DictWriter(self._file, CSV_COLUMNS, restval='', extrasaction='ignore')
+            if is_new:
+                self._writer.writeheader()
+
+    def write(self, result):
+        if self.format == 'csv':
+            row = flatten_product_details(result)
+            self._writer.writerow(dict(row, error=result.get('error') or ''))
+        else:
+            self._file.write(json_dumps(project(result, self.fields)) + "\n")
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+def run_import(input_path, output_path, fetch, max_workers=IMPORT_WORKERS, chunk_size=IMPORT_CHUNK_SIZE,
+               fields=None, column=None, retry_failed=False, progress=None, should_stop=None):
+    """
+    Look up every ASIN of an input file and append the results to output_path
+
+    Args:
+        input_path (str): CSV/TXT/XLSX file of ASINs or Amazon product URLs
+        output_path (str): NDJSON (projected results) or .csv (detailed grid rows) output
+        fetch (callable): Takes an ASIN and returns its /scrape-products result dict
+        max_workers (int, optional): Lookups in flight at once
+        chunk_size (int, optional): IDs read and dispatched per chunk
+        fields (dict, optional): Projection spec applied to NDJSON results
+        column (str, optional): ID column header or index
+        retry_failed (bool, optional): Fetch IDs whose earlier lookup failed again; their new
+            result is appended after the failed one, so readers should keep the last line per productId
+        progress (callable, optional): Called with the stats dict after every chunk
+        should_stop (callable, optional): Checked between chunks; True ends the run early
+
+    Returns:
+        dict: rows, invalid, duplicates, skipped (done in an earlier run), fetched,
+        failed, stopped and elapsed counters
+    """
+    started = time.perf_counter()
+    done = read_completed(output_path, retry_failed)
+    seen = set()
+    stats = {'rows': 0, 'invalid': 0, 'duplicates': 0, 'skipped': 0, 'fetched': 0, 'failed': 0,
+             'stopped': False, 'elapsed': 0.0}
+    if done:
+        logger.info(f"Resuming import into {output_path}: {len(done)} products already done")
+
+    writer = ImportWriter(output_path, fields)
+    try:
+        for chunk in _chunks(iter_input_values(input_path, column), chunk_size):
+            if should_stop is not None and should_stop():
+                stats['stopped'] = True
+                break
+            product_ids = []
+            for number, value in chunk:
+                stats['rows'] += 1
+                product_id = product_id_from_value(value)
+                key = product_id or (str(value).strip() if value is not None else '')
+                if key in seen:
+                    stats['duplicates'] += 1
+                    continue
+                seen.add(key)
+                if key in done:
+                    stats['skipped'] += 1
+                elif product_id is None:
+                    stats['invalid'] += 1
+                    if key:
+                        writer.write({'productId': key, 'error': INVALID_ID_ERROR, 'row': number})
+                else:
+                    product_ids.append(product_id)
+
+            for _, result in iter_batch(fetch, product_ids, max_workers=max_workers):
+                value = result['value'] or {
+                    'productId': result['item'], 'error': f"Error: {result['error']}",
+                }
+                writer.write(value)
+                stats['fetched'] += 1
+                if value.get('error'):
+                    stats['failed'] += 1
+            writer.flush()
+            stats['elapsed'] = round(time.perf_counter() - started, 2)
+            if progress is not None:
+                progress(dict(stats))
+    finally:
+        writer.close()
+
+    stats['elapsed'] = round(time.perf_counter() - started, 2)
+    logger.info(f"Import into {output_path} finished: {stats}")
+    return stats
+
+
+class ImportManager:
+    """
+    Run uploaded import files in background threads
+
+    Each import keeps its input, output and a JSON state file in
+    directory, so a status survives restarts and an interrupted import
+    can be resumed from its output. A lock file held while an import runs
+    keeps worker processes sharing directory from running it twice.
+    """
+
+    def __init__(self, fetch, directory=IMPORT_DIR, max_active=IMPORT_MAX_ACTIVE, max_workers=IMPORT_WORKERS):
+        """
+        Args:
+            fetch (callable): Takes an ASIN and returns its /scrape-products result dict
+            directory (str, optional): Where uploads, outputs and states are kept
+            max_active (int, optional): Imports allowed to run at once
+            max_workers (int, optional): Lookups in flight per import
+        """
+        self.fetch = fetch
+        self.directory = directory
+        self.max_active = max_active
+        self.max_workers = max_workers
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def _path(self, import_id, suffix):
+        return os.path.join(self.directory, f"{import_id}{suffix}")
+
+    def _save_state(self, state):
+        path = self._path(state['import_id'], '.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(path + '.tmp', path)
+
+    def _acquire_lock(self, import_id):
+        """Create the import's lock file; False if a live process already holds it"""
+        path = self._path(import_id, '.lock')
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    with open(path) as f:
+                        pid = int(f.read().strip() or 0)
+                except (OSError, ValueError):
+                    pid = 0
+                if pid and _pid_alive(pid):
+                    return False
+                # Left behind by a process that died mid-import
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def _release_lock(self, import_id):
+        try:
+            os.remove(self._path(import_id, '.lock'))
+        except FileNotFoundError:
+            pass
+
+    def get(self, import_id):
+        """Return the state dict of an import, or None"""
+        if not re.match(r'^[0-9a-f]{32}$', import_id or ''):
+            return None
+        with self._lock:
+            running = self._running.get(import_id)
+        if running is not None:
+            return dict(running['state'])
+        try:
+            with open(self._path(import_id, '.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def output_path(self, state):
+        return self._path(state['import_id'], f".{state['format']}")
+
+    def create(self, fileobj, filename, output='ndjson', fields=None, column=None):
+        """
+        Store an uploaded file and start importing it
+
+        Raises:
+            ValueError: If the file type or output format is not supported
+            RuntimeError: If max_active imports are already running
+        """
+        extension = os.path.splitext(filename or '')[1].lower()
+        if extension not in INPUT_FORMATS:
+            raise ValueError(f"Unsupported file type '{extension}'; upload {', '.join(INPUT_FORMATS)}")
+        if output not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format '{output}'; use {' or '.join(OUTPUT_FORMATS)}")
+        os.makedirs(self.directory, exist_ok=True)
+
+        import_id = uuid.uuid4().hex
+        with open(self._path(import_id, f'.input{extension}'), 'wb') as f:
+            shutil.copyfileobj(fileobj, f, 1024 * 1024)
+        state = {
+            'import_id': import_id, 'filename': filename, 'input': f'{import_id}.input{extension}',
+            'format': output, 'fields': fields, 'column': column, 'status': 'queued',
+            'created_at': time.time(), 'finished_at': None, 'stats': None, 'error': None,
+        }
+        self._save_state(state)
+        return self.start(import_id)
+
+    def start(self, import_id, retry_failed=False):
+        """
+        Start (or resume) an import in a background thread
+
+        Returns:
+            dict: Import state (unchanged if it is already running here or in
+            another process), or None if unknown
+
+        Raises:
+            RuntimeError: If max_active imports are already running
+        """
+        state = self.get(import_id)
+        if state is None:
+            return None
+        with self._lock:
+            if import_id in self._running:
+                return dict(self._running[import_id]['state'])
+            if len(self._running) >= self.max_active:
+                raise RuntimeError(f"{self.max_active} imports are already running; try again later")
+            if not self._acquire_lock(import_id):
+                return state
+            # A cancel meant for an earlier run of this import
+            self._clear_cancel(import_id)
+            state = dict(state, status='running', finished_at=None, error=None)
+            entry = {'state': state, 'stop': threading.Event()}
+            self._running[import_id] = entry
+        self._save_state(state)
+        threading.Thread(
+            target=self._run, args=(entry, retry_failed), name=f'import-{import_id[:8]}', daemon=True
+        ).start()
+        logger.info(f"Started import {import_id} ({state['filename']})")
+        return dict(state)
+
+    def cancel(self, import_id):
+        """
+        Stop a running import after its current chunk; it can be resumed later
+
+        An import running in another worker process is stopped through a
+        cancel file next to its lock, which that run checks between chunks.
+        """
+        with self._lock:
+            entry = self._running.get(import_id)
+        if entry is not None:
+            entry['stop'].set()
+            return self.get(import_id)
+        state = self.get(import_id)
+        if state is not None and state['status'] == 'running':
+            open(self._path(import_id, '.cancel'), 'w').close()
+            state = dict(state, cancel_requested=True)
+        return state
+
+    def _clear_cancel(self, import_id):
+        try:
+            os.remove(self._path(import_id, '.cancel'))
+        except FileNotFoundError:
+            pass
+
+    def _run(self, entry, retry_failed):
+        state = entry['state']
+        cancel_path = self._path(state['import_id'], '.cancel')
+
+        def should_stop():
+            return entry['stop'].is_set() or os.path.exists(cancel_path)
+
+        def progress(stats):
+            state['stats'] = stats
+            self._save_state(state)
+
+        try:
+            stats = run_import(
+                os.path.join(self.directory, state['input']), self.output_path(state), self.fetch,
+                max_workers=self.max_workers, fields=parse_fields(state['fields']), column=state['column'],
+                retry_failed=retry_failed, progress=progress, should_stop=should_stop,
+            )
+            state['stats'] = stats
+            state['status'] = 'cancelled' if stats['stopped'] else 'completed'
+        except Exception as e:
+            logger.error(f"Import {state['import_id']} failed: {str(e)}")
+            state['status'] = 'failed'
+            state['error'] = str(e)
+        state['finished_at'] = time.time()
+        self._save_state(state)
+        with self._lock:
+            self._running.pop(state['import_id'], None)
+            self._clear_cancel(state['import_id'])
+            self._release_lock(state['import_id'])
+
+    def stats(self):
+        with self._lock:
+            return {'running': len(self._running), 'max_active': self.max_active, 'directory': self.directory}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch product details for every ASIN in a CSV/XLSX file')
+    parser.add_argument('input', help='CSV, TXT or XLSX file of ASINs or Amazon product URLs')
+    parser.add_argument('--output', '-o', required=True, help='Output file (.ndjson or .csv); appended to on resume')
+    parser.add_argument('--column', help='Header name or 0-based index of the ID column')
+    parser.add_argument('--workers', type=int, default=IMPORT_WORKERS, help='Lookups in flight at once')
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument('--fields', help='Fields or preset (summary, grid) kept in NDJSON output')
+    parser.add_argument('--retry-failed', action='store_true', help='Fetch IDs that failed in an earlier run again')
+    args = parser.parse_args()
+
+    # The app's lookup path reuses the product cache, the catalog and the upstream client settings
+    from app import scrape_product
+
+    def progress(stats):
+        print(f"{stats['rows']} rows: {stats['fetched']} fetched ({stats['failed']} failed), "
+              f"{stats['skipped']} already done, {stats['invalid']} invalid, {stats['duplicates']} duplicates "
+              f"[{stats['elapsed']}s]", flush=True)
+
+    stats = run_import(
+        args.input, args.output, scrape_product, max_workers=args.workers, chunk_size=args.chunk_size,
+        fields=parse_fields(args.fields), column=args.column, retry_failed=args.retry_failed, progress=progress,
+    )
+    print(json.dumps(stats))
+
+
+if __name__ == '__main__':
+    main()
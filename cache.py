@@ -0,0 +1,249 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from fast_json import dumps as json_dumps, loads as json_loads
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "cache.sqlite3")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class MemoryBackend:
+    """In-process LRU store bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.time() + ttl)
+            self._bytes += len(value)
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def _remove(self, key):
+        value, _ = self._data.pop(key)
+        self._bytes -= len(value)
+
+    def size(self):
+        return {'entries': len(self._data), 'bytes': self._bytes}
+
+
+class SQLiteBackend:
+    """On-disk LRU store shared by every worker process on the host"""
+
+    def __init__(self, path=CACHE_SQLITE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        self._pid = os.getpid()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)")
+        conn.commit()
+
+    def _connect(self):
+        if self._pid != os.getpid():
+            # Forked worker: open its own connection instead of sharing the parent's
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl, now),
+        )
+        count = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def size(self):
+        row = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache").fetchone()
+        return {'entries': row[0], 'bytes': row[1]}
+
+
+class RedisBackend:
+    """
+    Redis-compatible store (Redis, Valkey, KeyDB, ...)
+
+    Expiry is handled with per-key TTLs and LRU eviction is left to the
+    server's maxmemory-policy, so CACHE_MAX_ENTRIES does not apply here.
+    """
+
+    def __init__(self, url=CACHE_REDIS_URL):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package to be installed")
+        self._client = redis.Redis.from_url(url)
+
+    @property
+    def evictions(self):
+        try:
+            return int(self._client.info('stats').get('evicted_keys', 0))
+        except Exception:
+            return 0
+
+    def get(self, key):
+        value = self._client.get(key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=max(int(ttl), 1))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def size(self):
+        return {'entries': self._client.dbsize()}
+
+
+def create_backend(name=None):
+    """
+    Create a cache backend by name
+
+    Args:
+        name (str, optional): memory, sqlite or redis (defaults to CACHE_BACKEND)
+    """
+    name = (name or CACHE_BACKEND).lower()
+    if name == 'sqlite':
+        return SQLiteBackend()
+    if name == 'redis':
+        return RedisBackend()
+    if name != 'memory':
+        logger.warning(f"Unknown cache backend '{name}', falling back to memory")
+    return MemoryBackend()
+
+
+class TTLCache:
+    """JSON value cache with per-entry TTL on top of a pluggable backend"""
+
+    def __init__(self, namespace, ttl, backend=None, encode=None, decode=None):
+        """
+        Args:
+            namespace (str): Key prefix of this cache
+            ttl (int): Default entry lifetime in seconds
+            backend (optional): Storage backend (defaults to CACHE_BACKEND)
+            encode (callable, optional): Converts a value into its JSON-ready form before storing
+            decode (callable, optional): Inverse of encode, applied to values read back
+        """
+        self.namespace = namespace
+        self.ttl = ttl
+        self.backend = backend or create_backend()
+        self.encode = encode
+        self.decode = decode
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        try:
+            raw = self.backend.get(self._key(key))
+        except Exception as e:
+            logger.error(f"Cache read failed for {key}: {str(e)}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        value = json_loads(raw)
+        return self.decode(value) if self.decode else value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (defaults to the cache TTL)"""
+        try:
+            if self.encode:
+                value = self.encode(value)
+            self.backend.set(self._key(key), json_dumps(value), ttl or self.ttl)
+        except Exception as e:
+            logger.error(f"Cache write failed for {key}: {str(e)}")
+
+    def delete(self, key):
+        self.backend.delete(self._key(key))
+
+    def stats(self):
+        """Return hit/miss/eviction counters for this cache"""
+        lookups = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.backend.evictions,
+            'backend': type(self.backend).__name__,
+        }
+        try:
+            stats.update(self.backend.size())
+        except Exception:
+            pass
+        return stats
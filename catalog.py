@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from batch import run_batch
+from product_model import ProductRecord
+
+logger = logging.getLogger(__name__)
+
+# Catalog configuration
+CATALOG_PATH = os.getenv("CATALOG_PATH", "catalog.sqlite3")
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "86400"))
+CATALOG_REFRESH_INTERVAL = int(os.getenv("CATALOG_REFRESH_INTERVAL", "600"))
+CATALOG_REFRESH_BATCH = int(os.getenv("CATALOG_REFRESH_BATCH", "100"))
+CATALOG_REFRESH_WORKERS = int(os.getenv("CATALOG_REFRESH_WORKERS", "4"))
+
+# Delay before a record whose refresh failed is tried again, doubled after
+# every further failure up to CATALOG_RETRY_MAX
+CATALOG_RETRY_BACKOFF = int(os.getenv("CATALOG_RETRY_BACKOFF", "3600"))
+CATALOG_RETRY_MAX = int(os.getenv("CATALOG_RETRY_MAX", "604800"))
+
+# A claimed refresh that has not finished after this long may be claimed again
+REFRESH_LEASE_SECONDS = 600
+
+# Normalized columns stored next to the raw payload, in table order
+RECORD_COLUMNS = (
+    'asin', 'title', 'brand', 'price', 'currency', 'stock', 'in_stock',
+    'rating', 'reviews_count', 'sales_rank', 'sales_rank_category', 'url', 'fetched_at',
+)
+
+
+def _number(value, cast=float):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return cast(value)
+
+
+def parse_price(value):
+    """Return a positive price, treating Oxylabs' 0 / -1 placeholders as missing"""
+    price = _number(value)
+    if price is not None and price <= 0:
+        return None
+    return price
+
+
+def parse_sales_rank(content):
+    """Return (rank, category name) of the top sales rank ladder, or (None, None)"""
+    ranks = content.get('sales_rank')
+    if isinstance(ranks, list) and ranks and isinstance(ranks[0], dict):
+        ladder = ranks[0].get('ladder') or []
+        category = ladder[0].get('name') if ladder and isinstance(ladder[0], dict) else None
+        return _number(ranks[0].get('rank'), int), category
+    return None, None
+
+
+def normalize_product(asin, content, fetched_at=None):
+    """
+    Normalize an Oxylabs amazon product payload into a catalog record
+
+    Args:
+        asin (str): Amazon ASIN the payload was fetched for
+        content (dict): Parsed product content from Oxylabs
+        fetched_at (float, optional): Fetch time, defaults to now
+
+    Returns:
+        ProductRecord: One value per RECORD_COLUMNS entry
+    """
+    stock = content.get('stock') or None
+    sales_rank, sales_rank_category = parse_sales_rank(content)
+
+    return ProductRecord(
+        asin,
+        title=content.get('title') or content.get('product_name'),
+        brand=content.get('brand'),
+        price=parse_price(content.get('price')),
+        currency=content.get('currency'),
+        stock=stock,
+        in_stock=int('in stock' in stock.lower()) if stock else None,
+        rating=_number(content.get('rating')),
+        reviews_count=_number(content.get('reviews_count'), int),
+        sales_rank=sales_rank,
+        sales_rank_category=sales_rank_category,
+        url=content.get('url'),
+        fetched_at=fetched_at or time.time(),
+    )
+
+
+class ProductCatalog:
+    """
+    Persistent SQLite catalog of product details keyed by ASIN
+
+    Each record keeps the raw payload for detail lookups and exports plus
+    normalized price, stock, rating and sales rank columns (price and
+    rating are indexed for catalog queries) and the time it was fetched.
+    """
+
+    SORT_COLUMNS = {
+        'price': 'price ASC',
+        'price_desc': 'price DESC',
+        'rating': 'rating DESC',
+        'sales_rank': 'sales_rank ASC',
+        'fetched_at': 'fetched_at DESC',
+    }
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._pid = os.getpid()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            "asin TEXT PRIMARY KEY, title TEXT, brand TEXT, price REAL, currency TEXT, "
+            "stock TEXT, in_stock INTEGER, rating REAL, reviews_count INTEGER, "
+            "sales_rank INTEGER, sales_rank_category TEXT, url TEXT, "
+            "fetched_at REAL NOT NULL, refresh_claimed_at REAL, content TEXT NOT NULL, "
+            "refresh_failures INTEGER NOT NULL DEFAULT 0, retry_at REAL)"
+        )
+        existing = {row['name'] for row in conn.execute("PRAGMA table_info(products)")}
+        for column, definition in (('refresh_failures', 'INTEGER NOT NULL DEFAULT 0'), ('retry_at', 'REAL')):
+            if column not in existing:
+                conn.execute(f"ALTER TABLE products ADD COLUMN {column} {definition}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_products_price ON products (price)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_products_rating ON products (rating)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_products_fetched ON products (fetched_at)")
+
+    def _connect(self):
+        if self._pid != os.getpid():
+            # Forked from a preloading master: never reuse its connections
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, asin, content, fetched_at=None):
+        """Store (or replace) the record for asin from a fresh product payload (clearing any refresh backoff)"""
+        record = normalize_product(asin, content, fetched_at)
+        columns = RECORD_COLUMNS + ('refresh_claimed_at', 'content')
+        values = record.to_row() + [None, json.dumps(content, separators=(',', ':'))]
+        self._connect().execute(
+            f"INSERT OR REPLACE INTO products ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            values,
+        )
+        return record
+
+    def get(self, asin, max_age=None):
+        """
+        Return the stored payload for asin
+
+        Args:
+            asin (str): Amazon ASIN
+            max_age (float, optional): Ignore records fetched more than max_age seconds ago
+
+        Returns:
+            dict: Product payload, or None if unknown or too old
+        """
+        row = self._connect().execute(
+            "SELECT content, fetched_at FROM products WHERE asin = ?", (asin,)
+        ).fetchone()
+        if row is None:
+            return None
+        if max_age is not None and time.time() - row['fetched_at'] > max_age:
+            return None
+        return json.loads(row['content'])
+
+    def get_many(self, asins):
+        """Return {asin: payload} for the stored records among asins"""
+        asins = list(dict.fromkeys(asins))
+        found = {}
+        conn = self._connect()
+        # Stay under SQLite's bound parameter limit
+        for start in range(0, len(asins), 500):
+            chunk = asins[start:start + 500]
+            rows = conn.execute(
+                f"SELECT asin, content FROM products WHERE asin IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            for row in rows:
+                found[row['asin']] = json.loads(row['content'])
+        return found
+
+    def query(self, min_price=None, max_price=None, min_rating=None, in_stock=None, sort_by=None,
+              limit=100, offset=0):
+        """
+        Query normalized records using the price and rating indexes
+
+        Returns:
+            list: ProductRecords matching the filters
+        """
+        clauses = []
+        params = []
+        if min_price is not None:
+            clauses.append("price >= ?")
+            params.append(float(min_price))
+        if max_price is not None:
+            clauses.append("price <= ?")
+            params.append(float(max_price))
+        if min_rating is not None:
+            clauses.append("rating >= ?")
+            params.append(float(min_rating))
+        if in_stock is not None:
+            clauses.append("in_stock = ?")
+            params.append(int(bool(in_stock)))
+        sql = f"SELECT {', '.join(RECORD_COLUMNS)} FROM products"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {self.SORT_COLUMNS.get(sort_by, 'asin ASC')} LIMIT ? OFFSET ?"
+        params.extend([int(limit), int(offset)])
+        return [ProductRecord(*row) for row in self._connect().execute(sql, params)]
+
+    def claim_stale(self, max_age, limit):
+        """
+        Claim up to limit records older than max_age for refreshing
+
+        Claims are written in one transaction so several worker processes
+        sharing the catalog do not refresh the same records. Records backing
+        off after failed refreshes are skipped until their retry_at.
+
+        Returns:
+            list: ASINs to refresh, oldest first
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            asins = [row['asin'] for row in conn.execute(
+                "SELECT asin FROM products WHERE fetched_at < ? "
+                "AND (refresh_claimed_at IS NULL OR refresh_claimed_at < ?) "
+                "AND (retry_at IS NULL OR retry_at <= ?) "
+                "ORDER BY fetched_at LIMIT ?",
+                (now - max_age, now - REFRESH_LEASE_SECONDS, now, limit),
+            )]
+            conn.executemany(
+                "UPDATE products SET refresh_claimed_at = ? WHERE asin = ?", [(now, asin) for asin in asins]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return asins
+
+    def release_claims(self, asins, backoff=CATALOG_RETRY_BACKOFF, max_backoff=CATALOG_RETRY_MAX):
+        """
+        Release the claims of records a refresh pass did not update
+
+        upsert() clears the claim, so a record still claimed failed to refresh
+        (upstream error, or the product is no longer available). It is not
+        claimed again until backoff * 2 ** (earlier failures) seconds have
+        passed, capped at max_backoff.
+
+        Returns:
+            int: Number of records released
+        """
+        now = time.time()
+        conn = self._connect()
+        released = 0
+        for start in range(0, len(asins), 500):
+            chunk = list(asins[start:start + 500])
+            released += conn.execute(
+                "UPDATE products SET refresh_claimed_at = NULL, refresh_failures = refresh_failures + 1, "
+                "retry_at = ? + MIN(? * (1 << MIN(refresh_failures, 30)), ?) "
+                f"WHERE refresh_claimed_at IS NOT NULL AND asin IN ({', '.join('?' * len(chunk))})",
+                [now, backoff, max_backoff] + chunk,
+            ).rowcount
+        return released
+
+    def stats(self, max_age=CATALOG_MAX_AGE):
+        now = time.time()
+        row = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(fetched_at < ?), 0), MIN(fetched_at), COALESCE(SUM(retry_at > ?), 0) "
+            "FROM products",
+            (now - max_age, now),
+        ).fetchone()
+        return {'records': row[0], 'stale': row[1], 'oldest_fetched_at': row[2], 'backing_off': row[3],
+                'path': self.path}
+
+
+class CatalogRefresher:
+    """
+    Background thread re-fetching catalog records older than max_age
+
+    Only stale records are refreshed, so upstream spend follows how much
+    of the catalog ages out rather than how often products are viewed.
+    Records that fail to refresh back off instead of being re-fetched
+    every pass.
+    """
+
+    def __init__(self, catalog, refresh, max_age=CATALOG_MAX_AGE, interval=CATALOG_REFRESH_INTERVAL,
+                 batch_size=CATALOG_REFRESH_BATCH, max_workers=CATALOG_REFRESH_WORKERS):
+        """
+        Args:
+            catalog (ProductCatalog): Catalog to keep fresh
+            refresh (callable): Called with an ASIN; fetches it and updates the catalog
+            max_age (float, optional): Age in seconds after which a record is refreshed
+            interval (float, optional): Seconds between refresh passes (0 disables the thread)
+            batch_size (int, optional): Records refreshed per pass
+            max_workers (int, optional): Upstream lookups in flight per pass
+        """
+        self.catalog = catalog
+        self.refresh = refresh
+        self.max_age = max_age
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.refreshed = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='catalog-refresher', daemon=True)
+        self._thread.start()
+        logger.info(f"Catalog refresher started (max age {self.max_age}s, every {self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Catalog refresh pass failed: {str(e)}")
+
+    def run_once(self):
+        """Refresh one batch of stale records and return how many were refreshed"""
+        asins = self.catalog.claim_stale(self.max_age, self.batch_size)
+        if not asins:
+            return 0
+        run_batch(self.refresh, asins, max_workers=self.max_workers)
+        # Errors, empty results and unavailable products (12003) all leave the claim in place
+        refreshed = len(asins) - self.catalog.release_claims(asins)
+        self.refreshed += refreshed
+        self.failed += len(asins) - refreshed
+        logger.info(f"Catalog refresh: {refreshed}/{len(asins)} stale records updated")
+        return refreshed
+
+    def stats(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'interval': self.interval,
+            'max_age': self.max_age,
+            'refreshed': self.refreshed,
+            'failed': self.failed,
+        }
@@ -0,0 +1,199 @@
+import os
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response compression settings
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+# Brotli quality 4-5 compresses better than gzip -6 at similar speed; 11 is far too slow per request
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/html', 'text/plain', 'text/csv', 'text/css',
+}
+
+
+def choose_encoding(accept_encoding):
+    """
+    Pick the response encoding from an Accept-Encoding header
+
+    Returns:
+        str: 'br' (when brotli is installed) or 'gzip', or None if neither is acceptable
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+class Compressor:
+    """Incremental gzip/brotli compressor for whole and streamed bodies"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        """Compress data and flush it, so a streamed chunk reaches the client right away"""
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b''):
+        """Compress the last data and end the stream"""
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+def is_compressible(status, content_type, content_encoding):
+    if content_encoding or status < 200 or status in (204, 206, 304):
+        return False
+    return (content_type or '').split(';')[0].strip().lower() in COMPRESSIBLE_MIMETYPES
+
+
+def _compress_chunks(chunks, compressor):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        # The server closes this generator, not the iterable it wraps
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    """
+    Flask after_request hook compressing JSON, NDJSON, CSV and HTML responses
+
+    Buffered bodies under COMPRESS_MIN_SIZE are left alone. Streamed bodies
+    (NDJSON pages, job streams, CSV exports) are compressed chunk by chunk
+    and flushed, so clients still receive each chunk as it is produced.
+    File responses (send_file) are sent as they are, keeping their range
+    and conditional request support.
+    """
+    from flask import request
+
+    response.vary.add('Accept-Encoding')
+    if request.method == 'HEAD' or response.direct_passthrough:
+        return response
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if not encoding or not is_compressible(
+        response.status_code, response.mimetype, response.headers.get('Content-Encoding')
+    ):
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_chunks(response.response, Compressor(encoding))
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(Compressor(encoding).finish(data))
+    response.headers['Content-Encoding'] = encoding
+    # Byte ranges and a strong ETag would describe the uncompressed body
+    response.headers.pop('Accept-Ranges', None)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Register compress_response on a Flask app"""
+    app.after_request(compress_response)
+
+
+class CompressionMiddleware:
+    """ASGI counterpart of compress_response for the async app"""
+
+    def __init__(self, app, min_size=COMPRESS_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('method') == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get('headers') or [])
+        encoding = choose_encoding(headers.get(b'accept-encoding', b'').decode('latin-1'))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        state = {'start': None, 'pending': b'', 'compressor': None, 'passthrough': False}
+
+        async def send_compressed(message):
+            if message['type'] == 'http.response.start':
+                # Held back until enough of the body is seen to decide whether to compress
+                state['start'] = message
+                return
+            if message['type'] != 'http.response.body' or state['passthrough']:
+                await send(message)
+                return
+
+            more_body = message.get('more_body', False)
+            compressor = state['compressor']
+            if compressor is None:
+                body = state['pending'] + message.get('body', b'')
+                if more_body and len(body) < self.min_size:
+                    state['pending'] = body
+                    return
+                state['pending'] = b''
+                start = state['start']
+                response_headers = [(k, v) for k, v in start['headers'] if k.lower() != b'vary']
+                vary = [v for k, v in start['headers'] if k.lower() == b'vary']
+                response_headers.append((b'vary', b', '.join(vary + [b'Accept-Encoding'])))
+                header_map = {k.lower(): v for k, v in response_headers}
+                if len(body) < self.min_size or not is_compressible(
+                    start['status'],
+                    header_map.get(b'content-type', b'').decode('latin-1'),
+                    header_map.get(b'content-encoding'),
+                ):
+                    state['passthrough'] = True
+                    await send(dict(start, headers=response_headers))
+                    await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+                    return
+                response_headers = [(k, v) for k, v in response_headers if k.lower() != b'content-length']
+                response_headers.append((b'content-encoding', encoding.encode('latin-1')))
+                await send(dict(start, headers=response_headers))
+                compressor = state['compressor'] = Compressor(encoding)
+            else:
+                body = message.get('body', b'')
+
+            data = compressor.compress(body) if more_body else compressor.finish(body)
+            await send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
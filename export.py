@@ -0,0 +1,266 @@
+import io
+import csv
+import json
+import tempfile
+import logging
+from urllib.parse import urlparse
+from product_model import ProductModel
+
+logger = logging.getLogger(__name__)
+
+# Rows sampled to size spreadsheet columns; write-only sheets need widths up front
+WIDTH_SAMPLE_ROWS = 500
+MAX_COLUMN_WIDTH = 50
+
+# Rows buffered per chunk for CSV and Parquet output
+CHUNK_ROWS = 1000
+
+# Bytes per chunk when streaming a finished file to the client
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Files larger than this are spooled to disk while being built
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+EXPORT_FORMATS = {
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def resolve_columns(rows, visible_columns=None):
+    """
+    Work out the export columns without copying any cell values
+
+    Args:
+        rows (list): Row dicts (or product_model objects) to export
+        visible_columns (list, optional): Requested columns, in display order
+
+    Returns:
+        list: visible_columns that appear in the rows, or every key seen in
+        first-appearance order when no columns were requested
+    """
+    seen = {}
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen[key] = True
+    if visible_columns:
+        return [col for col in visible_columns if col in seen]
+    return list(seen)
+
+
+def cell_value(value):
+    """Convert a row value into something every export format can hold"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    # Nested payload fields (images, reviews, product_details, ...) are kept as JSON
+    return json.dumps(value, ensure_ascii=False)
+
+
+def iter_values(rows, columns):
+    """Yield one list of cell values per row, in column order"""
+    for row in rows:
+        if isinstance(row, ProductModel):
+            # Listings and records only hold scalars
+            yield row.to_row(columns)
+        else:
+            yield [cell_value(row.get(col)) for col in columns]
+
+
+def sample_widths(rows, columns, sample_rows=WIDTH_SAMPLE_ROWS):
+    """Estimate column widths from the header and the first sample_rows rows"""
+    widths = [len(col) for col in columns]
+    for n, values in enumerate(iter_values(rows, columns)):
+        if n >= sample_rows:
+            break
+        for i, value in enumerate(values):
+            length = len(str(value)) if value is not None else 0
+            if length > widths[i]:
+                widths[i] = length
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+
+def write_xlsx(rows, columns, fileobj, sheet_name="Search Results"):
+    """
+    Write rows to an xlsx workbook using openpyxl's write-only mode
+
+    Write-only worksheets stream rows to disk as they are appended, so
+    memory use does not grow with the number of rows.
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=sheet_name[:31])
+    for i, width in enumerate(sample_widths(rows, columns)):
+        worksheet.column_dimensions[get_column_letter(i + 1)].width = width
+    worksheet.append(columns)
+    for values in iter_values(rows, columns):
+        worksheet.append(values)
+    workbook.save(fileobj)
+
+
+def write_parquet(rows, columns, fileobj, chunk_rows=CHUNK_ROWS):
+    """Write rows to a Parquet file in row groups of chunk_rows rows"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package to be installed")
+
+    # Cells are written as strings so mixed-type columns do not break the schema
+    schema = pa.schema([(col, pa.string()) for col in columns])
+    writer = pq.ParquetWriter(fileobj, schema)
+    try:
+        batch = []
+        for values in iter_values(rows, columns):
+            batch.append(values)
+            if len(batch) >= chunk_rows:
+                writer.write_table(_parquet_table(pa, schema, columns, batch))
+                batch = []
+        if batch or not rows:
+            writer.write_table(_parquet_table(pa, schema, columns, batch))
+    finally:
+        writer.close()
+
+
+def _parquet_table(pa, schema, columns, batch):
+    arrays = [
+        pa.array([None if row[i] is None else str(row[i]) for row in batch], type=pa.string())
+        for i in range(len(columns))
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def iter_csv(rows, columns, chunk_rows=CHUNK_ROWS):
+    """Yield CSV text in chunks of chunk_rows rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for n, values in enumerate(iter_values(rows, columns), 1):
+        writer.writerow(values)
+        if n % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_file(fileobj, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield a finished file in chunks and close it afterwards"""
+    try:
+        fileobj.seek(0)
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def build_export(rows, format_type, visible_columns=None, sheet_name="Search Results"):
+    """
+    Build an export as a stream of chunks
+
+    Args:
+        rows (list): Row dicts to export
+        format_type (str): excel, csv or parquet
+        visible_columns (list, optional): Columns to include, in order
+        sheet_name (str, optional): Worksheet name for Excel exports
+
+    Returns:
+        tuple: (chunk iterator, file extension, mimetype)
+    """
+    extension, mimetype = EXPORT_FORMATS[format_type]
+    columns = resolve_columns(rows, visible_columns)
+
+    if format_type == 'csv':
+        return iter_csv(rows, columns), extension, mimetype
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        if format_type == 'parquet':
+            write_parquet(rows, columns, output)
+        else:
+            write_xlsx(rows, columns, output, sheet_name=sheet_name)
+    except Exception:
+        output.close()
+        raise
+    logger.info(f"Built {format_type} export with {len(columns)} columns")
+    return iter_file(output), extension, mimetype
+
+
+def flatten_product_details(product):
+    """
+    Flatten a /scrape-products result into the detailed grid's row shape
+
+    Mirrors displayEnhancedDetails in templates/index.html so server-side
+    detailed exports match what the user sees in the table. Works on full
+    payloads and on the 'grid' projection, whose truncated lists carry
+    their full length in <field>_total.
+    """
+    if product.get('error'):
+        return {
+            'productId': product.get('productId') or '',
+            'title': product.get('title') or f"Product {product.get('productId') or ''}",
+            'error': product['error'],
+            'hasError': True,
+        }
+
+    bullet_points = product.get('bullet_points') or ''
+    features = ''
+    if bullet_points:
+        points = bullet_points.split('\n')
+        features = ', '.join(points[:3]) + ('...' if len(points) > 3 else '')
+
+    variation = product.get('variation') or []
+    variants = ''
+    if variation:
+        texts = []
+        for variant in variation[:3]:
+            dimensions = variant.get('dimensions') if isinstance(variant, dict) else None
+            if dimensions:
+                texts.append(', '.join(f"{key}: {value}" for key, value in dimensions.items()))
+        variation_total = product.get('variation_total') or len(variation)
+        variants = ' | '.join(text for text in texts if text) + ('...' if variation_total > 3 else '')
+
+    source = 'amazon.com'
+    if product.get('url'):
+        hostname = urlparse(product['url']).hostname
+        if hostname:
+            source = hostname.replace('www.', '', 1)
+
+    price = product.get('price')
+    if isinstance(price, (int, float)) and not isinstance(price, bool):
+        price = f"${price:.2f}"
+    stock = product.get('stock') or ''
+    description = product.get('description') or ''
+    images = product.get('images') or []
+    image_count = product.get('images_total') or len(images)
+    review_count = product.get('reviews_total') or len(product.get('reviews') or [])
+
+    return {
+        'productId': product.get('productId') or product.get('asin') or '',
+        'title': product.get('title') or '',
+        'price': price or '',
+        'rating': product.get('rating') or 0,
+        'reviewsCount': product.get('reviews_count') or 0,
+        'availability': stock,
+        'inStock': 'Yes' if stock and 'in stock' in stock.lower() else 'No',
+        'shipping': product.get('shipping') or '',
+        'brand': product.get('brand') or '',
+        'manufacturer': product.get('manufacturer') or '',
+        'description': description[:100] + '...' if len(description) > 100 else description,
+        'isPrimeEligible': 'Yes' if product.get('is_prime_eligible') else 'No',
+        'mainImage': images[0] if images else '',
+        'imageCount': image_count,
+        'features': features,
+        'bulletPoints': bullet_points[:100] + '...' if len(bullet_points) > 100 else bullet_points,
+        'variants': variants,
+        'reviewsSummary': f"{review_count} reviews available" if review_count else '',
+        'url': product.get('url') or '',
+        'source': source,
+        'hasError': False,
+    }
@@ -0,0 +1,92 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# JSON encoder for responses: auto (orjson when installed), orjson or stdlib
+JSON_ENCODER = os.getenv("JSON_ENCODER", "auto").lower()
+
+orjson = None
+if JSON_ENCODER in ('auto', 'orjson'):
+    try:
+        import orjson
+    except ImportError:
+        if JSON_ENCODER == 'orjson':
+            logger.warning("JSON_ENCODER=orjson but the 'orjson' package is not installed; using stdlib json")
+
+# Same output shape as Flask's compact jsonify: sorted keys, no whitespace
+_ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def default(obj):
+    """Encode objects with a to_dict() method (product_model), for both encoders"""
+    to_dict = getattr(obj, 'to_dict', None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return to_dict()
+
+
+def dumps(obj):
+    """Serialize obj to a compact JSON string with the configured encoder"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), default=default)
+
+
+def loads(value):
+    """Parse a JSON string or bytes with the configured decoder"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+class ModelProviderMixin:
+    """Let a Flask (or Quart) JSON provider encode product models"""
+
+    def default(self, obj):
+        to_dict = getattr(obj, 'to_dict', None)
+        if to_dict is not None:
+            return to_dict()
+        return super().default(obj)
+
+
+class OrjsonProviderMixin:
+    """
+    Serialize with orjson in a Flask (or Quart) JSON provider
+
+    Falls back to the base provider for pretty-printed debug output and
+    for dumps() calls with json.dumps-specific arguments. Non-ASCII text
+    is emitted as UTF-8 rather than \\u escapes.
+    """
+
+    def _orjson_dumps(self, obj, newline=False):
+        option = _ORJSON_OPTIONS | (orjson.OPT_APPEND_NEWLINE if newline else 0)
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {'separators'}:
+            return super().dumps(obj, **kwargs)
+        return self._orjson_dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._orjson_dumps(obj, newline=True), mimetype=self.mimetype)
+
+
+def install_json_provider(app):
+    """
+    Make app's jsonify encode product models, with orjson when it is available
+
+    Works for Flask and Quart apps: the provider class is derived from the
+    app's own default provider so responses keep the framework's type.
+    """
+    base = type(app.json)
+    if orjson is None:
+        app.json = type(f'Model{base.__name__}', (ModelProviderMixin, base), {})(app)
+        return
+    provider_class = type(f'Orjson{base.__name__}', (OrjsonProviderMixin, ModelProviderMixin, base), {})
+    app.json = provider_class(app)
+    logger.info(f"Using orjson for JSON responses of {app.name}")
@@ -0,0 +1,19 @@
+"""
+gunicorn settings, read automatically by `gunicorn app:app`
+
+For serving the Flask app alone with gunicorn (pip install gunicorn); the
+deployed server is hypercorn, configured in hypercorn.conf.py.
+
+With preload_app the master imports the app once and forks its workers,
+so a worker boots without importing Flask and the app again and shares
+those pages with its siblings. Importing app starts no threads, so each
+worker starts its own background threads once it is running.
+"""
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ('1', 'true', 'yes')
+
+
+def post_worker_init(worker):
+    from app import start_background_workers
+    start_background_workers()
@@ -0,0 +1,371 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from batch import run_batch
+from catalog import parse_price, parse_sales_rank
+
+logger = logging.getLogger(__name__)
+
+# History store and watch list configuration
+HISTORY_PATH = os.getenv("HISTORY_PATH", "history.sqlite3")
+WATCH_DEFAULT_INTERVAL = int(os.getenv("WATCH_DEFAULT_INTERVAL", "3600"))
+WATCH_MIN_INTERVAL = int(os.getenv("WATCH_MIN_INTERVAL", "300"))
+WATCH_TICK = int(os.getenv("WATCH_TICK", "60"))
+WATCH_BATCH = int(os.getenv("WATCH_BATCH", "100"))
+WATCH_WORKERS = int(os.getenv("WATCH_WORKERS", "4"))
+
+# A claimed re-scrape that has not finished after this long may be claimed again
+WATCH_LEASE_SECONDS = 600
+
+# Tracked payload fields; the position is the field id stored on disk, so only append
+TRACKED_FIELDS = ('price', 'price_initial', 'price_buybox', 'stock', 'sales_rank', 'coupon')
+FIELD_IDS = {field: i for i, field in enumerate(TRACKED_FIELDS)}
+
+
+def extract_tracked(content):
+    """Return {field: value} for the tracked fields of a product payload"""
+    return {
+        'price': parse_price(content.get('price')),
+        'price_initial': parse_price(content.get('price_initial')),
+        'price_buybox': parse_price(content.get('price_buybox')),
+        'stock': content.get('stock') or None,
+        'sales_rank': parse_sales_rank(content)[0],
+        'coupon': content.get('coupon') or None,
+    }
+
+
+class HistoryStore:
+    """
+    Append-only price/stock history that stores only changes
+
+    Points live in a WITHOUT ROWID table clustered on (series, field, ts),
+    so each field's history for an ASIN is contiguous on disk and a range
+    query is a single index range scan no matter how many points other
+    ASINs have. ASINs are interned to integer series ids and timestamps
+    are whole seconds to keep rows small. A separate latest-value table
+    makes change detection one lookup per record instead of a scan.
+    """
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self.changes = 0
+        self._listeners = []
+        self._local = threading.local()
+        self._pid = os.getpid()
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS series (id INTEGER PRIMARY KEY, asin TEXT NOT NULL UNIQUE)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS points ("
+            "series_id INTEGER NOT NULL, field INTEGER NOT NULL, ts INTEGER NOT NULL, value, "
+            "PRIMARY KEY (series_id, field, ts)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_points_ts ON points (ts)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS latest ("
+            "series_id INTEGER NOT NULL, field INTEGER NOT NULL, ts INTEGER NOT NULL, value, "
+            "PRIMARY KEY (series_id, field)) WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS watchlist ("
+            "asin TEXT PRIMARY KEY, interval INTEGER NOT NULL, next_due REAL NOT NULL, "
+            "claimed_at REAL, added_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_watchlist_due ON watchlist (next_due)")
+
+    def _connect(self):
+        if self._pid != os.getpid():
+            # Connections opened before a fork belong to the parent process
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def subscribe(self, callback):
+        """Call callback(asin, deltas) whenever a record() detects changes"""
+        self._listeners.append(callback)
+
+    def _series_id(self, conn, asin, create=False):
+        row = conn.execute("SELECT id FROM series WHERE asin = ?", (asin,)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return conn.execute("INSERT INTO series (asin) VALUES (?)", (asin,)).lastrowid
+
+    def record(self, asin, content, ts=None):
+        """
+        Record a product snapshot, storing only the fields that changed
+
+        Args:
+            asin (str): Amazon ASIN
+            content (dict): Product payload from Oxylabs
+            ts (float, optional): Observation time, defaults to now
+
+        Returns:
+            list: Delta dicts (field, old, new, ts); empty if nothing changed
+        """
+        ts = int(ts or time.time())
+        values = extract_tracked(content)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            series_id = self._series_id(conn, asin, create=True)
+            previous = {
+                field: (value, seen) for field, value, seen in conn.execute(
+                    "SELECT field, value, ts FROM latest WHERE series_id = ?", (series_id,)
+                )
+            }
+            deltas = []
+            for field, value in values.items():
+                field_id = FIELD_IDS[field]
+                old = previous.get(field_id)
+                # Older observations (e.g. a slow concurrent fetch) never overwrite newer ones
+                if old is not None and (old[0] == value or old[1] > ts):
+                    continue
+                if old is None and value is None:
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO points (series_id, field, ts, value) VALUES (?, ?, ?, ?)",
+                    (series_id, field_id, ts, value),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO latest (series_id, field, ts, value) VALUES (?, ?, ?, ?)",
+                    (series_id, field_id, ts, value),
+                )
+                deltas.append({'field': field, 'old': old[0] if old else None, 'new': value, 'ts': ts})
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if deltas:
+            self.changes += len(deltas)
+            for callback in self._listeners:
+                try:
+                    callback(asin, deltas)
+                except Exception as e:
+                    logger.error(f"History listener failed for {asin}: {str(e)}")
+        return deltas
+
+    def history(self, asin, fields=None, start=None, end=None):
+        """
+        Return the change points of an ASIN within [start, end]
+
+        Each field's series starts with the value in effect at start (the
+        last change at or before it), so the series can be drawn as steps.
+
+        Returns:
+            dict: {field: [[ts, value], ...]} for the requested fields
+        """
+        conn = self._connect()
+        series_id = self._series_id(conn, asin)
+        fields = [field for field in (fields or TRACKED_FIELDS) if field in FIELD_IDS]
+        result = {field: [] for field in fields}
+        if series_id is None:
+            return result
+        start = int(start) if start is not None else 0
+        end = int(end) if end is not None else 2 ** 62
+        for field in fields:
+            field_id = FIELD_IDS[field]
+            points = result[field]
+            before = conn.execute(
+                "SELECT ts, value FROM points WHERE series_id = ? AND field = ? AND ts <= ? "
+                "ORDER BY ts DESC LIMIT 1",
+                (series_id, field_id, start),
+            ).fetchone()
+            if before is not None:
+                points.append(list(before))
+            points.extend(
+                list(row) for row in conn.execute(
+                    "SELECT ts, value FROM points WHERE series_id = ? AND field = ? AND ts > ? AND ts <= ? "
+                    "ORDER BY ts",
+                    (series_id, field_id, start, end),
+                )
+            )
+        return result
+
+    def latest(self, asin):
+        """Return {field: {'value', 'since'}} with the current value of each tracked field"""
+        conn = self._connect()
+        series_id = self._series_id(conn, asin)
+        if series_id is None:
+            return {}
+        return {
+            TRACKED_FIELDS[field]: {'value': value, 'since': ts}
+            for field, value, ts in conn.execute(
+                "SELECT field, value, ts FROM latest WHERE series_id = ?", (series_id,)
+            )
+        }
+
+    def changes_since(self, since=0, limit=1000, cursor=None):
+        """
+        Return change points across all ASINs recorded after since, oldest first
+
+        Points are ordered by (ts, series, field), so pages that end inside a
+        second full of changes continue from the exact point they stopped at.
+
+        Args:
+            since (float, optional): Unix time; only points recorded after it are returned
+            limit (int, optional): Maximum number of points
+            cursor (str, optional): next_cursor of the previous page (takes precedence over since)
+
+        Returns:
+            tuple: (changes, next_cursor), next_cursor being None on the last page
+
+        Raises:
+            ValueError: If cursor is malformed
+        """
+        if cursor:
+            parts = cursor.split('-')
+            if len(parts) != 3 or not all(part.isdigit() for part in parts):
+                raise ValueError(f"Invalid cursor: {cursor}")
+            where, params = "(p.ts, p.series_id, p.field) > (?, ?, ?)", [int(part) for part in parts]
+        else:
+            where, params = "p.ts > ?", [float(since)]
+        rows = self._connect().execute(
+            "SELECT s.asin, p.series_id, p.field, p.ts, p.value FROM points p JOIN series s ON s.id = p.series_id "
+            f"WHERE {where} ORDER BY p.ts, p.series_id, p.field LIMIT ?",
+            params + [int(limit)],
+        ).fetchall()
+        changes = [
+            {'asin': asin, 'field': TRACKED_FIELDS[field], 'ts': ts, 'value': value}
+            for asin, _, field, ts, value in rows
+        ]
+        next_cursor = None
+        if len(rows) == limit:
+            _, series_id, field, ts, _ = rows[-1]
+            next_cursor = f"{ts}-{series_id}-{field}"
+        return changes, next_cursor
+
+    def watch(self, asins, interval=WATCH_DEFAULT_INTERVAL):
+        """Add ASINs to the watch list (or change their interval); they are due immediately"""
+        interval = max(int(interval), WATCH_MIN_INTERVAL)
+        now = time.time()
+        self._connect().executemany(
+            "INSERT INTO watchlist (asin, interval, next_due, added_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(asin) DO UPDATE SET interval = excluded.interval",
+            [(asin, interval, now, now) for asin in asins],
+        )
+        return interval
+
+    def unwatch(self, asin):
+        """Remove an ASIN from the watch list; returns False if it was not watched"""
+        return self._connect().execute("DELETE FROM watchlist WHERE asin = ?", (asin,)).rowcount > 0
+
+    def watchlist(self, limit=1000, offset=0):
+        rows = self._connect().execute(
+            "SELECT asin, interval, next_due, added_at FROM watchlist ORDER BY asin LIMIT ? OFFSET ?",
+            (int(limit), int(offset)),
+        )
+        return [{'asin': a, 'interval': i, 'next_due': n, 'added_at': t} for a, i, n, t in rows]
+
+    def claim_due(self, limit):
+        """
+        Claim up to limit watched ASINs whose re-scrape is due
+
+        Claiming schedules the next run, so worker processes sharing the
+        file do not scrape the same ASIN twice.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            due = conn.execute(
+                "SELECT asin, interval FROM watchlist WHERE next_due <= ? "
+                "AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY next_due LIMIT ?",
+                (now, now - WATCH_LEASE_SECONDS, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE watchlist SET claimed_at = ?, next_due = ? WHERE asin = ?",
+                [(now, now + interval, asin) for asin, interval in due],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [asin for asin, _ in due]
+
+    def release(self, asins):
+        """Clear the claims of ASINs whose re-scrape finished"""
+        self._connect().executemany("UPDATE watchlist SET claimed_at = NULL WHERE asin = ?", [(a,) for a in asins])
+
+    def stats(self):
+        conn = self._connect()
+        return {
+            'series': conn.execute("SELECT COUNT(*) FROM series").fetchone()[0],
+            'watched': conn.execute("SELECT COUNT(*) FROM watchlist").fetchone()[0],
+            'changes_recorded': self.changes,
+            'path': self.path,
+        }
+
+
+class WatchScheduler:
+    """Background thread re-scraping watched ASINs when their interval comes due"""
+
+    def __init__(self, store, scrape, tick=WATCH_TICK, batch_size=WATCH_BATCH, max_workers=WATCH_WORKERS):
+        """
+        Args:
+            store (HistoryStore): Store holding the watch list
+            scrape (callable): Called with an ASIN; fetches it so the snapshot is recorded
+            tick (float, optional): Seconds between checks for due ASINs (0 disables the thread)
+            batch_size (int, optional): ASINs scraped per check
+            max_workers (int, optional): Upstream lookups in flight per check
+        """
+        self.store = store
+        self.scrape = scrape
+        self.tick = tick
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.scraped = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.tick <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='watch-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"Watch scheduler started (checking every {self.tick}s)")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                # Keep going while whole batches come due
+                while self.run_once() >= self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                logger.error(f"Watch list pass failed: {str(e)}")
+
+    def run_once(self):
+        """Scrape one batch of due ASINs and return how many were due"""
+        asins = self.store.claim_due(self.batch_size)
+        if not asins:
+            return 0
+        try:
+            results = run_batch(self.scrape, asins, max_workers=self.max_workers)
+        finally:
+            self.store.release(asins)
+        scraped = sum(1 for result in results if result['value'] and not result['error'])
+        self.scraped += scraped
+        self.failed += len(asins) - scraped
+        logger.info(f"Watch list: re-scraped {scraped}/{len(asins)} due ASINs")
+        return len(asins)
+
+    def stats(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'tick': self.tick,
+            'scraped': self.scraped,
+            'failed': self.failed,
+        }
@@ -0,0 +1,15 @@
+"""
+hypercorn settings for the deployed ASGI server (render.yaml)
+
+    hypercorn --config file:hypercorn.conf.py asgi:application
+
+Every worker process imports asgi on its own; the catalog refresher and
+watch scheduler start from the app's lifespan startup (asgi.startup), once
+per worker, before it accepts requests.
+"""
+import os
+
+bind = [f"0.0.0.0:{os.getenv('PORT', '8000')}"]
+backlog = int(os.getenv("HYPERCORN_BACKLOG", "2048"))
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+graceful_timeout = float(os.getenv("HYPERCORN_GRACEFUL_TIMEOUT", "30"))
@@ -0,0 +1,161 @@
+import os
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from fast_json import dumps as json_dumps
+
+logger = logging.getLogger(__name__)
+
+# Background job configuration
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "8"))
+JOB_MAX_PRODUCTS = int(os.getenv("JOB_MAX_PRODUCTS", "10000"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "86400"))
+
+
+class Job:
+    """A submitted list of product IDs and the results gathered so far"""
+
+    def __init__(self, product_ids):
+        self.id = uuid.uuid4().hex
+        self.product_ids = product_ids
+        self.results = []
+        self.failed = 0
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.finished_at = None
+        self.futures = []
+        self.changed = threading.Condition()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'total': len(self.product_ids),
+            'completed': len(self.results),
+            'failed': self.failed,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Run large product ID lists in the background on a shared worker pool
+
+    Jobs live in process memory, so clients must poll the worker that
+    accepted the job (run a single worker or use sticky sessions).
+    """
+
+    def __init__(self, worker, max_workers=JOB_MAX_WORKERS, retention=JOB_RETENTION):
+        """
+        Args:
+            worker (callable): Takes a product ID and returns its result dict
+            max_workers (int, optional): Upstream lookups in flight across all jobs
+            retention (int, optional): Seconds to keep finished jobs
+        """
+        self.worker = worker
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, product_ids):
+        """Queue a job for product_ids and return it immediately"""
+        self._expire()
+        job = Job(list(product_ids))
+        with self._lock:
+            self._jobs[job.id] = job
+        job.status = 'running'
+        for index, product_id in enumerate(job.product_ids):
+            job.futures.append(self._executor.submit(self._run_item, job, index, product_id))
+        if not job.product_ids:
+            self._finish(job)
+        logger.info(f"Submitted job {job.id} with {len(job.product_ids)} products")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel the pending items of a job; items already running still finish"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        for future in job.futures:
+            future.cancel()
+        with job.changed:
+            if job.status == 'running':
+                job.status = 'cancelled'
+                job.finished_at = time.time()
+            job.changed.notify_all()
+        return job
+
+    def results(self, job_id, offset=0, limit=None):
+        """Return results of a job in completion order, starting at offset"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with job.changed:
+            end = len(job.results) if limit is None else offset + limit
+            return job.results[offset:end]
+
+    def stream(self, job_id, timeout=30):
+        """
+        Yield NDJSON lines for a job's results as they complete
+
+        A heartbeat blank line is sent every timeout seconds without
+        progress so proxies keep the connection open.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return
+        sent = 0
+        while True:
+            with job.changed:
+                if sent >= len(job.results) and job.status == 'running':
+                    job.changed.wait(timeout)
+                pending = job.results[sent:]
+                finished = job.status != 'running'
+            for result in pending:
+                yield json_dumps(result) + "\n"
+            sent += len(pending)
+            if finished and sent >= len(job.results):
+                yield json_dumps({'job': job.to_dict()}) + "\n"
+                return
+            if not pending:
+                yield "\n"
+
+    def _run_item(self, job, index, product_id):
+        try:
+            result = self.worker(product_id)
+        except Exception as e:
+            logger.error(f"Job {job.id} failed on {product_id}: {str(e)}")
+            result = {'productId': product_id, 'error': f'Error: {str(e)}', 'title': f'Product {product_id}'}
+        result = dict(result, index=index)
+        with job.changed:
+            job.results.append(result)
+            if result.get('error'):
+                job.failed += 1
+            done = len(job.results) == len(job.product_ids)
+            job.changed.notify_all()
+        if done:
+            self._finish(job)
+
+    def _finish(self, job):
+        with job.changed:
+            if job.status == 'running':
+                job.status = 'completed'
+                job.finished_at = time.time()
+            job.changed.notify_all()
+        logger.info(f"Job {job.id} finished: {len(job.results)} results, {job.failed} failed")
+
+    def _expire(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
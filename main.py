@@ -1,12 +1,13 @@
 import os
 from dotenv import load_dotenv
 import requests
+from oxylabs_client import post_query, get_credentials
 from pprint import pprint
 
 # Load environment variables
 load_dotenv()
 
-def search_products(query, page=1, country='us'):
+def search_products(query, page=1, country='us', pages=1):
     """
     Search for products using Oxylabs API
     
@@ -14,9 +15,9 @@ def search_products(query, page=1, country='us'):
         query (str): Search query
         page (int, optional): Page number for pagination
         country (str, optional): Country code
+        pages (int, optional): Number of pages to fetch starting at page
     """
-    username = os.getenv("OXYLABS_USERNAME")
-    password = os.getenv("OXYLABS_PASSWORD")
+    username, password = get_credentials()
     if not username or not password:
         print("Error: Please set your OXYLABS_USERNAME and OXYLABS_PASSWORD in the .env file")
         return []
@@ -25,19 +26,15 @@ def search_products(query, page=1, country='us'):
     payload = {
         'source': 'amazon',
         'query': query,
-        'page': page,
+        'start_page': page,
+        'pages': pages,
         'country': country
     }
 
     try:
         print(f"Searching for: {query}")
         # Get response.
-        response = requests.request(
-            'POST',
-            'https://realtime.oxylabs.io/v1/queries',
-            auth=(username, password),
-            json=payload,
-        )
+        response = post_query(payload)
         
         response.raise_for_status()  # Raise exception for bad status codes
         
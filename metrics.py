@@ -0,0 +1,179 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Histogram buckets in seconds, from cache hits up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, count, total) in self._values.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    samples.append((f'{self.name}_bucket', key + (('le', bound),), bucket_count))
+                samples.append((f'{self.name}_bucket', key + (('le', '+Inf'),), count))
+                samples.append((f'{self.name}_count', key, count))
+                samples.append((f'{self.name}_sum', key, total))
+        return samples
+
+
+class Registry:
+    """Collects metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help):
+        metric = Counter(name, help)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        Register a callable evaluated at scrape time
+
+        The callable returns a list of (name, type, help, samples) tuples,
+        where samples is a list of (labels dict, value) pairs. This exposes
+        counters that are already kept elsewhere (caches, single-flight)
+        without double counting.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        for collector in self._collectors:
+            for name, metric_type, help, samples in collector():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(sorted(labels.items()))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+UPSTREAM_LATENCY = registry.histogram('oxylabs_request_duration_seconds', 'Latency of Oxylabs API calls')
+UPSTREAM_ERRORS = registry.counter('oxylabs_errors_total', 'Oxylabs calls that failed or were retried')
+PARSE_TIME = registry.histogram('parse_duration_seconds', 'Time spent parsing upstream payloads')
+EXPORT_TIME = registry.histogram('export_build_duration_seconds', 'Time spent building export files')
+REQUEST_LATENCY = registry.histogram('http_request_duration_seconds', 'End-to-end route latency')
+PRODUCT_CHANGES = registry.counter('product_changes_total', 'Tracked product field changes detected')
+
+# Per-request timing breakdown for the opt-in Server-Timing header. A context
+# variable is per thread under WSGI and per task under ASGI; pool threads run
+# in a copy of the request's context and add to the same dict, so concurrent
+# steps are summed (a step can exceed the total).
+_breakdown = contextvars.ContextVar('breakdown', default=None)
+_breakdown_lock = threading.Lock()
+
+
+def start_breakdown():
+    """Start collecting step timings for the current request"""
+    _breakdown.set({})
+
+
+def get_breakdown():
+    """Return the step timings (seconds) collected for the current request"""
+    return _breakdown.get() or {}
+
+
+def record_step(step, seconds):
+    steps = _breakdown.get()
+    if steps is not None:
+        with _breakdown_lock:
+            steps[step] = steps.get(step, 0.0) + seconds
+
+
+@contextmanager
+def timed(histogram, step=None, **labels):
+    """
+    Time a block into a histogram and, if step is set, the request breakdown
+
+    Args:
+        histogram (Histogram): Metric receiving the duration
+        step (str, optional): Name of the step in the Server-Timing header
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        if step:
+            record_step(step, elapsed)
+
+
+def server_timing_header(total_seconds):
+    """Format the current breakdown plus the total as a Server-Timing header value"""
+    parts = [f'{step};dur={seconds * 1000:.1f}' for step, seconds in get_breakdown().items()]
+    parts.append(f'total;dur={total_seconds * 1000:.1f}')
+    return ', '.join(parts)
@@ -0,0 +1,231 @@
+"""
+Local mock of the Oxylabs realtime API for offline development
+
+Point the app at it with OXYLABS_API_URL=http://127.0.0.1:8765/v1/queries
+"""
+import os
+import re
+import json
+import copy
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Recorded /scrape-products payload used as the product detail template
+PRODUCT_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'response.json')
+
+ASIN_IN_URL = re.compile(r'/dp/([A-Z0-9]{10})')
+
+
+def load_product_template(path=PRODUCT_FIXTURE):
+    """Load the recorded product payload used for amazon detail queries"""
+    with open(path) as f:
+        product = json.load(f)['results'][0]
+    product.pop('productId', None)
+    return product
+
+
+def make_product_content(template, asin):
+    """Return a copy of the product template rewritten for asin"""
+    content = copy.deepcopy(template)
+    content['asin'] = asin
+    content['asin_in_url'] = asin
+    content['url'] = f'https://www.amazon.com/dp/{asin}'
+    return content
+
+
+def make_search_content(query, page=1, count=48):
+    """Build a parsed amazon_search content block with count organic results"""
+    organic = []
+    for i in range(count):
+        n = (page - 1) * count + i
+        asin = f'B{n:09d}'
+        organic.append({
+            'pos': i + 1,
+            'asin': asin,
+            'url': f'/dp/{asin}',
+            'title': f'{query} item {n} ({(n * 37) % 5000:,} ratings)',
+            'price': round(5 + (n * 7.31) % 500, 2),
+            'rating': round(3 + (n % 20) / 10, 1),
+            'reviews_count': (n * 37) % 5000,
+            'url_image': f'https://m.media-amazon.com/images/I/{asin}.jpg',
+            'is_prime': n % 2 == 0,
+            'best_seller': n % 11 == 0,
+            'is_amazons_choice': n % 13 == 0,
+            'sales_volume': f'{n % 9}K+ bought in past month' if n % 3 else '',
+            'manufacturer': 'Mock',
+            'shipping_information': 'FREE delivery',
+        })
+    return {
+        'page': page,
+        'query': query,
+        'results': {'organic': organic, 'paid': []},
+        'parse_status_code': 12000,
+    }
+
+
+# Retailer search sources answered with e-commerce style listings
+RETAILER_SEARCH_SOURCES = {
+    'walmart_search': ('walmart.com', '/ip/{id}'),
+    'bestbuy_search': ('bestbuy.com', '/site/{id}'),
+    'target_search': ('target.com', '/p/{id}'),
+}
+
+
+def make_retailer_search_content(source, query, page=1, count=24):
+    """Build a parsed non-Amazon search content block with nested general/price/rating items"""
+    domain, path = RETAILER_SEARCH_SOURCES[source]
+    results = []
+    for i in range(count):
+        n = (page - 1) * count + i
+        product_id = str(100000 + n)
+        results.append({
+            'general': {
+                'pos': i + 1,
+                'url': path.format(id=product_id),
+                'image': f'https://images.{domain}/{product_id}.jpg',
+                'title': f'{query} {domain} item {n}',
+                'sponsored': n % 7 == 0,
+            },
+            'price': {'price': round(4 + (n * 5.17) % 400, 2), 'currency': 'USD'},
+            'rating': {'rating': round(3 + (n % 15) / 10, 1), 'count': (n * 23) % 3000},
+            'seller': {'name': domain.split('.')[0].title()},
+        })
+    return {'page': page, 'query': query, 'results': results, 'parse_status_code': 12000}
+
+
+def load_recorded_response(path):
+    """Load a recorded raw Oxylabs response to replay verbatim"""
+    with open(path) as f:
+        return json.load(f)
+
+
+class MockOxylabsHandler(BaseHTTPRequestHandler):
+    """
+    Answer POST /v1/queries with recorded or synthesized payloads
+
+    The server's latency, jitter (seconds) and error_rate (0-1)
+    attributes shape every response, so benchmarks can model a slow or
+    flaky upstream.
+    """
+
+    server_version = 'MockOxylabs/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            return self._send(400, {'message': 'Invalid JSON payload'})
+
+        server = self.server
+        source = payload.get('source')
+        delay = server.source_latency.get(source, server.latency) + random.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if server.error_rate and random.random() < server.error_rate:
+            return self._send(random.choice((429, 500, 503)), {'message': 'Injected mock error'})
+
+        if source == 'amazon_search' and server.search_response is not None:
+            return self._send(200, server.search_response)
+        if source == 'amazon_search':
+            content = make_search_content(payload.get('query', ''), int(payload.get('start_page', payload.get('page', 1))))
+        elif source == 'amazon':
+            match = ASIN_IN_URL.search(payload.get('url', ''))
+            asin = match.group(1) if match else payload.get('query', '')
+            content = make_product_content(self.server.product_template, asin)
+        elif source in RETAILER_SEARCH_SOURCES:
+            content = make_retailer_search_content(source, payload.get('query', ''), int(payload.get('start_page', 1)))
+        else:
+            return self._send(400, {'message': f'Unsupported source: {source}'})
+
+        self._send(200, {'results': [{'content': content, 'status_code': 200, 'page': 1}]})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockOxylabsServer(ThreadingHTTPServer):
+    # Large accept backlog so hundreds of concurrent clients are not reset
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def create_mock_server(host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                       product_payload=PRODUCT_FIXTURE, search_payload=None, source_latency=None, verbose=False):
+    """
+    Create (but do not start) a mock server
+
+    Args:
+        latency (float, optional): Base response delay in seconds
+        jitter (float, optional): Uniform +/- delay added to latency, in seconds
+        error_rate (float, optional): Fraction of requests answered with 429/500/503
+        product_payload (str, optional): Recorded /scrape-products payload used as product template
+        search_payload (str, optional): Recorded raw amazon_search response replayed for every search
+        source_latency (dict, optional): Base delay per Oxylabs source, overriding latency
+    """
+    server = MockOxylabsServer((host, port), MockOxylabsHandler)
+    server.verbose = verbose
+    server.latency = latency
+    server.source_latency = source_latency or {}
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.product_template = load_product_template(product_payload)
+    server.search_response = load_recorded_response(search_payload) if search_payload else None
+    return server
+
+
+def start_mock_server(host='127.0.0.1', port=0, **options):
+    """
+    Start the mock server on a background thread
+
+    Returns:
+        tuple: (server, queries_url) - call server.shutdown() to stop it
+    """
+    server = create_mock_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}/v1/queries'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local mock of the Oxylabs realtime API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Base response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--product-payload', default=PRODUCT_FIXTURE, help='Recorded product payload')
+    parser.add_argument('--search-payload', help='Recorded amazon_search response to replay')
+    parser.add_argument('--source-latency', action='append', default=[], metavar='SOURCE=SECONDS',
+                        help='Base delay for one source, e.g. walmart_search=5 (repeatable)')
+    args = parser.parse_args()
+    source_latency = {}
+    for value in args.source_latency:
+        source, _, seconds = value.partition('=')
+        source_latency[source] = float(seconds)
+
+    server = create_mock_server(
+        args.host, args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        product_payload=args.product_payload, search_payload=args.search_payload,
+        source_latency=source_latency, verbose=True
+    )
+    print(f"Mock Oxylabs API listening on http://{args.host}:{args.port}/v1/queries")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+import os
+import time
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from metrics import timed, UPSTREAM_LATENCY, UPSTREAM_ERRORS
+from resilience import TokenBucket, CircuitBreaker, MinuteBudget, backoff_delay, parse_retry_after
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OXYLABS_API_URL = os.getenv("OXYLABS_API_URL", "https://realtime.oxylabs.io/v1/queries")
+
+# Connection pool and timeout settings
+POOL_SIZE = int(os.getenv("OXYLABS_POOL_SIZE", os.getenv("SCRAPE_MAX_WORKERS", "10")))
+CONNECT_TIMEOUT = float(os.getenv("OXYLABS_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("OXYLABS_READ_TIMEOUT", "90"))
+
+# Connections kept by the asyncio client used by the ASGI app
+ASYNC_POOL_SIZE = int(os.getenv("OXYLABS_ASYNC_POOL_SIZE", "100"))
+
+# Rate limiting, retry and circuit breaker settings
+RATE_LIMIT_PER_SECOND = float(os.getenv("OXYLABS_RATE_LIMIT", "10"))
+RATE_LIMIT_BURST = int(os.getenv("OXYLABS_RATE_BURST", "20"))
+BUDGET_PER_MINUTE = int(os.getenv("OXYLABS_BUDGET_PER_MINUTE", "0"))
+MAX_RETRIES = int(os.getenv("OXYLABS_MAX_RETRIES", "3"))
+RETRY_BACKOFF_BASE = float(os.getenv("OXYLABS_BACKOFF_BASE", "0.5"))
+RETRY_BACKOFF_CAP = float(os.getenv("OXYLABS_BACKOFF_CAP", "10"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BREAKER_FAILURES = int(os.getenv("OXYLABS_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("OXYLABS_BREAKER_RESET", "30"))
+
+rate_limiter = TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+circuit_breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+budget = MinuteBudget(BUDGET_PER_MINUTE)
+
+_source_breakers = {}
+_source_breakers_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+_async_client = None
+_retries = 0
+_retries_lock = threading.Lock()
+
+
+class UpstreamUnavailableError(requests.exceptions.RequestException):
+    """Raised without calling Oxylabs when the circuit is open or the budget is spent"""
+
+
+def get_credentials():
+    """Return the (username, password) pair configured in the environment"""
+    return os.getenv("OXYLABS_USERNAME"), os.getenv("OXYLABS_PASSWORD")
+
+
+def get_session():
+    """
+    Return the shared keep-alive session used for all Oxylabs calls
+
+    The session is created lazily with a connection pool sized to the
+    number of worker threads, so concurrent lookups reuse TLS connections
+    instead of opening a new one per query.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=True)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.auth = get_credentials()
+                _session = session
+                logger.info(f"Created Oxylabs session with pool size {POOL_SIZE}")
+    return _session
+
+
+def get_source_breaker(source):
+    """
+    Return the circuit breaker of one Oxylabs source
+
+    Used by calls whose failures say more about one retailer than about
+    Oxylabs as a whole, so they do not open the shared circuit_breaker.
+    """
+    breaker = _source_breakers.get(source)
+    if breaker is None:
+        with _source_breakers_lock:
+            breaker = _source_breakers.setdefault(source, CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET))
+    return breaker
+
+
+def post_query(payload, timeout=None, retries=None, breaker=None):
+    """
+    Send a query to the Oxylabs realtime API over the shared session
+
+    Requests are rate limited and budgeted. 429/5xx responses and
+    connection errors are retried with exponential backoff and jitter
+    (honouring Retry-After), and calls fail fast while the circuit
+    breaker is open.
+
+    Args:
+        payload (dict): Oxylabs query payload
+        timeout (tuple, optional): (connect, read) timeout in seconds
+        retries (int, optional): Retries after the first attempt, defaults to MAX_RETRIES
+        breaker (CircuitBreaker, optional): Breaker to check and update instead of circuit_breaker
+
+    Returns:
+        requests.Response: The raw API response (the last one if retries ran out)
+
+    Raises:
+        UpstreamUnavailableError: If the circuit is open or the budget is spent
+        requests.exceptions.RequestException: If the last attempt failed to connect
+    """
+    session = get_session()
+    source = payload.get('source', 'unknown')
+    retries = MAX_RETRIES if retries is None else retries
+    breaker = breaker or circuit_breaker
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            UPSTREAM_ERRORS.inc(source=source, reason='circuit_open')
+            raise UpstreamUnavailableError("Oxylabs circuit breaker is open; failing fast")
+        if not budget.try_request():
+            UPSTREAM_ERRORS.inc(source=source, reason='budget_exhausted')
+            raise UpstreamUnavailableError("Oxylabs per-minute request budget exhausted")
+        rate_limiter.acquire()
+
+        try:
+            with timed(UPSTREAM_LATENCY, step='upstream', source=source):
+                response = session.post(
+                    OXYLABS_API_URL,
+                    json=payload,
+                    timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT),
+                )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            UPSTREAM_ERRORS.inc(source=source, reason=type(e).__name__)
+            breaker.record_failure()
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP)
+            logger.warning(f"Oxylabs request failed ({str(e)}), retrying in {delay:.2f}s")
+            _count_retry()
+            time.sleep(delay)
+            continue
+        except Exception as e:
+            # Not retried (e.g. ChunkedEncodingError), but still an outcome for the breaker
+            UPSTREAM_ERRORS.inc(source=source, reason=type(e).__name__)
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+
+        if response.status_code in RETRY_STATUSES:
+            UPSTREAM_ERRORS.inc(source=source, reason=f'http_{response.status_code}')
+            breaker.record_failure()
+            if attempt == retries:
+                return response
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is None:
+                delay = backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP)
+            logger.warning(f"Oxylabs returned {response.status_code}, retrying in {delay:.2f}s")
+            _count_retry()
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        if response.ok:
+            budget.record_credit()
+        return response
+
+
+def get_async_client():
+    """
+    Return the shared asyncio HTTP client used by the ASGI app
+
+    Created lazily inside the running event loop; one client multiplexes
+    hundreds of concurrent Oxylabs calls over a keep-alive pool.
+    """
+    global _async_client
+    if _async_client is None:
+        import httpx
+        _async_client = httpx.AsyncClient(
+            auth=get_credentials(),
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=ASYNC_POOL_SIZE, max_keepalive_connections=ASYNC_POOL_SIZE),
+        )
+        logger.info(f"Created async Oxylabs client with pool size {ASYNC_POOL_SIZE}")
+    return _async_client
+
+
+async def close_async_client():
+    """Close the asyncio HTTP client, e.g. when the ASGI server shuts down"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def post_query_async(payload, timeout=None, retries=None, breaker=None):
+    """
+    Send a query to the Oxylabs realtime API without blocking the event loop
+
+    Applies the same rate limit, budget, retry and circuit breaker policy
+    as post_query, sharing its limiter and breaker state.
+
+    Args:
+        payload (dict): Oxylabs query payload
+        timeout (tuple, optional): (connect, read) timeout in seconds
+        retries (int, optional): Retries after the first attempt, defaults to MAX_RETRIES
+        breaker (CircuitBreaker, optional): Breaker to check and update instead of circuit_breaker
+
+    Returns:
+        httpx.Response: The raw API response (the last one if retries ran out)
+
+    Raises:
+        UpstreamUnavailableError: If the circuit is open or the budget is spent
+        httpx.TransportError: If the last attempt failed to connect
+    """
+    import asyncio
+    import httpx
+    client = get_async_client()
+    source = payload.get('source', 'unknown')
+    retries = MAX_RETRIES if retries is None else retries
+    breaker = breaker or circuit_breaker
+    if timeout:
+        timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            UPSTREAM_ERRORS.inc(source=source, reason='circuit_open')
+            raise UpstreamUnavailableError("Oxylabs circuit breaker is open; failing fast")
+        if not budget.try_request():
+            UPSTREAM_ERRORS.inc(source=source, reason='budget_exhausted')
+            raise UpstreamUnavailableError("Oxylabs per-minute request budget exhausted")
+        await rate_limiter.acquire_async()
+
+        try:
+            with timed(UPSTREAM_LATENCY, step='upstream', source=source):
+                if timeout:
+                    response = await client.post(OXYLABS_API_URL, json=payload, timeout=timeout)
+                else:
+                    response = await client.post(OXYLABS_API_URL, json=payload)
+        except httpx.TransportError as e:
+            UPSTREAM_ERRORS.inc(source=source, reason=type(e).__name__)
+            breaker.record_failure()
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP)
+            logger.warning(f"Oxylabs request failed ({str(e)}), retrying in {delay:.2f}s")
+            _count_retry()
+            await asyncio.sleep(delay)
+            continue
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(source=source, reason=type(e).__name__)
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (client disconnect, wait_for deadline): no verdict on upstream
+            breaker.release()
+            raise
+
+        if response.status_code in RETRY_STATUSES:
+            UPSTREAM_ERRORS.inc(source=source, reason=f'http_{response.status_code}')
+            breaker.record_failure()
+            if attempt == retries:
+                return response
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is None:
+                delay = backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP)
+            logger.warning(f"Oxylabs returned {response.status_code}, retrying in {delay:.2f}s")
+            _count_retry()
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        if response.is_success:
+            budget.record_credit()
+        return response
+
+
+def _count_retry():
+    global _retries
+    with _retries_lock:
+        _retries += 1
+
+
+def get_stats():
+    """
+    Report connection reuse, retries, rate limiting and budget usage
+
+    Returns:
+        dict: Connection pool, retry, circuit breaker and budget statistics
+    """
+    num_requests = 0
+    num_connections = 0
+    if _session is not None:
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                num_requests += pool.num_requests
+                num_connections += pool.num_connections
+    reused = max(num_requests - num_connections, 0)
+    return {
+        'requests': num_requests,
+        'connections_opened': num_connections,
+        'connections_reused': reused,
+        'reuse_ratio': round(reused / num_requests, 3) if num_requests else 0.0,
+        'pool_size': POOL_SIZE,
+        'retries': _retries,
+        'rate_limit_wait_seconds': round(rate_limiter.waited, 3),
+        'circuit_breaker': circuit_breaker.stats(),
+        'source_circuit_breakers': {source: breaker.stats() for source, breaker in list(_source_breakers.items())},
+        'budget': budget.stats(),
+    }
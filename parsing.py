@@ -0,0 +1,219 @@
+import re
+import logging
+from product_model import Listing, PRICE_NOT_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+# Precompiled patterns used while parsing amazon_search listings
+TITLE_PRICE_RE = re.compile(r'\$(\d+(?:\.\d+)?)')
+TITLE_REVIEWS_RE = re.compile(r'(\d+(?:,\d+)*)\s*(?:reviews|ratings|\(|\)|stars)', re.IGNORECASE)
+URL_ASIN_RE = re.compile(r'/dp/([A-Z0-9]{10})')
+# A bare Amazon ASIN, as accepted by the product endpoints and imports
+ASIN_RE = re.compile(r'^[A-Z0-9]{10}$')
+NON_NUMERIC_RE = re.compile(r'[^\d\.]')
+
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/300x300?text=Amazon+Product"
+
+# Output columns, in the order of the product dict returned by /search
+COLUMNS = Listing.KEYS
+
+# Flags appended to the listing description when set on the item
+DESCRIPTION_FLAGS = (
+    ("best_seller", "Best Seller"),
+    ("is_amazons_choice", "Amazon's Choice"),
+    ("is_prime", "Prime Eligible"),
+)
+
+# Item keys checked in order for the listing image
+IMAGE_KEYS = ("url_image", "image", "thumbnail")
+
+
+def _number_price(value):
+    price = float(value)
+    return f"${price:.2f}", price
+
+
+def _dict_price(value):
+    price_text = value.get("raw", value.get("value", PRICE_NOT_AVAILABLE))
+    price = 0
+    try:
+        if "value" in value:
+            price = float(value.get("value", 0))
+        elif "raw" in value:
+            # Extract numeric part from formats like "$19.99" or "19,99 €"
+            numeric_part = NON_NUMERIC_RE.sub('', value.get("raw", "").replace(',', '.'))
+            if numeric_part:
+                price = float(numeric_part)
+    except (ValueError, TypeError) as e:
+        logger.debug(f"Error parsing price: {e}")
+    return price_text, price
+
+
+def _number_rating(value):
+    return float(value)
+
+
+def _dict_rating(value):
+    return float(value.get("value", 0)) if "value" in value else 0
+
+
+def _scalar_reviews(value):
+    return int(str(value).replace(',', '').replace('.', '').strip())
+
+
+def _dict_reviews(value):
+    return int(value.get("value", 0)) if "value" in value else 0
+
+
+# Type dispatch tables replacing per-item isinstance chains
+PRICE_PARSERS = {int: _number_price, float: _number_price, bool: _number_price, dict: _dict_price}
+RATING_PARSERS = {int: _number_rating, float: _number_rating, bool: _number_rating, dict: _dict_rating}
+REVIEW_PARSERS = {int: _scalar_reviews, bool: _scalar_reviews, str: _scalar_reviews, dict: _dict_reviews}
+
+
+_MISSING = object()
+
+
+def parse_item(item, position):
+    """
+    Normalize one amazon_search organic item into a Listing
+
+    Args:
+        item (dict): Organic result item from Oxylabs
+        position (int): 1-based position of the item in the result list
+    """
+    get = item.get
+    title = get("title", "No title available")
+
+    url = get("url", "")
+    if url and url[0] == "/":
+        url = "https://www.amazon.com" + url
+
+    # Price: typed field, or a dollar amount shown in the title
+    price_text = PRICE_NOT_AVAILABLE
+    extracted_price = 0
+    price = get("price", _MISSING)
+    if price is _MISSING:
+        match = TITLE_PRICE_RE.search(title)
+        if match:
+            price_text = f"${match.group(1)}"
+            extracted_price = float(match.group(1))
+    elif type(price) is float or type(price) is int:
+        # Formatted as "$19.99" by Listing.price when sent
+        extracted_price = float(price)
+        price_text = None
+    else:
+        parser = PRICE_PARSERS.get(type(price))
+        if parser is not None:
+            try:
+                price_text, extracted_price = parser(price)
+            except (ValueError, TypeError) as e:
+                logger.debug(f"Error parsing price: {e}")
+
+    rating = 0
+    value = get("rating", _MISSING)
+    if type(value) is float:
+        rating = value
+    elif value is not _MISSING:
+        parser = RATING_PARSERS.get(type(value))
+        if parser is not None:
+            try:
+                rating = parser(value)
+            except (ValueError, TypeError):
+                rating = 0
+
+    review_count = 0
+    value = get("reviews_count", _MISSING)
+    if type(value) is int:
+        review_count = value
+    elif value is not _MISSING:
+        try:
+            review_count = int(value)
+        except (ValueError, TypeError):
+            review_count = 0
+    else:
+        value = get("reviews", _MISSING)
+        if value is not _MISSING:
+            parser = REVIEW_PARSERS.get(type(value))
+            if parser is not None:
+                try:
+                    review_count = parser(value)
+                except (ValueError, TypeError):
+                    review_count = 0
+    if review_count == 0:
+        # Look for patterns like "1,234 reviews" or "(1,234)"
+        match = TITLE_REVIEWS_RE.search(title)
+        if match:
+            review_count = int(match.group(1).replace(',', ''))
+
+    image_url = ""
+    for key in IMAGE_KEYS:
+        if key in item:
+            image_url = item[key]
+            break
+    if not image_url:
+        if "variants" in item:
+            for variant in item["variants"]:
+                if "image" in variant:
+                    image_url = variant.get("image", "")
+                    break
+        if not image_url:
+            image_url = PLACEHOLDER_IMAGE
+
+    product_id = get("asin", _MISSING)
+    if product_id is _MISSING:
+        product_id = ""
+        if url:
+            match = URL_ASIN_RE.search(url)
+            if match:
+                product_id = match.group(1)
+
+    description_parts = []
+    if get("sales_volume"):
+        description_parts.append(item["sales_volume"])
+    for key, label in DESCRIPTION_FLAGS:
+        if get(key):
+            description_parts.append(label)
+    if get("manufacturer"):
+        description_parts.append(f"By {item['manufacturer']}")
+
+    return Listing(
+        position, title, url, price_text, extracted_price, rating, review_count, image_url,
+        " | ".join(description_parts), "amazon.com", get("shipping_information", ""), product_id,
+    )
+
+
+def parse_listings(items):
+    """
+    Parse a whole organic result list into the Listings used by /search
+
+    Args:
+        items (list): Organic result items from an amazon_search response
+    """
+    rows = []
+    append = rows.append
+    for i, item in enumerate(items, 1):
+        try:
+            append(parse_item(item, i))
+        except Exception as e:
+            logger.warning(f"Error processing item: {str(e)}")
+    return rows
+
+
+def extract_organic_items(response_json):
+    """
+    Return the organic result items of an amazon_search API response
+
+    Args:
+        response_json (dict): Decoded Oxylabs response
+    """
+    results = (response_json or {}).get("results") or []
+    if not results or "content" not in results[0]:
+        return []
+    content = results[0]["content"]
+    if not isinstance(content, dict):
+        return []
+    container = content.get("results", {})
+    if isinstance(container, dict):
+        return container.get("organic", []) or []
+    return []
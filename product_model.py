@@ -0,0 +1,257 @@
+"""
+Compact product models shared by search listings and catalog records
+
+Search listings are held by the thousand in memoized search stores and
+result sets, and normalized detail records are built for every catalog
+write and query. Both models keep their fields in __slots__ instead of a
+per-object dict (about a quarter of the memory of the 13-key listing
+dict), convert to the API's dict shape or to an export row in one call,
+and read like read-only mappings, so code written against the old dicts
+(row['price'], row.get('productId'), iteration over keys) keeps working.
+
+Caches and result sets store listings as positional rows (pack_listings /
+unpack_listings) instead of repeating the 13 keys in every JSON object.
+"""
+from collections.abc import Mapping
+from operator import attrgetter
+
+PRICE_NOT_AVAILABLE = "Price not available"
+
+# Distinct column lists whose row getters are kept per model class
+ROW_GETTER_CACHE_SIZE = 256
+
+
+class ProductModel(Mapping):
+    """
+    Base of the slot-backed models
+
+    Subclasses list their output keys and the attribute holding each one
+    in FIELDS; keys, per-key lookup and the attrgetters used by to_dict()
+    and to_row() are derived from it once per class.
+    """
+
+    __slots__ = ()
+
+    # (output key, attribute) pairs, in output order
+    FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.KEYS = tuple(key for key, _ in cls.FIELDS)
+        cls._attrs = dict(cls.FIELDS)
+        cls._values = attrgetter(*(attr for _, attr in cls.FIELDS))
+        cls._row_getters = {}
+
+    def __getitem__(self, key):
+        try:
+            attr = self._attrs[key]
+        except KeyError:
+            raise KeyError(key) from None
+        return getattr(self, attr)
+
+    def __contains__(self, key):
+        return key in self._attrs
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Return the model as a plain dict with the KEYS of the API response"""
+        return dict(zip(self.KEYS, self._values(self)))
+
+    def to_row(self, columns=None):
+        """
+        Return the values for an export row
+
+        Args:
+            columns (list, optional): Output keys in column order (defaults to KEYS);
+                keys the model does not have give None
+
+        Returns:
+            list: One value per column
+        """
+        if columns is None:
+            return list(self._values(self))
+        key = tuple(columns)
+        getter = self._row_getters.get(key)
+        if getter is None:
+            if len(self._row_getters) >= ROW_GETTER_CACHE_SIZE:
+                self._row_getters.clear()
+            getter = self._row_getters[key] = _row_getter(self._attrs, key)
+        return getter(self)
+
+
+def _row_getter(attrs, columns):
+    names = [attrs.get(column) for column in columns]
+    if None not in names and len(names) > 1:
+        values = attrgetter(*names)
+        return lambda model: list(values(model))
+    return lambda model: [getattr(model, name) if name else None for name in names]
+
+
+class Listing(ProductModel):
+    """
+    One search listing in the /search product shape
+
+    Attributes:
+        position (int): 1-based rank in the result list
+        title (str): Listing title
+        link (str): Product URL
+        price_text (str): Price as displayed, or None when it is extracted_price formatted as "$19.99"
+        extracted_price (float): Numeric price (0 when unknown)
+        rating (float): Star rating
+        rating_count (int): Number of ratings
+        image_url (str): Listing image, sent as both imageUrl and thumbnail
+        description (str): Badges and seller text
+        source (str): Retailer domain
+        delivery (str): Shipping information
+        product_id (str): ASIN or retailer product id
+    """
+
+    __slots__ = (
+        'position', 'title', 'link', 'price_text', 'extracted_price', 'rating', 'rating_count',
+        'image_url', 'description', 'source', 'delivery', 'product_id',
+    )
+
+    FIELDS = (
+        ('position', 'position'), ('title', 'title'), ('link', 'link'), ('price', 'price'),
+        ('extracted_price', 'extracted_price'), ('rating', 'rating'), ('ratingCount', 'rating_count'),
+        ('imageUrl', 'image_url'), ('thumbnail', 'image_url'), ('description', 'description'),
+        ('source', 'source'), ('delivery', 'delivery'), ('productId', 'product_id'),
+    )
+
+    def __init__(self, position=0, title='', link='', price_text=None, extracted_price=0, rating=0,
+                 rating_count=0, image_url='', description='', source='', delivery='', product_id=''):
+        self.position = position
+        self.title = title
+        self.link = link
+        self.price_text = price_text
+        self.extracted_price = extracted_price
+        self.rating = rating
+        self.rating_count = rating_count
+        self.image_url = image_url
+        self.description = description
+        self.source = source
+        self.delivery = delivery
+        self.product_id = product_id
+
+    @property
+    def price(self):
+        text = self.price_text
+        return f"${self.extracted_price:.2f}" if text is None else text
+
+    def to_dict(self):
+        # Spelled out, since this runs for every listing of every JSON response. Keys
+        # are in sorted order: responses are encoded with sorted keys, which is
+        # cheapest for orjson when a dict is already sorted.
+        image_url = self.image_url
+        price = self.price_text
+        return {
+            "delivery": self.delivery,
+            "description": self.description,
+            "extracted_price": self.extracted_price,
+            "imageUrl": image_url,
+            "link": self.link,
+            "position": self.position,
+            "price": f"${self.extracted_price:.2f}" if price is None else price,
+            "productId": self.product_id,
+            "rating": self.rating,
+            "ratingCount": self.rating_count,
+            "source": self.source,
+            "thumbnail": image_url,
+            "title": self.title,
+        }
+
+    def with_position(self, position):
+        """Return a copy of the listing at another position"""
+        return Listing(position, self.title, self.link, self.price_text, self.extracted_price, self.rating,
+                       self.rating_count, self.image_url, self.description, self.source, self.delivery,
+                       self.product_id)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a listing from a /search product dict (e.g. one decoded from JSON)"""
+        get = data.get
+        extracted_price = get('extracted_price', 0)
+        price = get('price', PRICE_NOT_AVAILABLE)
+        if type(extracted_price) in (int, float) and price == f"${extracted_price:.2f}":
+            # Derived again by the price property instead of being stored
+            price = None
+        return cls(
+            get('position', 0), get('title', ''), get('link', ''), price, extracted_price,
+            get('rating', 0), get('ratingCount', 0), get('imageUrl') or get('thumbnail') or '',
+            get('description', ''), get('source', ''), get('delivery', ''), get('productId', ''),
+        )
+
+
+_listing_slots = attrgetter(*Listing.__slots__)
+
+
+def as_listing(row):
+    """Return row as a Listing, converting /search product dicts"""
+    return row if type(row) is Listing else Listing.from_dict(row)
+
+
+def pack_listings(listings):
+    """
+    Encode listings as positional rows for a JSON cache entry
+
+    Returns:
+        dict: {'fields': slot names, 'rows': one list of slot values per listing}
+    """
+    return {'fields': Listing.__slots__, 'rows': [_listing_slots(as_listing(listing)) for listing in listings]}
+
+
+def unpack_listings(packed):
+    """
+    Decode pack_listings output (or a plain list of product dicts) into Listings
+
+    Rows written with a different field list are matched up by name.
+    """
+    if isinstance(packed, list):
+        return [Listing.from_dict(row) for row in packed]
+    fields = tuple(packed['fields'])
+    if fields == Listing.__slots__:
+        return [Listing(*row) for row in packed['rows']]
+    known = set(Listing.__slots__)
+    return [Listing(**{name: value for name, value in zip(fields, row) if name in known})
+            for row in packed['rows']]
+
+
+class ProductRecord(ProductModel):
+    """
+    Normalized product detail record, as stored in the catalog
+
+    Attributes mirror catalog.RECORD_COLUMNS; numeric fields are None when
+    the payload did not have them.
+    """
+
+    __slots__ = (
+        'asin', 'title', 'brand', 'price', 'currency', 'stock', 'in_stock', 'rating',
+        'reviews_count', 'sales_rank', 'sales_rank_category', 'url', 'fetched_at',
+    )
+
+    FIELDS = tuple((name, name) for name in __slots__)
+
+    def __init__(self, asin, title=None, brand=None, price=None, currency=None, stock=None, in_stock=None,
+                 rating=None, reviews_count=None, sales_rank=None, sales_rank_category=None, url=None,
+                 fetched_at=None):
+        self.asin = asin
+        self.title = title
+        self.brand = brand
+        self.price = price
+        self.currency = currency
+        self.stock = stock
+        self.in_stock = in_stock
+        self.rating = rating
+        self.reviews_count = reviews_count
+        self.sales_rank = sales_rank
+        self.sales_rank_category = sales_rank_category
+        self.url = url
+        self.fetched_at = fetched_at
@@ -0,0 +1,76 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from product_model import as_listing
+
+
+class ProductStore:
+    """
+    Array-backed store of parsed search listings with precomputed orderings
+
+    Numeric fields are held in typed arrays and the price index is kept
+    sorted, so price-range filters are two binary searches and every
+    supported sort order is a slice of a precomputed index list. Rows are
+    shared between queries and must be treated as read-only.
+    """
+
+    SORT_ORDERS = ('price_asc', 'price_desc', 'rating')
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows (list): Listings as returned by parsing.parse_listings (product dicts are converted)
+        """
+        self.rows = [as_listing(row) for row in rows]
+        n = len(self.rows)
+        self.prices = array('d', (float(row.extracted_price) for row in self.rows))
+        self.ratings = array('d', (float(row.rating) for row in self.rows))
+
+        # Stable orderings, so ties keep their original listing order
+        prices = self.prices
+        ratings = self.ratings
+        self.price_order = array('q', sorted(range(n), key=prices.__getitem__))
+        self.price_desc_order = array('q', sorted(range(n), key=prices.__getitem__, reverse=True))
+        self.rating_order = array('q', sorted(range(n), key=ratings.__getitem__, reverse=True))
+        self.sorted_prices = array('d', (prices[i] for i in self.price_order))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _price_bounds(self, min_price, max_price):
+        lo = 0 if min_price is None else bisect_left(self.sorted_prices, float(min_price))
+        hi = len(self.rows) if max_price is None else bisect_right(self.sorted_prices, float(max_price))
+        return lo, max(lo, hi)
+
+    def query_indexes(self, min_price=None, max_price=None, sort_by=None):
+        """
+        Return row indexes matching a price range, in the requested order
+
+        Args:
+            min_price (float, optional): Minimum extracted price (inclusive)
+            max_price (float, optional): Maximum extracted price (inclusive)
+            sort_by (str, optional): price_asc, price_desc or rating
+        """
+        n = len(self.rows)
+        lo, hi = self._price_bounds(min_price, max_price)
+        if lo == hi:
+            return []
+        unfiltered = lo == 0 and hi == n
+
+        if sort_by == 'price_asc':
+            return self.price_order[lo:hi]
+        if sort_by == 'price_desc':
+            return self.price_desc_order[n - hi:n - lo]
+        if sort_by == 'rating':
+            if unfiltered:
+                return self.rating_order
+            low, high = self.sorted_prices[lo], self.sorted_prices[hi - 1]
+            prices = self.prices
+            return [i for i in self.rating_order if low <= prices[i] <= high]
+        if unfiltered:
+            return range(n)
+        return sorted(self.price_order[lo:hi])
+
+    def query(self, min_price=None, max_price=None, sort_by=None):
+        """Return the rows matching a price range, in the requested order"""
+        rows = self.rows
+        return [rows[i] for i in self.query_indexes(min_price, max_price, sort_by)]
@@ -0,0 +1,80 @@
+"""
+Field projection for product detail responses
+
+A fields spec maps top-level payload fields to an optional limit: None
+keeps the value as is, N keeps the first N items of a list (adding
+<field>_total with the full length) or the first N characters of a string.
+"""
+
+# Fields kept in every projection so error entries stay recognisable
+ALWAYS_INCLUDED = ('productId', 'error')
+
+FIELD_PRESETS = {
+    # Smallest useful record: identity, price and availability
+    'summary': {
+        'asin': None, 'title': None, 'brand': None, 'price': None, 'currency': None,
+        'rating': None, 'reviews_count': None, 'stock': None, 'url': None,
+    },
+    # Everything the detailed results table and its export display
+    'grid': {
+        'asin': None, 'title': None, 'price': None, 'rating': None, 'reviews_count': None,
+        'stock': None, 'shipping': None, 'brand': None, 'manufacturer': None,
+        # One past the 100 characters shown so the table can still add '...'
+        'description': 101, 'is_prime_eligible': None, 'images': 1, 'bullet_points': None,
+        'variation': 3, 'reviews': 0, 'url': None,
+    },
+}
+
+
+def parse_fields(value):
+    """
+    Parse a fields= value into a projection spec
+
+    Args:
+        value (str or list): Comma separated field and preset names, or a list of them
+
+    Returns:
+        dict: {field: limit} spec, or None for the full payload
+
+    Raises:
+        ValueError: If value is neither a string nor a list
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        names = value.split(',')
+    elif isinstance(value, list):
+        names = value
+    else:
+        raise ValueError("fields must be a comma separated string or a list of field names")
+
+    spec = {}
+    for name in names:
+        name = str(name).strip()
+        if name == 'full':
+            return None
+        if name in FIELD_PRESETS:
+            spec.update(FIELD_PRESETS[name])
+        elif name:
+            spec.setdefault(name, None)
+    return spec or None
+
+
+def project(product, spec):
+    """Return the projection of a product payload (the payload itself when spec is None)"""
+    if spec is None or not isinstance(product, dict):
+        return product
+    projected = {}
+    for field, limit in spec.items():
+        if field not in product:
+            continue
+        value = product[field]
+        if limit is not None and isinstance(value, (list, str)) and len(value) > limit:
+            if isinstance(value, list):
+                projected[f'{field}_total'] = len(value)
+            value = value[:limit]
+        projected[field] = value
+    for field in ALWAYS_INCLUDED:
+        if field in product:
+            projected[field] = product[field]
+    return projected
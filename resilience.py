@@ -0,0 +1,189 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the rate of upstream requests"""
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate (float): Tokens added per second (0 disables limiting)
+            burst (int, optional): Bucket capacity, defaults to one second of tokens
+        """
+        self.rate = rate
+        self.capacity = burst or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Take a token if one is available, otherwise return the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            wait = (1 - self.tokens) / self.rate
+            self.waited += wait
+            return wait
+
+    def acquire(self):
+        """Block until a token is available"""
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a token is available"""
+        import asyncio
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while upstream is down
+
+    After failure_threshold consecutive failures the circuit opens and
+    calls are rejected for reset_timeout seconds. Then a single trial call
+    is let through (half-open); its outcome closes or re-opens the circuit.
+    A trial that never reports back (e.g. its task was cancelled) is given
+    up after another reset_timeout and a new one is let through.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.trial_started_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may be made now"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if (self.state == 'open' and now - self.opened_at >= self.reset_timeout
+                    or self.state == 'half_open' and now - self.trial_started_at >= self.reset_timeout):
+                self.state = 'half_open'
+                self.trial_started_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = 'closed'
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give up a call that ended without an outcome, letting the next call be the trial"""
+        with self._lock:
+            if self.state == 'half_open':
+                self.state = 'open'
+
+    def stats(self):
+        return {'state': self.state, 'consecutive_failures': self.failures, 'rejected': self.rejected}
+
+
+class MinuteBudget:
+    """Per-minute accounting of requests sent and credits consumed"""
+
+    def __init__(self, requests_per_minute=0):
+        """
+        Args:
+            requests_per_minute (int, optional): Hard cap on requests per minute (0 = unlimited)
+        """
+        self.requests_per_minute = requests_per_minute
+        self.minute = None
+        self.requests = 0
+        self.credits = 0
+        self.total_requests = 0
+        self.total_credits = 0
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        minute = int(time.time() // 60)
+        if minute != self.minute:
+            self.minute = minute
+            self.requests = 0
+            self.credits = 0
+
+    def try_request(self):
+        """Count a request; return False if this minute's budget is spent"""
+        with self._lock:
+            self._roll()
+            if self.requests_per_minute and self.requests >= self.requests_per_minute:
+                return False
+            self.requests += 1
+            self.total_requests += 1
+            return True
+
+    def record_credit(self, credits=1):
+        """Count credits charged for a successful result"""
+        with self._lock:
+            self._roll()
+            self.credits += credits
+            self.total_credits += credits
+
+    def stats(self):
+        with self._lock:
+            self._roll()
+            return {
+                'requests_this_minute': self.requests,
+                'credits_this_minute': self.credits,
+                'requests_per_minute_limit': self.requests_per_minute,
+                'total_requests': self.total_requests,
+                'total_credits': self.total_credits,
+            }
+
+
+def backoff_delay(attempt, base=0.5, cap=10.0):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value, cap=60.0):
+    """
+    Parse a Retry-After header (seconds or HTTP date) into a delay in seconds
+
+    Returns:
+        float: Delay capped at cap, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return min(max(float(value), 0.0), cap)
+    except ValueError:
+        pass
+    try:
+        delay = parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+    return min(max(delay, 0.0), cap)
@@ -0,0 +1,66 @@
+import os
+import uuid
+import logging
+from cache import TTLCache
+from product_model import Listing, pack_listings, unpack_listings
+
+logger = logging.getLogger(__name__)
+
+# How long search and scrape result sets stay available for export
+RESULT_SET_TTL = int(os.getenv("RESULT_SET_TTL", "3600"))
+
+
+class ResultStore:
+    """
+    Server-held result sets addressed by id
+
+    Result sets are stored through the configured cache backend, so with
+    the sqlite or redis backend every worker can serve an export for a
+    result set produced by another worker. Search result sets are stored
+    as packed listing rows and read back as Listings.
+    """
+
+    def __init__(self, ttl=RESULT_SET_TTL):
+        self._cache = TTLCache('results', ttl, encode=_encode_rows, decode=_decode_rows)
+
+    def save(self, rows):
+        """Store rows and return the new result set id"""
+        result_set_id = uuid.uuid4().hex
+        self._cache.set(result_set_id, rows)
+        return result_set_id
+
+    def get(self, result_set_id):
+        """Return the rows of a result set, or None if unknown or expired"""
+        return self._cache.get(result_set_id)
+
+    def select(self, result_set_id, row_ids=None, key='productId'):
+        """
+        Return rows of a result set, optionally restricted to row_ids
+
+        Args:
+            result_set_id (str): Id returned by save()
+            row_ids (list, optional): Values of key identifying the rows to keep
+            key (str, optional): Row field that row_ids refer to
+
+        Returns:
+            list: Matching rows in result set order, or None if the result set expired
+        """
+        rows = self.get(result_set_id)
+        if rows is None or not row_ids:
+            return rows
+        wanted = {str(row_id) for row_id in row_ids}
+        return [row for row in rows if str(row.get(key)) in wanted]
+
+    def stats(self):
+        return self._cache.stats()
+
+
+def _encode_rows(rows):
+    if rows and all(type(row) is Listing for row in rows):
+        return pack_listings(rows)
+    return rows
+
+
+def _decode_rows(value):
+    # Packed listings are a dict; other result sets are stored as a list of rows
+    return unpack_listings(value) if isinstance(value, dict) else value
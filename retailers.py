@@ -0,0 +1,401 @@
+"""
+Multi-retailer search sources
+
+Every retailer in app.RETAILER_PATTERNS becomes a RetailerSource that
+knows its Oxylabs search source and how to normalize that source's
+listings into parsing's Listing model. One query is
+fanned out to several sources concurrently; each source gets its own
+deadline, so a slow retailer is reported as timed out instead of
+holding back the combined response.
+"""
+import os
+import re
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from parsing import parse_listings, extract_organic_items, NON_NUMERIC_RE, PLACEHOLDER_IMAGE, PRICE_NOT_AVAILABLE
+from product_model import Listing, as_listing
+
+logger = logging.getLogger(__name__)
+
+# Per-source deadline for a multi-retailer search, in seconds
+RETAILER_SEARCH_TIMEOUT = float(os.getenv("RETAILER_SEARCH_TIMEOUT", "20"))
+# Threads shared by all multi-retailer searches of a worker
+RETAILER_SEARCH_WORKERS = int(os.getenv("RETAILER_SEARCH_WORKERS", "16"))
+# Sources searched when a request does not name any
+DEFAULT_SEARCH_SOURCES = [s.strip() for s in os.getenv("DEFAULT_SEARCH_SOURCES", "amazon").split(',') if s.strip()]
+
+# Oxylabs search source per retailer domain
+OXYLABS_SEARCH_SOURCES = {
+    'amazon.com': 'amazon_search',
+    'walmart.com': 'walmart_search',
+    'bestbuy.com': 'bestbuy_search',
+    'target.com': 'target_search',
+}
+
+# Item keys checked in order for each normalized field of a non-Amazon listing
+TITLE_KEYS = ('title', 'name', 'product_name')
+URL_KEYS = ('url', 'link', 'product_url')
+IMAGE_KEYS = ('image', 'url_image', 'thumbnail', 'image_url')
+PRODUCT_ID_KEYS = ('product_id', 'sku', 'tcin', 'us_item_id', 'item_id', 'id')
+REVIEW_KEYS = ('reviews_count', 'count', 'rating_count', 'reviews')
+
+# Shared pool. A timed-out source's call keeps its thread until its read
+# timeout, which is the deadline, so late retailers cannot hold threads that
+# later searches need.
+_executor = None
+
+
+def _first(item, keys):
+    for key in keys:
+        value = item.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        numeric_part = NON_NUMERIC_RE.sub('', value.replace(',', ''))
+        try:
+            return float(numeric_part) if numeric_part else 0.0
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def _flatten_item(item):
+    """Merge the nested general/price/rating blocks of e-commerce listings into one dict"""
+    flat = dict(item)
+    if isinstance(item.get('general'), dict):
+        for key, value in item['general'].items():
+            flat.setdefault(key, value)
+    price = item.get('price')
+    if isinstance(price, dict):
+        flat['price'] = price.get('price', price.get('value', price.get('raw')))
+        flat.setdefault('currency', price.get('currency'))
+    rating = item.get('rating')
+    if isinstance(rating, dict):
+        flat['rating'] = rating.get('rating', rating.get('value'))
+        flat.setdefault('reviews_count', rating.get('count'))
+    return flat
+
+
+def extract_items(response_json):
+    """Return the listing items of a parsed e-commerce search response"""
+    results = (response_json or {}).get('results') or []
+    if not results or not isinstance(results[0].get('content'), dict):
+        return []
+    container = results[0]['content'].get('results', [])
+    if isinstance(container, dict):
+        container = container.get('organic', []) or []
+    return [item for item in container if isinstance(item, dict)]
+
+
+class RetailerSource:
+    """One retailer search source: Oxylabs payload and listing normalization"""
+
+    def __init__(self, name, domain, oxylabs_source, url_pattern=None, id_regex=None):
+        """
+        Args:
+            name (str): Source name used in requests, e.g. 'walmart'
+            domain (str): Retailer domain reported in each listing's source field
+            oxylabs_source (str): Oxylabs search source, e.g. 'walmart_search'
+            url_pattern (str, optional): Canonical product URL with a {product_id} placeholder
+            id_regex (str, optional): Pattern extracting the product id from a listing URL
+        """
+        self.name = name
+        self.domain = domain
+        self.oxylabs_source = oxylabs_source
+        self.url_pattern = url_pattern
+        self.id_regex = re.compile(id_regex) if id_regex else None
+        self.base_url = f'https://www.{domain}'
+
+    def __repr__(self):
+        return f'RetailerSource({self.name!r})'
+
+    def build_payload(self, query, zip_code=None, page=1):
+        """Structure the Oxylabs search payload for this retailer"""
+        payload = {
+            'source': self.oxylabs_source,
+            'query': query,
+            'start_page': page,
+            'pages': 1,
+            'parse': True,
+        }
+        if zip_code and self.oxylabs_source == 'amazon_search':
+            payload['domain'] = 'com'
+            payload['zip_code'] = zip_code
+        return payload
+
+    def parse(self, response_json):
+        """
+        Normalize a parsed search response into Listings
+
+        Returns:
+            list: Listings with source set to this retailer
+        """
+        if self.oxylabs_source == 'amazon_search':
+            return parse_listings(extract_organic_items(response_json))
+        listings = []
+        for position, item in enumerate(extract_items(response_json), 1):
+            try:
+                listings.append(self.normalize(item, position))
+            except Exception as e:
+                logger.warning(f"Error processing {self.name} item: {str(e)}")
+        return listings
+
+    def normalize(self, item, position):
+        """Normalize one non-Amazon listing item into a Listing"""
+        item = _flatten_item(item)
+        url = _first(item, URL_KEYS) or ''
+        if url.startswith('/'):
+            url = self.base_url + url
+
+        product_id = _first(item, PRODUCT_ID_KEYS)
+        if product_id is None and url and self.id_regex is not None:
+            match = self.id_regex.search(url)
+            if match:
+                product_id = match.group(1)
+        product_id = str(product_id) if product_id is not None else ''
+        if product_id and self.url_pattern and (not url or '?' in url):
+            # Canonical URL without tracking parameters
+            url = self.url_pattern.format(product_id=product_id)
+
+        extracted_price = _to_float(item.get('price'))
+        # None: formatted from extracted_price by Listing.price
+        price_text = None if extracted_price > 0 else PRICE_NOT_AVAILABLE
+
+        return Listing(
+            position,
+            _first(item, TITLE_KEYS) or "No title available",
+            url,
+            price_text,
+            extracted_price,
+            _to_float(item.get('rating')),
+            int(_to_float(_first(item, REVIEW_KEYS))),
+            _first(item, IMAGE_KEYS) or PLACEHOLDER_IMAGE,
+            self.describe(item),
+            self.domain,
+            item.get('shipping_information') or '',
+            product_id,
+        )
+
+    @staticmethod
+    def describe(item):
+        """Seller and badge text shown in the listing description"""
+        parts = []
+        seller = item.get('seller')
+        seller_name = seller.get('name') if isinstance(seller, dict) else item.get('seller_name')
+        if seller_name:
+            parts.append(f"Sold by {seller_name}")
+        for key, label in (('best_seller', 'Best Seller'), ('sponsored', 'Sponsored')):
+            if item.get(key):
+                parts.append(label)
+        return " | ".join(parts)
+
+
+def build_search_sources(retailer_patterns):
+    """
+    Create a RetailerSource for every retailer with an Oxylabs search source
+
+    Args:
+        retailer_patterns (dict): Domain -> {'pattern', 'id_regex'} table
+
+    Returns:
+        dict: Source name -> RetailerSource, in table order
+    """
+    sources = {}
+    for domain, pattern in retailer_patterns.items():
+        oxylabs_source = OXYLABS_SEARCH_SOURCES.get(domain)
+        if oxylabs_source is None:
+            continue
+        name = domain.split('.')[0]
+        sources[name] = RetailerSource(name, domain, oxylabs_source, pattern.get('pattern'), pattern.get('id_regex'))
+    return sources
+
+
+def parse_source_names(value, available):
+    """
+    Parse a sources= value into source names
+
+    Args:
+        value (str or list): Comma separated source names, a list of them, or 'all'
+        available (dict): Registered sources
+
+    Returns:
+        list: Known source names in request order (DEFAULT_SEARCH_SOURCES when empty)
+
+    Raises:
+        ValueError: If a name is not a registered source
+    """
+    if not value:
+        return [name for name in DEFAULT_SEARCH_SOURCES if name in available]
+    names = value.split(',') if isinstance(value, str) else list(value)
+    names = [str(name).strip().lower() for name in names if str(name).strip()]
+    if 'all' in names:
+        return list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown search sources: {', '.join(unknown)} (available: {', '.join(available)})")
+    return list(dict.fromkeys(names))
+
+
+def listing_key(listing):
+    """Dedupe key of a listing: retailer and product id, else the URL without query string"""
+    product_id = listing.get('productId')
+    if product_id:
+        return f"{listing.get('source')}:{product_id}"
+    link = listing.get('link') or ''
+    return link.split('?')[0].rstrip('/').lower() or None
+
+
+def merge_listings(listings_by_source, seen=None, position=0):
+    """
+    Merge listings of several sources, interleaving them by rank and dropping duplicates
+
+    Args:
+        listings_by_source (list): One listing list per source, in source order
+        seen (set, optional): Keys already merged; updated in place
+        position (int, optional): Position of the last listing merged so far
+
+    Returns:
+        list: Merged listings renumbered from position + 1
+    """
+    seen = set() if seen is None else seen
+    merged = []
+    longest = max((len(listings) for listings in listings_by_source), default=0)
+    for rank in range(longest):
+        for listings in listings_by_source:
+            if rank >= len(listings):
+                continue
+            listing = listings[rank]
+            key = listing_key(listing)
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            position += 1
+            merged.append(as_listing(listing).with_position(position))
+    return merged
+
+
+def _source_result(source, value=None, error=None, started=None, status=None):
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1) if started is not None else None
+    if status is None:
+        status = 'error' if error else 'ok'
+    return {'source': source.name, 'status': status, 'value': value, 'error': error, 'elapsed_ms': elapsed_ms}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=RETAILER_SEARCH_WORKERS, thread_name_prefix='retailer-search')
+    return _executor
+
+
+def _call_source(fetch, source):
+    started = time.perf_counter()
+    try:
+        return _source_result(source, fetch(source), started=started)
+    except Exception as e:
+        logger.error(f"Search source {source.name} failed: {str(e)}")
+        return _source_result(source, error=str(e), started=started)
+
+
+def iter_sources(fetch, sources, timeout=RETAILER_SEARCH_TIMEOUT):
+    """
+    Call fetch for every source concurrently, yielding results as they complete
+
+    Sources still running when the deadline passes are yielded with status
+    'timeout'; their calls keep running in the background.
+
+    Args:
+        fetch (callable): Called with a RetailerSource; returns its listings
+        sources (list): RetailerSource objects to search
+        timeout (float, optional): Seconds each source may take
+
+    Yields:
+        dict: source, status (ok, error, timeout), value, error and elapsed_ms
+    """
+    started = time.perf_counter()
+    deadline = started + timeout
+    executor = _get_executor()
+    futures = {
+        executor.submit(contextvars.copy_context().run, _call_source, fetch, source): source for source in sources
+    }
+    pending = set(futures)
+    while pending:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+    for future in pending:
+        source = futures[future]
+        logger.warning(f"Search source {source.name} timed out after {timeout}s")
+        yield _source_result(source, error=f"Timed out after {timeout}s", started=started, status='timeout')
+
+
+def run_sources(fetch, sources, timeout=RETAILER_SEARCH_TIMEOUT):
+    """
+    Search every source concurrently and merge the listings
+
+    Returns:
+        tuple: (merged listings, {source name: status dict without the listings})
+    """
+    results = {result['source']: result for result in iter_sources(fetch, sources, timeout)}
+    ordered = [results[source.name] for source in sources]
+    merged = merge_listings([result['value'] or [] for result in ordered])
+    return merged, source_statuses(ordered)
+
+
+def source_statuses(results):
+    """Summaries of source results for the response body (listings replaced by a count)"""
+    statuses = {}
+    for result in results:
+        status = {key: result[key] for key in ('status', 'error', 'elapsed_ms')}
+        status['count'] = len(result['value'] or [])
+        statuses[result['source']] = status
+    return statuses
+
+
+async def _call_source_async(fetch, source, timeout):
+    import asyncio
+    started = time.perf_counter()
+    try:
+        return _source_result(source, await asyncio.wait_for(fetch(source), timeout), started=started)
+    except asyncio.TimeoutError:
+        logger.warning(f"Search source {source.name} timed out after {timeout}s")
+        return _source_result(source, error=f"Timed out after {timeout}s", started=started, status='timeout')
+    except Exception as e:
+        logger.error(f"Search source {source.name} failed: {str(e)}")
+        return _source_result(source, error=str(e), started=started)
+
+
+async def iter_sources_async(fetch, sources, timeout=RETAILER_SEARCH_TIMEOUT):
+    """Async counterpart of iter_sources; fetch is a coroutine function and timed-out calls are cancelled"""
+    import asyncio
+    tasks = [asyncio.ensure_future(_call_source_async(fetch, source, timeout)) for source in sources]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def run_sources_async(fetch, sources, timeout=RETAILER_SEARCH_TIMEOUT):
+    """Async counterpart of run_sources"""
+    results = {}
+    async for result in iter_sources_async(fetch, sources, timeout):
+        results[result['source']] = result
+    ordered = [results[source.name] for source in sources]
+    merged = merge_listings([result['value'] or [] for result in ordered])
+    return merged, source_statuses(ordered)
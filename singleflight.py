@@ -0,0 +1,130 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """An upstream call in flight, shared by every caller with the same key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._inflight = {}
+        self._inflight_async = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) unless a call for key is already running
+
+        Args:
+            key (str): Identity of the call, e.g. an ASIN or cache key
+            func (callable): Function performing the upstream call
+
+        Returns:
+            The value returned by the single in-flight call for key
+        """
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            logger.info(f"Coalescing {self.name} call for {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = func(*args, **kwargs)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    async def do_async(self, key, func, *args, **kwargs):
+        """
+        Await func(*args, **kwargs) unless a call for key is already running
+
+        The asyncio counterpart of do() for the ASGI app; func is a
+        coroutine function and waiting callers do not block the event loop.
+        If the leading caller is cancelled (its client went away or its
+        deadline passed) the waiting callers are not: they start over, one
+        of them leading a new call.
+
+        Args:
+            key (str): Identity of the call, e.g. an ASIN or cache key
+            func (callable): Coroutine function performing the upstream call
+
+        Returns:
+            The value returned by the single in-flight call for key
+        """
+        import asyncio
+        while True:
+            with self._lock:
+                future = self._inflight_async.get(key)
+                leader = future is None
+                if leader:
+                    future = asyncio.get_running_loop().create_future()
+                    self._inflight_async[key] = future
+                    self.calls += 1
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                break
+            logger.info(f"Coalescing {self.name} call for {key}")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leader was cancelled, not us: try again (Task.cancelling is 3.11+)
+                cancelling = getattr(asyncio.current_task(), 'cancelling', lambda: 0)()
+                if future.cancelled() and not cancelling:
+                    continue
+                raise
+
+        try:
+            value = await func(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._inflight_async.pop(key, None)
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # Mark the exception retrieved so it is not logged when nobody was waiting
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        with self._lock:
+            self._inflight_async.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        """Return executed and coalesced call counters"""
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._inflight) + len(self._inflight_async),
+        }
@@ -1,29 +1,44 @@
 import os
 import sys
 import json
+import threading
 import argparse
 from dotenv import load_dotenv
 import requests
+import oxylabs_client
+from oxylabs_client import post_query, get_credentials
+from batch import iter_batch
+from fast_json import dumps as json_dumps
+from parsing import ASIN_RE
 
 # Load environment variables
 load_dotenv()
 
-def get_product_details(product_id):
+_print_lock = threading.Lock()
+
+def log(message, stream=sys.stdout):
+    """Print a message without interleaving it with other worker threads' output"""
+    with _print_lock:
+        print(message, file=stream, flush=True)
+
+def get_product_details(product_id, verbose=True, stream=sys.stdout):
     """
     Get details for a specific Amazon product using Oxylabs API
-    
+
     Args:
         product_id (str): Amazon ASIN/product ID
+        verbose (bool, optional): Print the request payload and the full API response
+        stream (file, optional): Where progress and debug output is printed
     """
-    username = os.getenv("OXYLABS_USERNAME")
-    password = os.getenv("OXYLABS_PASSWORD")
-    
+    username, password = get_credentials()
+
     if not username or not password:
-        print("Error: Please set your OXYLABS_USERNAME and OXYLABS_PASSWORD in the .env file")
+        log("Error: Please set your OXYLABS_USERNAME and OXYLABS_PASSWORD in the .env file", stream)
         return None
-    
-    print(f"Getting details for product ID: {product_id}")
-    
+
+    if verbose:
+        log(f"Getting details for product ID: {product_id}", stream)
+
     # Structure payload for Oxylabs API
     payload = {
         'source': 'amazon',
@@ -31,94 +46,176 @@ def get_product_details(product_id):
         'url': f'https://www.amazon.com/dp/{product_id}',
         'parse': True
     }
-    
+
     try:
-        print(f"Sending request to Oxylabs API...")
+        if verbose:
+            log(f"Sending request to Oxylabs API...", stream)
         # Get response
-        response = requests.request(
-            'POST',
-            'https://realtime.oxylabs.io/v1/queries',
-            auth=(username, password),
-            json=payload,
-        )
-        
+        response = post_query(payload)
+
         # Print the request payload for debugging
-        print(f"Request payload: {json.dumps(payload, indent=2)}")
-        
+        if verbose:
+            log(f"Request payload: {json.dumps(payload, indent=2)}", stream)
+
         # Check for error response
         if response.status_code >= 400:
-            print(f"Error response ({response.status_code}):")
+            log(f"Error response ({response.status_code}) for {product_id}:", stream)
             try:
-                error_json = response.json()
-                print(json.dumps(error_json, indent=2))
+                log(json.dumps(response.json(), indent=2), stream)
             except:
-                print(response.text)
-        
+                log(response.text, stream)
+
         response.raise_for_status()
-        print(f"Response status code: {response.status_code}")
-        
+        if verbose:
+            log(f"Response status code: {response.status_code}", stream)
+
         results = response.json()
-        
-        print("Full API response:")
-        print(json.dumps(results, indent=2))
-        
+
+        # Pretty-printing the whole payload costs more than parsing it
+        if verbose:
+            log("Full API response:", stream)
+            log(json.dumps(results, indent=2), stream)
+
         if not results or "results" not in results:
-            print("No results found in API response")
+            log(f"No results found in API response for {product_id}", stream)
             return None
-            
+
         # Extract content from the response
         if not results["results"] or "content" not in results["results"][0]:
-            print("No content in results")
+            log(f"No content in results for {product_id}", stream)
             return None
-        
+
         content = results["results"][0]["content"]
-        print(f"Product data retrieved successfully")
-        
+        if verbose:
+            log(f"Product data retrieved successfully", stream)
+
         # Check for parse status code
         if isinstance(content, dict) and content.get('parse_status_code') == 12003:
-            print("WARNING: Product not found on Amazon or is currently unavailable")
-            print("This could be due to:")
-            print("1. The product ASIN is no longer valid")
-            print("2. The product is not available in the region used for scraping")
-            print("3. Amazon is blocking the scraping request")
-        
+            log(f"WARNING: Product {product_id} not found on Amazon or is currently unavailable", stream)
+            if verbose:
+                log("This could be due to:\n"
+                    "1. The product ASIN is no longer valid\n"
+                    "2. The product is not available in the region used for scraping\n"
+                    "3. Amazon is blocking the scraping request", stream)
+
         return content
-        
+
     except requests.exceptions.RequestException as e:
-        print(f"API Error occurred: {str(e)}")
+        log(f"API Error occurred for {product_id}: {str(e)}", stream)
         return None
     except Exception as e:
-        print(f"Error occurred: {str(e)}")
+        log(f"Error occurred for {product_id}: {str(e)}", stream)
         return None
 
-def main():
-    parser = argparse.ArgumentParser(description='Fetch Amazon product details by ASIN')
-    parser.add_argument('asin', help='Amazon ASIN (10-character product ID)')
-    parser.add_argument('--output', '-o', help='Output file path (optional)')
-    args = parser.parse_args()
-    
+def read_asins(args):
+    """
+    Collect ASINs from the arguments, --file and stdin, deduped in order
+
+    Stdin is read when --file is '-' or when no ASINs were given and stdin
+    is not a terminal. Blank lines and lines starting with # are skipped;
+    comma or whitespace separated ASINs on one line are all used.
+    """
+    values = list(args.asin)
+    lines = []
+    if args.file and args.file != '-':
+        with open(args.file) as f:
+            lines.extend(f)
+    if args.file == '-' or (not values and not args.file and not sys.stdin.isatty()):
+        lines.extend(sys.stdin)
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            values.extend(line.replace(',', ' ').split())
+    return list(dict.fromkeys(value.strip() for value in values if value.strip()))
+
+def fetch_product_line(product_id, verbose, stream):
+    """Fetch one ASIN and return its NDJSON record"""
+    if not ASIN_RE.match(product_id):
+        return {'productId': product_id, 'error': 'Invalid ASIN format'}
+    product_data = get_product_details(product_id, verbose=verbose, stream=stream)
+    if not product_data:
+        return {'productId': product_id, 'error': 'Failed to retrieve product data'}
+    return dict(product_data, productId=product_id) if isinstance(product_data, dict) else {
+        'productId': product_id, 'content': product_data
+    }
+
+def run_single(asin, args):
+    """Original one-ASIN mode: pretty-printed JSON on stdout or in --output"""
     # Validate ASIN format (10 alphanumeric characters)
-    import re
-    if not re.match(r'^[A-Z0-9]{10}$', args.asin):
+    if not ASIN_RE.match(asin):
         print("Error: Invalid ASIN format. Amazon ASIN should be 10 alphanumeric characters.")
         sys.exit(1)
-    
-    product_data = get_product_details(args.asin)
-    
+
+    product_data = get_product_details(asin, verbose=not args.quiet)
+
     if not product_data:
-        print(f"Failed to retrieve product data for ASIN: {args.asin}")
+        print(f"Failed to retrieve product data for ASIN: {asin}")
         sys.exit(1)
-    
+
     # Output the data
     if args.output:
         with open(args.output, 'w') as f:
             json.dump(product_data, f, indent=2)
         print(f"Product data saved to {args.output}")
+    elif args.quiet:
+        print(json_dumps(product_data))
     else:
         # Pretty print to console
         print(json.dumps(product_data, indent=2))
-    
-    print(f"Successfully retrieved product data for ASIN: {args.asin}")
+
+    if not args.quiet:
+        print(f"Successfully retrieved product data for ASIN: {asin}")
+
+def run_many(asins, args):
+    """
+    Fetch ASINs concurrently and write one compact NDJSON line per product as each completes
+
+    Lines go to --output or stdout; progress and debug output go to stderr.
+    """
+    # One pooled connection per worker; the shared session is created on first use
+    oxylabs_client.POOL_SIZE = max(oxylabs_client.POOL_SIZE, args.concurrency)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    failed = 0
+    try:
+        fetch = lambda asin: fetch_product_line(asin, not args.quiet, sys.stderr)
+        for _, result in iter_batch(fetch, asins, max_workers=args.concurrency):
+            record = result['value'] or {'productId': result['item'], 'error': result['error']}
+            if record.get('error'):
+                failed += 1
+            with _print_lock:
+                out.write(json_dumps(record) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    log(f"Retrieved {len(asins) - failed}/{len(asins)} products"
+        + (f", saved to {args.output}" if args.output else ""), sys.stderr)
+    if failed:
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Fetch Amazon product details by ASIN',
+        epilog='With several ASINs (or --file/stdin) results are written as NDJSON, one line per product.'
+    )
+    parser.add_argument('asin', nargs='*', help='Amazon ASINs (10-character product IDs)')
+    parser.add_argument('--file', '-f', help="File with ASINs, one per line ('-' reads stdin)")
+    parser.add_argument('--output', '-o', help='Output file path (optional)')
+    parser.add_argument('--concurrency', '-c', type=int, default=int(os.getenv("SCRAPE_MAX_WORKERS", "5")),
+                        help='Products fetched at once')
+    parser.add_argument('--ndjson', action='store_true', help='Use NDJSON output even for a single ASIN')
+    parser.add_argument('--quiet', '-q', action='store_true', help='Skip the request and response debug dumps')
+    args = parser.parse_args()
+
+    asins = read_asins(args)
+    if not asins:
+        parser.error('no ASINs given (pass them as arguments, with --file, or on stdin)')
+
+    if len(asins) == 1 and not args.ndjson and not args.file:
+        run_single(asins[0], args)
+    else:
+        run_many(asins, args)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,235 @@
+"""
+Precompiled product URL resolution for the retailer pattern table
+
+UrlResolver compiles every retailer's id_regex once and indexes the
+retailers by host suffix, so finding the retailer of a link is a few
+dict lookups instead of a substring scan of the whole table. Hosts and
+labels seen before are memoized, which makes resolve_many() over long
+imported URL lists mostly dictionary hits.
+"""
+import re
+import string
+import logging
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Any character outside string.printable, matched in C instead of a per-character loop
+NON_PRINTABLE_RE = re.compile(f'[^{re.escape(string.printable)}]')
+
+VALID_SCHEMES = ('http', 'https')
+
+# Plain http(s) URLs of printable, whitespace-free ASCII: checked without urlparse
+SIMPLE_URL_RE = re.compile(r'https?://([^\s/?#\[\]@]+)(/[^\s?#]*)?(?:\?[^\s#]*)?(#\S*)?', re.ASCII)
+
+# Distinct hosts / source labels memoized per resolver
+RETAILER_MEMO_SIZE = 10000
+
+
+class Retailer:
+    """One entry of the retailer pattern table with its id regex compiled"""
+
+    __slots__ = ('domain', 'pattern', 'id_regex', 'id_re')
+
+    def __init__(self, domain, pattern):
+        self.domain = domain
+        self.pattern = pattern
+        self.id_regex = pattern['id_regex']
+        self.id_re = re.compile(self.id_regex)
+
+    def extract_id(self, link):
+        match = self.id_re.search(link)
+        return match.group(1) if match else None
+
+    def canonical_url(self, product_id):
+        return self.pattern['pattern'].format(product_id=product_id)
+
+
+def _simple_match(url):
+    if isinstance(url, str) and NON_PRINTABLE_RE.search(url) is None:
+        return SIMPLE_URL_RE.fullmatch(url)
+    return None
+
+
+def check_url(url, match=None):
+    """
+    Run the product URL checks on one URL
+
+    Args:
+        url (str): URL to check
+        match (re.Match, optional): SIMPLE_URL_RE match of url, when the caller already has it
+
+    Returns:
+        dict: is_valid, checks (name -> bool) and error, as app.validate_url
+    """
+    if match is None:
+        match = _simple_match(url)
+    if match is not None:
+        # Same results urlparse gives for this shape, for the cost of one regex match
+        path, fragment = match.group(2, 3)
+        if path and not (fragment and len(fragment) > 1):
+            return {'is_valid': True, 'checks': dict(VALID_CHECKS), 'error': None}
+    try:
+        result = urlparse(url)
+        checks = {
+            'has_scheme': bool(result.scheme),
+            'has_netloc': bool(result.netloc),
+            'valid_scheme': result.scheme in VALID_SCHEMES,
+            'has_path': bool(result.path),
+            'no_fragments': not result.fragment,  # Most product URLs don't need fragments
+            'valid_chars': NON_PRINTABLE_RE.search(url) is None,
+        }
+    except Exception as e:
+        return {'is_valid': False, 'checks': {}, 'error': str(e)}
+
+    is_valid = all(checks.values())
+    return {
+        'is_valid': is_valid,
+        'checks': checks,
+        'error': None if is_valid else 'URL validation failed: ' + ', '.join(k for k, v in checks.items() if not v)
+    }
+
+
+VALID_CHECKS = (
+    ('has_scheme', True), ('has_netloc', True), ('valid_scheme', True),
+    ('has_path', True), ('no_fragments', True), ('valid_chars', True),
+)
+
+
+class UrlResolver:
+    """
+    Map product links to their retailer, product ID and canonical URL
+
+    Retailers are looked up by host suffix ('smile.amazon.com' finds
+    'amazon.com'); labels that are not hosts, such as a listing's source
+    field, fall back to the substring match of the original lookup.
+    """
+
+    def __init__(self, retailer_patterns):
+        """
+        Args:
+            retailer_patterns (dict): Domain -> {'pattern', 'id_regex'} table
+        """
+        self.retailers = [Retailer(domain.lower(), pattern) for domain, pattern in retailer_patterns.items()]
+        self._by_suffix = {retailer.domain: retailer for retailer in self.retailers}
+        self._memo = {}
+
+    def retailer_for(self, label):
+        """
+        Return the Retailer of a host or source label (e.g. 'www.walmart.com', 'Amazon.com')
+
+        Returns:
+            Retailer: Matching retailer, or None
+        """
+        if not label:
+            return None
+        try:
+            return self._memo[label]
+        except KeyError:
+            pass
+
+        host = label.lower()
+        retailer = None
+        # Host suffix walk: www.amazon.com -> amazon.com -> com
+        suffix = host.split(':', 1)[0]
+        while suffix:
+            retailer = self._by_suffix.get(suffix)
+            if retailer is not None:
+                break
+            suffix = suffix.partition('.')[2]
+        if retailer is None:
+            retailer = next((r for r in self.retailers if r.domain in host), None)
+
+        if len(self._memo) >= RETAILER_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[label] = retailer
+        return retailer
+
+    def pattern_for(self, domain):
+        """Return the {'pattern', 'id_regex'} entry of a domain, or None"""
+        retailer = self.retailer_for(domain)
+        return retailer.pattern if retailer else None
+
+    def canonical_url(self, link, source=None):
+        """
+        Return the canonical product URL of a link, or None
+
+        Args:
+            link (str): Product link
+            source (str, optional): Retailer label deciding the pattern; defaults to the link's host
+        """
+        retailer = self.retailer_for(source if source is not None else _host(link))
+        if retailer is None or not link:
+            return None
+        product_id = retailer.extract_id(link)
+        return retailer.canonical_url(product_id) if product_id else None
+
+    def resolve(self, link, source=None):
+        """
+        Resolve one product link
+
+        Args:
+            link (str): Product link
+            source (str, optional): Retailer label used when the link's host is unknown
+
+        Returns:
+            dict: url, retailer, product_id, canonical_url and validation (check_url result)
+        """
+        link = link if isinstance(link, str) else ''
+        match = _simple_match(link)
+        host = match.group(1) if match is not None else _host(link)
+        retailer = self.retailer_for(host) or self.retailer_for(source)
+        product_id = retailer.extract_id(link) if retailer else None
+        return {
+            'url': link,
+            'retailer': retailer.domain if retailer else None,
+            'product_id': product_id,
+            'canonical_url': retailer.canonical_url(product_id) if product_id else None,
+            'validation': check_url(link, match),
+        }
+
+    def resolve_many(self, links, sources=None):
+        """
+        Resolve a batch of product links in one pass
+
+        Repeated links are resolved once; hosts hit the retailer memo after
+        their first occurrence.
+
+        Args:
+            links (list): Product links
+            sources (list, optional): Retailer label per link
+
+        Returns:
+            list: One resolve() result per link, in input order
+        """
+        if sources is None:
+            sources = [None] * len(links)
+        resolved = {}
+        results = []
+        append = results.append
+        for link, source in zip(links, sources):
+            link = link if isinstance(link, str) else ''
+            source = source if isinstance(source, str) else None
+            key = (link, source)
+            result = resolved.get(key)
+            if result is None:
+                result = resolved[key] = self.resolve(link, source)
+            append(result)
+        return results
+
+
+def _host(link):
+    """Host part of a link without parsing the whole URL"""
+    if not link:
+        return None
+    start = link.find('//')
+    if start < 0:
+        return None
+    start += 2
+    end = len(link)
+    for delimiter in '/?#':
+        index = link.find(delimiter, start)
+        if 0 <= index < end:
+            end = index
+    host = link[start:end].rpartition('@')[2]
+    return host or None